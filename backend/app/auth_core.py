@@ -1,27 +1,15 @@
-import uuid
 from typing import Any
 
 from fastapi import Request, status
 from fastapi.exceptions import HTTPException
 
-from app.db import get_db
+from app.loader import EntityLoader, get_loader
+from app.ownership import driver_fleet, vehicle_fleet
+from app.sessions import create_session_store
 from fastapi import Depends
 
 
-class TokenStore:
-    def __init__(self):
-        self._store: dict[str, dict[str, Any]] = {}
-
-    def issue(self, session: dict[str, Any]) -> str:
-        token = uuid.uuid4().hex
-        self._store[token] = session
-        return token
-
-    def get(self, token: str) -> dict[str, Any] | None:
-        return self._store.get(token)
-
-
-token_store = TokenStore()
+token_store = create_session_store()
 
 
 def parse_bearer_token(auth_header: str | None) -> str | None:
@@ -36,16 +24,6 @@ def parse_bearer_token(auth_header: str | None) -> str | None:
     return token
 
 
-def _extract_int_segment(path: str, idx: int) -> int | None:
-    segs = path.split("/")
-    if len(segs) <= idx:
-        return None
-    raw = segs[idx]
-    if not raw.isdigit():
-        return None
-    return int(raw)
-
-
 def _normalize_int_id(value: Any) -> int | None:
     """支持 int / '123' / 'D123' 形式的 ID 解析为 int。"""
     if value is None:
@@ -68,89 +46,176 @@ def _normalize_int_id(value: Any) -> int | None:
     return None
 
 
-def is_allowed(path: str, session: dict[str, Any]) -> bool:
-    role = session.get("role")
+ALLOW = "allow"
+
+# 非管理员的访问策略：按前缀顺序匹配，第一条命中的生效。
+# 检查项 (比较方式, 会话字段) 表示路径第 3 段（/api/xxx/{id}）必须等于会话中的对应字段：
+#   int    —— 路径段必须是纯数字
+#   person —— 兼容 D/M 前缀的人员 ID，两边都做归一化
+ROLE_POLICY: dict[str, list[tuple[str, Any]]] = {
+    # 司机仅允许查询自己的绩效与个人相关信息
+    "staff": [
+        ("/api/personnels/", ("person", "personnel_id")),
+        # /api/drivers/{person_id}/orders 或 /api/drivers/{person_id}/incidents
+        ("/api/drivers/", ("person", "personnel_id")),
+    ],
+    "manager": [
+        ("/api/fleets/", ("int", "fleet_id")),
+        ("/api/personnels/drivers", ALLOW),
+        ("/api/personnels/managers", ALLOW),
+        ("/api/personnels/", ("int", "personnel_id")),
+        ("/api/orders", ALLOW),
+        ("/api/incidents", ALLOW),
+        ("/api/vehicles", ALLOW),
+        # 允许主管访问自己的主管信息：/api/managers/{person_id}
+        ("/api/managers/", ("person", "personnel_id")),
+        # 允许主管访问通用司机搜索接口，具体范围在路由中按车队限制
+        ("/api/drivers", ALLOW),
+    ],
+}
 
-    if role == "admin":
-        return True
+ID_SEGMENT = 3
 
-    if role == "staff":
-        self_id = _normalize_int_id(session.get("personnel_id"))
-        # 司机仅允许查询自己的绩效与个人相关信息
-        if path.startswith("/api/personnels/"):
-            segs = path.split("/")
-            pid = _normalize_int_id(segs[3] if len(segs) > 3 else None)
-            return pid is not None and self_id is not None and pid == self_id
 
-        if path.startswith("/api/drivers/"):
-            # /api/drivers/{person_id}/orders 或 /api/drivers/{person_id}/incidents
-            segs = path.split("/")
-            pid = _normalize_int_id(segs[3] if len(segs) > 3 else None)
-            return pid is not None and self_id is not None and pid == self_id
+def _iter_route_paths(routes, prefix: str = ""):
+    """遍历应用中的全部路由模板（兼容 include_router 被展开或保留为子路由两种结构）。"""
+    for route in routes:
+        path = getattr(route, "path", None)
+        if isinstance(path, str):
+            yield prefix + path
+            continue
+        sub = getattr(route, "original_router", None)
+        if sub is not None:
+            ctx = getattr(route, "include_context", None)
+            yield from _iter_route_paths(sub.routes, prefix + (getattr(ctx, "prefix", "") or ""))
 
-        return False
 
-    if role == "manager":
-        self_id = _normalize_int_id(session.get("personnel_id"))
-        if path.startswith("/api/fleets/"):
-            fid = _extract_int_segment(path, 3)
-            return fid is not None and fid == session.get("fleet_id")
+class _RouteNode:
+    __slots__ = ("literals", "param", "rules")
 
-        if path.startswith("/api/personnels/drivers") or path.startswith("/api/personnels/managers"):
-            return True
+    def __init__(self):
+        self.literals: dict[str, _RouteNode] = {}
+        self.param: _RouteNode | None = None
+        # role -> ALLOW / (比较方式, 会话字段)；角色不在其中即拒绝
+        self.rules: dict[str, Any] | None = None
+
+
+class PermissionTable:
+    """启动时由实际路由模板编译出的权限表：按路径段走前缀树定位路由，再查该路由上各角色的预计算规则。"""
+
+    def __init__(self, route_paths):
+        self._root = _RouteNode()
+        for template in route_paths:
+            if template.startswith("/api/"):
+                self._add(template)
+
+    def _add(self, template: str) -> None:
+        node = self._root
+        for seg in template.strip("/").split("/"):
+            if seg.startswith("{") and seg.endswith("}"):
+                if node.param is None:
+                    node.param = _RouteNode()
+                node = node.param
+            else:
+                node = node.literals.setdefault(seg, _RouteNode())
+        rules: dict[str, Any] = {}
+        for role, policy in ROLE_POLICY.items():
+            for prefix, rule in policy:
+                if template.startswith(prefix):
+                    rules[role] = rule
+                    break
+        node.rules = rules
+
+    def _match(self, node: _RouteNode, segs: list[str], i: int) -> _RouteNode | None:
+        if i == len(segs):
+            return node if node.rules is not None else None
+        child = node.literals.get(segs[i])
+        if child is not None:
+            found = self._match(child, segs, i + 1)
+            if found is not None:
+                return found
+        if node.param is not None and segs[i]:
+            return self._match(node.param, segs, i + 1)
+        return None
 
-        if path.startswith("/api/personnels/"):
-            pid = _extract_int_segment(path, 3)
-            return pid is not None and pid == session.get("personnel_id")
-        if path.startswith("/api/orders"):
-            return True
-        if path.startswith("/api/incidents"):
+    def is_allowed(self, path: str, session: dict[str, Any]) -> bool:
+        role = session.get("role")
+        if role == "admin":
             return True
-        if path.startswith("/api/vehicles"):
-            return True
-        # 允许主管访问自己的主管信息：/api/managers/{person_id}
-        if path.startswith("/api/managers/"):
-            segs = path.split("/")
-            mid = _normalize_int_id(segs[3] if len(segs) > 3 else None)
-            return mid is not None and self_id is not None and mid == self_id
-        # 允许主管访问通用司机搜索接口，具体范围在路由中按车队限制
-        if path.startswith("/api/drivers"):
+
+        segs = path.strip("/").split("/")
+        node = self._match(self._root, segs, 0)
+        if node is None:
+            return False
+        rule = node.rules.get(role)
+        if rule is None:
+            return False
+        if rule == ALLOW:
             return True
-        return False
 
-    return False
+        kind, key = rule
+        # segs 不含开头的空段，因此路径第 3 段对应下标 2
+        raw = segs[ID_SEGMENT - 1] if len(segs) >= ID_SEGMENT else None
+        if kind == "int":
+            return raw is not None and raw.isdigit() and int(raw) == session.get(key)
+        value = _normalize_int_id(raw)
+        return value is not None and value == _normalize_int_id(session.get(key))
+
+
+def _json_response(status_code: int, detail: str):
+    from fastapi.responses import JSONResponse
 
+    return JSONResponse(status_code=status_code, content={"detail": detail})
 
-async def auth_middleware(request: Request, call_next):
-    path = request.url.path
-    if not path.startswith("/api/") or request.method == "OPTIONS":
-        return await call_next(request)
 
-    if path == "/api/auth/login":
-        return await call_next(request)
+class AuthMiddleware:
+    """纯 ASGI 鉴权中间件：校验 Bearer token 并按权限表放行，会话写入 request.state.auth。
 
-    token = parse_bearer_token(request.headers.get("Authorization"))
-    if not token:
-        from fastapi.responses import JSONResponse
+    权限表在第一次请求时由 routes 编译（此时所有路由都已注册）。
+    """
 
-        return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"detail": "Not authenticated"})
+    def __init__(self, app, routes):
+        self.app = app
+        self._routes = routes
+        self._table: PermissionTable | None = None
 
-    session = token_store.get(token)
-    if not session:
-        from fastapi.responses import JSONResponse
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-        return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"detail": "Invalid token"})
+        path = scope["path"]
+        if not path.startswith("/api/") or scope["method"] == "OPTIONS" or path == "/api/auth/login":
+            await self.app(scope, receive, send)
+            return
 
-    if not is_allowed(path, session):
-        from fastapi.responses import JSONResponse
+        auth_header = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                auth_header = value.decode("latin-1")
+                break
 
-        return JSONResponse(status_code=status.HTTP_403_FORBIDDEN, content={"detail": "Forbidden"})
+        token = parse_bearer_token(auth_header)
+        if not token:
+            await _json_response(status.HTTP_401_UNAUTHORIZED, "Not authenticated")(scope, receive, send)
+            return
 
-    request.state.auth = session
-    return await call_next(request)
+        session = token_store.get(token)
+        if not session:
+            await _json_response(status.HTTP_401_UNAUTHORIZED, "Invalid token")(scope, receive, send)
+            return
 
+        if self._table is None:
+            self._table = PermissionTable(_iter_route_paths(self._routes))
+        if not self._table.is_allowed(path, session):
+            await _json_response(status.HTTP_403_FORBIDDEN, "Forbidden")(scope, receive, send)
+            return
 
-def require_admin(request: Request):
+        scope.setdefault("state", {})["auth"] = session
+        await self.app(scope, receive, send)
+
+
+async def require_admin(request: Request):
     auth_info = getattr(request.state, "auth", None)
     if auth_info is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="身份验证失败，请提供有效的凭据")
@@ -159,20 +224,20 @@ def require_admin(request: Request):
     return auth_info
 
 
-def require_authenticated(request: Request) -> dict[str, Any]:
+async def require_authenticated(request: Request) -> dict[str, Any]:
     auth_info = getattr(request.state, "auth", None)
     if auth_info is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="身份验证失败，请提供有效的凭据")
     return auth_info
 
 
-def require_admin_or_manager(auth_info: dict[str, Any] = Depends(require_authenticated)) -> dict[str, Any]:
+async def require_admin_or_manager(auth_info: dict[str, Any] = Depends(require_authenticated)) -> dict[str, Any]:
     if auth_info.get("role") in {"admin", "manager"}:
         return auth_info
     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="权限不足，需要管理员或调度主管权限")
 
 
-def require_admin_or_fleet_manager(
+async def require_admin_or_fleet_manager(
     fleet_id: int,
     auth_info: dict[str, Any] = Depends(require_authenticated),
 ) -> dict[str, Any]:
@@ -183,7 +248,7 @@ def require_admin_or_fleet_manager(
     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="权限不足，仅允许管理员或该车队调度主管访问")
 
 
-def require_admin_or_manager_self(
+async def require_admin_or_manager_self(
     person_id: str,
     auth_info: dict[str, Any] = Depends(require_authenticated),
 ) -> dict[str, Any]:
@@ -211,7 +276,7 @@ def _parse_prefixed_person_id(value: str, prefix: str) -> int | None:
 def require_admin_manager_or_driver_self(
     person_id: str | int,
     auth_info: dict[str, Any] = Depends(require_authenticated),
-    conn=Depends(get_db),
+    loader: EntityLoader = Depends(get_loader),
 ) -> dict[str, Any]:
     role = auth_info.get("role")
     if role == "admin":
@@ -227,13 +292,8 @@ def require_admin_manager_or_driver_self(
             return auth_info
 
     if role == "manager":
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT fleet_id FROM Drivers WHERE is_deleted = 0 AND person_id = %s",
-            (pid,),
-        )
-        row = cursor.fetchone()
-        if row and row.get("fleet_id") == auth_info.get("fleet_id"):
+        fleet_id = driver_fleet(loader, pid)
+        if fleet_id is not None and fleet_id == auth_info.get("fleet_id"):
             return auth_info
 
     raise HTTPException(
@@ -245,7 +305,7 @@ def require_admin_manager_or_driver_self(
 def require_admin_or_vehicle_fleet_manager(
     vehicle_id: str,
     auth_info: dict[str, Any] = Depends(require_authenticated),
-    conn=Depends(get_db),
+    loader: EntityLoader = Depends(get_loader),
 ) -> dict[str, Any]:
     if auth_info.get("role") == "admin":
         return auth_info
@@ -253,14 +313,9 @@ def require_admin_or_vehicle_fleet_manager(
     if auth_info.get("role") != "manager":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="权限不足，仅允许管理员或调度主管访问")
 
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT fleet_id FROM Vehicles WHERE vehicle_id = %s AND is_deleted = 0",
-        (vehicle_id,),
-    )
-    row = cursor.fetchone()
-    if not row:
+    fleet_id = vehicle_fleet(loader, vehicle_id)
+    if fleet_id is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="找不到车辆记录")
-    if row.get("fleet_id") != auth_info.get("fleet_id"):
+    if fleet_id != auth_info.get("fleet_id"):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="权限不足，仅允许该车辆所属车队调度主管访问")
     return auth_info
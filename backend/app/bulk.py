@@ -0,0 +1,185 @@
+"""批量导入接口的公共部分：流式解析 NDJSON / CSV 请求体，逐行结果暂存后流式返回。
+
+- 请求体按块读取、增量解码、逐行解析，内存只与单行长度和分块大小有关，与上传总量无关；
+- 每行结果写入 SpooledTemporaryFile（超过 1MB 落盘），请求体读完后再以 NDJSON 流式返回。
+  不在上传过程中就开始回写，是为了避免客户端先发完请求再读响应时双方互相阻塞在发送上。
+"""
+
+import codecs
+import csv
+import json
+import tempfile
+import time
+from collections.abc import AsyncIterator, Callable, Iterator
+from typing import Any
+
+from fastapi import HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+
+from app.db import format_db_error, run_db
+
+# 单行最大字符数，超过视为格式错误（防止没有换行的超大请求体占满内存）
+MAX_LINE_LENGTH = 64 * 1024
+BULK_FORMATS = "^(ndjson|csv)$"
+# 每个事务写入的行数
+BULK_CHUNK_SIZE = 500
+# DECIMAL(10,2) 能表示的最大值
+MAX_DECIMAL_10_2 = 99999999.99
+
+
+def active_fleet_exists(fleet_id: int, conn) -> bool:
+    """导入目标车队存在且未删除。"""
+    cursor = conn.cursor(as_dict=False)
+    cursor.execute("SELECT 1 FROM Fleets WHERE fleet_id = %s AND is_deleted = 0", (fleet_id,))
+    return cursor.fetchone() is not None
+
+
+def bulk_format(request: Request, fmt: str | None = None) -> str:
+    """显式 format 参数优先，否则按 Content-Type：text/csv 为 CSV，其余按 NDJSON。"""
+    if fmt:
+        return fmt
+    content_type = request.headers.get("content-type", "").split(";", 1)[0].strip().lower()
+    return "csv" if content_type in {"text/csv", "application/csv"} else "ndjson"
+
+
+async def _iter_lines(request: Request) -> AsyncIterator[tuple[int, str]]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="strict")
+    pending = ""
+    line_no = 0
+    try:
+        async for chunk in request.stream():
+            pending += decoder.decode(chunk)
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                line_no += 1
+                yield line_no, line.rstrip("\r")
+            if len(pending) > MAX_LINE_LENGTH:
+                raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"第 {line_no + 1} 行超过 {MAX_LINE_LENGTH} 个字符")
+        pending += decoder.decode(b"", final=True)
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="请求体不是有效的 UTF-8") from e
+    if pending.strip():
+        yield line_no + 1, pending.rstrip("\r")
+
+
+async def iter_records(request: Request, fmt: str) -> AsyncIterator[tuple[int, dict[str, Any] | None, str | None]]:
+    """逐行产出 (行号, 记录, 错误)。CSV 第一行为表头，每条记录占一行；空行跳过。"""
+    header: list[str] | None = None
+    async for line_no, line in _iter_lines(request):
+        if not line.strip():
+            continue
+        if fmt == "csv":
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [h.strip() for h in values]
+                continue
+            if len(values) != len(header):
+                yield line_no, None, f"列数应为 {len(header)}，实际为 {len(values)}"
+                continue
+            yield line_no, dict(zip(header, values)), None
+        else:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line_no, None, "不是有效的 JSON"
+                continue
+            if not isinstance(record, dict):
+                yield line_no, None, "每行应为一个 JSON 对象"
+                continue
+            yield line_no, record, None
+
+
+def validation_message(err) -> str:
+    """pydantic ValidationError 转为“字段: 原因”形式的一句话，只取第一条错误。"""
+    first = err.errors()[0]
+    field = ".".join(str(x) for x in first.get("loc", ())) or "记录"
+    return f"{field}: {first.get('msg', '格式错误')}"
+
+
+class ResultSpool:
+    """逐行结果的暂存区：写入 NDJSON，读完请求体后用 iter_bytes 流式返回。"""
+
+    def __init__(self, max_memory: int = 1024 * 1024):
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_memory, mode="w+b")
+
+    def write(self, item: dict[str, Any]) -> None:
+        self._file.write(json.dumps(item, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+
+    def iter_bytes(self, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        try:
+            self._file.seek(0)
+            while True:
+                chunk = self._file.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self._file.close()
+
+
+async def bulk_import(
+    request: Request,
+    fmt: str,
+    parse: Callable[[dict[str, Any]], tuple[Any, str | None]],
+    write_chunk: Callable[..., dict[int, dict[str, Any]]],
+    *,
+    rejected: Callable[[Any], str] = lambda row: "写入失败",
+    on_written: Callable[[Any, dict[str, Any]], None] | None = None,
+    chunk_size: int = BULK_CHUNK_SIZE,
+) -> StreamingResponse:
+    """批量导入的通用流程：边读边校验，每 chunk_size 行调用一次 write_chunk(rows, conn=...) 写库。
+
+    - parse(record) 返回 (行对象, 错误)，错误非空时该行直接记为失败；
+    - write_chunk 收到 [(行号, 行对象)]，在一个事务内写入并返回 {行号: 附加到结果里的字段}，
+      未出现在返回值中的行记为失败，原因由 rejected(行对象) 给出；整批抛异常时该批全部失败；
+    - on_written(行对象, 字段) 在每行写入成功后调用，用于维护进程内缓存。
+    返回 NDJSON：每行一条 {line, ok, ...字段 | error}，最后一行为 summary。
+    """
+    spool = ResultSpool()
+    chunk: list[tuple[int, Any]] = []
+    counts = {"rows": 0, "inserted": 0, "failed": 0}
+    start = time.perf_counter()
+
+    async def flush() -> None:
+        try:
+            written = await run_db(write_chunk, chunk)
+        except Exception as e:
+            written, error = {}, f"写入失败: {format_db_error(e)}"
+        else:
+            error = None
+        for line, row in chunk:
+            fields = written.get(line)
+            if fields is None:
+                counts["failed"] += 1
+                spool.write({"line": line, "ok": False, "error": error or rejected(row)})
+                continue
+            counts["inserted"] += 1
+            spool.write({"line": line, "ok": True, **fields})
+            if on_written is not None:
+                on_written(row, fields)
+        chunk.clear()
+
+    async for line, record, error in iter_records(request, fmt):
+        counts["rows"] += 1
+        row = None
+        if error is None:
+            row, error = parse(record)
+        if error is not None:
+            counts["failed"] += 1
+            spool.write({"line": line, "ok": False, "error": error})
+            continue
+        chunk.append((line, row))
+        if len(chunk) >= chunk_size:
+            await flush()
+    if chunk:
+        await flush()
+
+    elapsed = time.perf_counter() - start
+    spool.write({
+        "summary": {
+            **counts,
+            "elapsed_ms": round(elapsed * 1000, 3),
+            "rows_per_sec": round(counts["rows"] / elapsed, 1) if elapsed > 0 else None,
+        }
+    })
+    return StreamingResponse(spool.iter_bytes(), media_type="application/x-ndjson")
@@ -0,0 +1,173 @@
+"""可接单车辆（空闲/装货中）的剩余容量索引，用于给运单推荐车辆。
+
+车辆按 (剩余载重, 剩余容积, vehicle_id) 升序排列，查询时二分定位到第一辆载重够用的车，
+顺序往后取容积也够用的车即为“剩余空间最少”的最佳匹配，无需扫描全部车辆。
+索引是进程内快照：本进程内的分配/车辆状态变更提交后调用 invalidate(涉及的车辆)，
+下一次查询时只从 View_VehicleResourceStatus 重新读取这些车辆并原地更新；
+超过 CAPACITY_INDEX_TTL 秒（其他进程的写入）或 invalidate() 不带车辆时整体重新加载。
+推荐结果仅供选择，超载仍由 trg_CheckOverload 兜底。
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Iterable
+
+CANDIDATE_STATUSES = ("空闲", "装货中")
+
+# 待更新的车辆超过这个数量时直接整体重新加载
+MAX_PARTIAL_REFRESH = 500
+
+
+def _sort_key(r: dict[str, Any]) -> tuple:
+    return (r["remaining_weight"], r["remaining_volume"], r["vehicle_id"])
+
+
+class _Bucket:
+    __slots__ = ("order", "rows")
+
+    def __init__(self, rows: list[dict[str, Any]]):
+        rows.sort(key=_sort_key)
+        self.rows = rows
+        self.order = [_sort_key(r) for r in rows]
+
+    def add(self, row: dict[str, Any]) -> None:
+        key = _sort_key(row)
+        i = bisect_left(self.order, key)
+        self.order.insert(i, key)
+        self.rows.insert(i, row)
+
+    def remove(self, row: dict[str, Any]) -> None:
+        i = bisect_left(self.order, _sort_key(row))
+        del self.order[i], self.rows[i]
+
+    def best_fit(self, weight: float, volume: float, q: str, limit: int) -> list[dict[str, Any]]:
+        result = []
+        for i in range(bisect_left(self.order, (weight,)), len(self.rows)):
+            r = self.rows[i]
+            if r["remaining_volume"] < volume or (q and q not in r["vehicle_id"]):
+                continue
+            result.append(r)
+            if len(result) >= limit:
+                break
+        return result
+
+
+class CapacityIndex:
+    def __init__(self, ttl: float = 5.0):
+        self.ttl = ttl
+        # _lock 保护索引本身，持有时间很短；_refresh_lock 保证同一时间只有一个请求在查库刷新，查库时不持有 _lock
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._rows: dict[str, dict[str, Any]] = {}
+        self._all = _Bucket([])
+        self._by_fleet: dict[int, _Bucket] = {}
+        self._loaded_at = 0.0
+        self._full_reload = True
+        self._dirty: set[str] = set()
+
+    def invalidate(self, vehicle_ids: Iterable[str] | None = None) -> None:
+        """vehicle_ids 为这次写入涉及的车辆；不知道涉及哪些车辆时不传，下次查询整体重新加载。"""
+        with self._lock:
+            if vehicle_ids is None:
+                self._full_reload = True
+                self._dirty.clear()
+            elif not self._full_reload:
+                self._dirty.update(vehicle_ids)
+                if len(self._dirty) > MAX_PARTIAL_REFRESH:
+                    self._full_reload = True
+                    self._dirty.clear()
+
+    def _needs_full(self) -> bool:
+        return self._full_reload or time.monotonic() - self._loaded_at >= self.ttl
+
+    def _fetch(self, conn, vehicle_ids: list[str] | None) -> list[dict[str, Any]]:
+        sql = (
+            "SELECT vehicle_id, fleet_id, vehicle_status, max_weight, max_volume, remaining_weight, remaining_volume "
+            "FROM View_VehicleResourceStatus WHERE vehicle_status IN (%s, %s)"
+        )
+        params: list[Any] = list(CANDIDATE_STATUSES)
+        if vehicle_ids is not None:
+            sql += f" AND vehicle_id IN ({', '.join(['%s'] * len(vehicle_ids))})"
+            params += vehicle_ids
+        cursor = conn.cursor()
+        cursor.execute(sql, tuple(params))
+        rows = cursor.fetchall()
+        for r in rows:
+            for k in ("max_weight", "max_volume", "remaining_weight", "remaining_volume"):
+                r[k] = float(r[k])
+        return rows
+
+    def _replace_all(self, rows: list[dict[str, Any]]) -> None:
+        grouped: dict[int, list[dict[str, Any]]] = {}
+        for r in rows:
+            grouped.setdefault(r["fleet_id"], []).append(r)
+        self._by_fleet = {fleet_id: _Bucket(items) for fleet_id, items in grouped.items()}
+        self._all = _Bucket(list(rows))
+        self._rows = {r["vehicle_id"]: r for r in rows}
+
+    def _apply(self, vehicle_ids: list[str], rows: list[dict[str, Any]]) -> None:
+        """用重新读取的行替换这些车辆在索引中的位置；不再可接单（查不到）的车辆移出索引。"""
+        for vehicle_id in vehicle_ids:
+            old = self._rows.pop(vehicle_id, None)
+            if old is not None:
+                self._all.remove(old)
+                self._by_fleet[old["fleet_id"]].remove(old)
+        for r in rows:
+            self._rows[r["vehicle_id"]] = r
+            self._all.add(r)
+            bucket = self._by_fleet.get(r["fleet_id"])
+            if bucket is None:
+                self._by_fleet[r["fleet_id"]] = _Bucket([r])
+            else:
+                bucket.add(r)
+
+    def _refresh(self, conn) -> None:
+        with self._lock:
+            if not self._needs_full() and not self._dirty:
+                return
+        with self._refresh_lock:
+            with self._lock:
+                full = self._needs_full()
+                dirty = [] if full else list(self._dirty)
+                if not full and not dirty:
+                    return
+                # 先取走待办：查库期间新发生的失效留给下一次刷新
+                self._full_reload = False
+                self._dirty.clear()
+            try:
+                rows = self._fetch(conn, None if full else dirty)
+            except Exception:
+                with self._lock:
+                    if full:
+                        self._full_reload = True
+                    else:
+                        self._dirty.update(dirty)
+                raise
+            with self._lock:
+                if full:
+                    self._replace_all(rows)
+                    self._loaded_at = time.monotonic()
+                else:
+                    self._apply(dirty, rows)
+
+    def candidates(
+        self,
+        conn,
+        weight: float,
+        volume: float,
+        fleet_id: int | None = None,
+        q: str = "",
+        limit: int = 10,
+    ) -> list[dict[str, Any]]:
+        """剩余载重、容积都不小于 weight/volume 的车辆，按剩余载重、剩余容积从小到大。"""
+        self._refresh(conn)
+        with self._lock:
+            bucket = self._all if fleet_id is None else self._by_fleet.get(fleet_id)
+            if bucket is None:
+                return []
+            return bucket.best_fit(weight, volume, q, limit)
+
+
+capacity_index = CapacityIndex(ttl=float(os.getenv("CAPACITY_INDEX_TTL", "5")))
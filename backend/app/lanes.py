@@ -0,0 +1,182 @@
+"""待处理运单的线路（起点 → 终点）索引，用于拼车建议。
+
+起止地址是自由文本，先做归一化（全角转半角、忽略大小写、去掉空白和标点）再作为线路键。
+索引只保存待处理运单：首次使用时按 order_status 索引加载一次，之后
+- 本进程内新建、分配、取消运单时由接口调用 add/discard 增量维护；
+- 每次查询前 sync 只按主键范围补齐其他进程新建的运单，并按主键复核将要返回的运单是否仍待处理；
+- 自增主键的提交顺序不一定与取值顺序一致，较小的 order_id 晚提交时会落在水位以下，
+  因此每隔 resync_interval 秒整体重新加载一次，这类运单最迟在下次整体加载时出现。
+"""
+
+import os
+import re
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from typing import Any
+
+_NOISE = re.compile(r"[\W_]+", re.UNICODE)
+# 每批复核的 ID 个数，控制单条 SQL 的长度
+_VERIFY_CHUNK = 1000
+
+
+def normalize_place(value: str | None) -> str:
+    text = unicodedata.normalize("NFKC", value or "").casefold()
+    return _NOISE.sub("", text)
+
+
+@dataclass(frozen=True)
+class LaneOrder:
+    order_id: int
+    weight: float
+    volume: float
+
+
+class _Lane:
+    __slots__ = ("origin", "destination", "orders")
+
+    def __init__(self, origin: str, destination: str):
+        self.origin = origin
+        self.destination = destination
+        self.orders: dict[int, LaneOrder] = {}
+
+
+class LaneIndex:
+    def __init__(self, resync_interval: float = 60.0):
+        self.resync_interval = resync_interval
+        # _lock 保护索引本身；_sync_lock 保证同一时间只有一个请求在查库同步，查库时不持有 _lock
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._lanes: dict[tuple[str, str], _Lane] = {}
+        self._lane_of: dict[int, tuple[str, str]] = {}
+        self._loaded_at: float | None = None
+        # 已经同步到的最大 order_id，两次整体加载之间只补齐比它大的运单
+        self._watermark = 0
+        # 整体加载查库期间本进程内的 add/discard，替换快照后重放，避免被较早读到的快照覆盖
+        self._replay: list[tuple] | None = None
+
+    def add(self, order_id: int, origin: str, destination: str, weight: float, volume: float) -> None:
+        with self._lock:
+            self._add(order_id, origin, destination, weight, volume)
+            if self._replay is not None:
+                self._replay.append((order_id, origin, destination, weight, volume))
+
+    def _add(self, order_id: int, origin: str, destination: str, weight: float, volume: float) -> None:
+        key = (normalize_place(origin), normalize_place(destination))
+        self._discard(order_id)
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = _Lane(origin.strip(), destination.strip())
+        lane.orders[order_id] = LaneOrder(order_id, float(weight), float(volume))
+        self._lane_of[order_id] = key
+
+    def discard(self, *order_ids: int) -> None:
+        with self._lock:
+            for order_id in order_ids:
+                self._discard(order_id)
+                if self._replay is not None:
+                    self._replay.append((order_id,))
+
+    def _discard(self, order_id: int) -> None:
+        key = self._lane_of.pop(order_id, None)
+        if key is None:
+            return
+        lane = self._lanes[key]
+        lane.orders.pop(order_id, None)
+        if not lane.orders:
+            del self._lanes[key]
+
+    def sync(self, conn) -> None:
+        with self._sync_lock:
+            with self._lock:
+                full = self._loaded_at is None or time.monotonic() - self._loaded_at >= self.resync_interval
+                watermark = self._watermark
+                if full:
+                    self._replay = []
+            try:
+                cursor = conn.cursor()
+                cursor.execute("SELECT ISNULL(MAX(order_id), 0) AS max_id FROM Orders")
+                max_id = int(cursor.fetchone()["max_id"])
+                if full:
+                    cursor.execute(
+                        "SELECT order_id, origin, destination, weight, volume FROM Orders "
+                        "WHERE order_status = N'待处理' AND is_deleted = 0 AND order_id <= %s",
+                        (max_id,),
+                    )
+                elif max_id > watermark:
+                    cursor.execute(
+                        "SELECT order_id, origin, destination, weight, volume FROM Orders "
+                        "WHERE order_id > %s AND order_id <= %s AND order_status = N'待处理' AND is_deleted = 0",
+                        (watermark, max_id),
+                    )
+                else:
+                    return
+                rows = cursor.fetchall()
+            except Exception:
+                with self._lock:
+                    self._replay = None
+                raise
+            with self._lock:
+                if full:
+                    replay, self._replay = self._replay or [], None
+                    self._lanes, self._lane_of = {}, {}
+                    for r in rows:
+                        self._add(r["order_id"], r["origin"], r["destination"], r["weight"], r["volume"])
+                    for change in replay:
+                        if len(change) == 1:
+                            self._discard(change[0])
+                        else:
+                            self._add(*change)
+                    self._loaded_at = time.monotonic()
+                else:
+                    for r in rows:
+                        self._add(r["order_id"], r["origin"], r["destination"], r["weight"], r["volume"])
+                self._watermark = max(self._watermark, max_id)
+
+    def verify(self, conn, order_ids: list[int]) -> set[int]:
+        """按主键复核运单是否仍待处理（可能已被其他进程分配或取消），剔除失效的，返回仍有效的 ID。"""
+        cursor = conn.cursor()
+        valid: set[int] = set()
+        for i in range(0, len(order_ids), _VERIFY_CHUNK):
+            chunk = order_ids[i:i + _VERIFY_CHUNK]
+            cursor.execute(
+                f"SELECT order_id FROM Orders WHERE order_id IN ({', '.join(['%s'] * len(chunk))}) "
+                "AND order_status = N'待处理' AND is_deleted = 0",
+                tuple(chunk),
+            )
+            alive = {r["order_id"] for r in cursor.fetchall()}
+            self.discard(*(oid for oid in chunk if oid not in alive))
+            valid |= alive
+        return valid
+
+    def lanes(self, min_orders: int = 2, limit: int | None = None) -> list[dict[str, Any]]:
+        """运单数不少于 min_orders 的线路，按运单数从多到少。"""
+        with self._lock:
+            result = [
+                {"origin": lane.origin, "destination": lane.destination, "orders": list(lane.orders.values())}
+                for lane in self._lanes.values()
+                if len(lane.orders) >= min_orders
+            ]
+        result.sort(key=lambda x: (-len(x["orders"]), x["origin"], x["destination"]))
+        return result[:limit] if limit is not None else result
+
+
+def pack_lane(orders: list[LaneOrder], max_weight: float, max_volume: float) -> list[list[LaneOrder]]:
+    """同一线路内按首次适配递减把运单拼成若干车次，每车次不超过给定的载重与容积。"""
+    loads: list[tuple[list[LaneOrder], list[float]]] = []
+    for o in sorted(orders, key=lambda o: (-o.weight, -o.volume, o.order_id)):
+        if o.weight > max_weight or o.volume > max_volume:
+            continue
+        for items, used in loads:
+            if used[0] + o.weight <= max_weight and used[1] + o.volume <= max_volume:
+                items.append(o)
+                used[0] += o.weight
+                used[1] += o.volume
+                break
+        else:
+            loads.append(([o], [o.weight, o.volume]))
+    return [items for items, _ in loads]
+
+
+lane_index = LaneIndex(resync_interval=float(os.getenv("LANE_INDEX_RESYNC", "60")))
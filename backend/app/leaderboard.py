@@ -0,0 +1,240 @@
+"""司机排行榜：本周 / 本月完成运单数、异常数、罚款合计的 Top-N 与 Bottom-N，按车队或配送中心排名。
+
+每个周期（周从周一开始、月从 1 日开始）首次查询时用一条按日期范围聚合的语句加载全部在职司机的计数，
+之后按 (车队 | 配送中心, 指标) 各维护一个有序结构：
+- 本进程写入完成记录、新增 / 删除异常并提交后调用 record*，只改动涉及的司机，每次 O(log n)；
+- 读取 Top-N / Bottom-N 从有序结构的一端顺序取 k 个，O(k)。
+其他进程的写入在快照超过 LEADERBOARD_TTL 秒后重新加载时可见；只保留最近 LEADERBOARD_PERIODS 个周期的快照。
+加载快照时不持有索引锁，加载完成后才换入；加载期间的 record* 不会补到新快照上——
+查询可能已经读到了这些写入，补上会重复计数，没读到的部分在下次重新加载时补齐。
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Any, Iterable, Iterator
+
+METRICS = ("orders", "incidents", "fines")
+PERIODS = "^(week|month)$"
+
+
+def period_range(kind: str, day: date) -> tuple[date, date]:
+    """包含 day 的周期 [start, end)。"""
+    if kind == "week":
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=7)
+    start = day.replace(day=1)
+    end = date(start.year + 1, 1, 1) if start.month == 12 else date(start.year, start.month + 1, 1)
+    return start, end
+
+
+class _Ranking:
+    """有序键集合：分段存放的有序列表，每段不超过 2 * _LOAD 个键。
+
+    插入 / 删除先在各段最大值上二分定位段，再在段内二分，段长有上限，因此为 O(log n)；从两端顺序取 k 个为 O(k)。
+    """
+
+    _LOAD = 256
+
+    def __init__(self, keys: Iterable[tuple] = ()):
+        ordered = sorted(keys)
+        self._lists = [ordered[i:i + self._LOAD] for i in range(0, len(ordered), self._LOAD)]
+        self._maxes = [lst[-1] for lst in self._lists]
+
+    def add(self, key: tuple) -> None:
+        if not self._lists:
+            self._lists.append([key])
+            self._maxes.append(key)
+            return
+        i = min(bisect_left(self._maxes, key), len(self._lists) - 1)
+        lst = self._lists[i]
+        insort(lst, key)
+        self._maxes[i] = lst[-1]
+        if len(lst) > 2 * self._LOAD:
+            self._lists[i:i + 1] = [lst[:self._LOAD], lst[self._LOAD:]]
+            self._maxes[i:i + 1] = [lst[self._LOAD - 1], lst[-1]]
+
+    def remove(self, key: tuple) -> None:
+        i = bisect_left(self._maxes, key)
+        lst = self._lists[i]
+        del lst[bisect_left(lst, key)]
+        if lst:
+            self._maxes[i] = lst[-1]
+        else:
+            del self._lists[i], self._maxes[i]
+
+    def head(self, k: int) -> Iterator[tuple]:
+        for lst in self._lists:
+            for key in lst:
+                if k <= 0:
+                    return
+                yield key
+                k -= 1
+
+    def tail(self, k: int) -> Iterator[tuple]:
+        for lst in reversed(self._lists):
+            for key in reversed(lst):
+                if k <= 0:
+                    return
+                yield key
+                k -= 1
+
+
+class _Driver:
+    __slots__ = ("person_id", "person_name", "fleet_id", "center_id", "values")
+
+    def __init__(self, person_id: int, person_name: str, fleet_id: int, center_id: int, values: list):
+        self.person_id = person_id
+        self.person_name = person_name
+        self.fleet_id = fleet_id
+        self.center_id = center_id
+        self.values = values
+
+
+class _Period:
+    def __init__(self, start: date, end: date, drivers: dict[int, _Driver]):
+        self.start = start
+        self.end = end
+        self.loaded_at = time.monotonic()
+        self.drivers = drivers
+        # (scope, scope_id, metric 下标) -> 键为 (-值, person_id) 的有序结构，值大的在前
+        grouped: dict[tuple[str, int, int], list[tuple]] = {}
+        for d in drivers.values():
+            for m, value in enumerate(d.values):
+                grouped.setdefault(("fleet", d.fleet_id, m), []).append((-value, d.person_id))
+                grouped.setdefault(("center", d.center_id, m), []).append((-value, d.person_id))
+        self.rankings: dict[tuple[str, int, int], _Ranking] = {key: _Ranking(keys) for key, keys in grouped.items()}
+
+    def apply(self, person_id: int, deltas: tuple) -> None:
+        d = self.drivers.get(person_id)
+        if d is None:
+            # 快照加载之后才入职的司机，等下次重新加载
+            return
+        for m, delta in enumerate(deltas):
+            if not delta:
+                continue
+            old = d.values[m]
+            new = round(old + delta, 2) if m == 2 else old + delta
+            d.values[m] = new
+            for scope, scope_id in (("fleet", d.fleet_id), ("center", d.center_id)):
+                ranking = self.rankings[(scope, scope_id, m)]
+                ranking.remove((-old, person_id))
+                ranking.add((-new, person_id))
+
+
+class LeaderboardIndex:
+    def __init__(self, ttl: float = 60.0, max_periods: int = 8):
+        self.ttl = ttl
+        self.max_periods = max_periods
+        # _lock 保护已加载的快照，持有时间很短；_load_lock 保证同一时间只有一个请求在查库加载
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._periods: OrderedDict[tuple[str, date], _Period] = OrderedDict()
+        # invalidate() 时递增；加载期间被清空过的快照只用于本次返回，不再换入
+        self._generation = 0
+
+    def _load(self, conn, start: date, end: date) -> _Period:
+        cursor = conn.cursor()
+        # 按日期范围聚合，分别走 CompletedOrder (completed_at)、Incidents (occurrence_time) 索引；
+        # 从 Drivers 出发，没有记录的司机计数为 0，Bottom-N 才有意义
+        cursor.execute(
+            "SELECT d.person_id, d.person_name, d.fleet_id, f.center_id, "
+            "ISNULL(o.n, 0) AS orders, ISNULL(i.n, 0) AS incidents, ISNULL(i.fines, 0) AS fines "
+            "FROM Drivers d JOIN Fleets f ON f.fleet_id = d.fleet_id "
+            "LEFT JOIN (SELECT person_id, COUNT(*) AS n FROM CompletedOrder "
+            "WHERE completed_at >= %s AND completed_at < %s GROUP BY person_id) o ON o.person_id = d.person_id "
+            "LEFT JOIN (SELECT driver_id, COUNT(*) AS n, SUM(fine_amount) AS fines FROM Incidents "
+            "WHERE is_deleted = 0 AND occurrence_time >= %s AND occurrence_time < %s GROUP BY driver_id) i "
+            "ON i.driver_id = d.person_id "
+            "WHERE d.is_deleted = 0",
+            (start, end, start, end),
+        )
+        drivers = {
+            r["person_id"]: _Driver(
+                r["person_id"],
+                r["person_name"],
+                r["fleet_id"],
+                r["center_id"],
+                [int(r["orders"]), int(r["incidents"]), round(float(r["fines"]), 2)],
+            )
+            for r in cursor.fetchall()
+        }
+        return _Period(start, end, drivers)
+
+    def _fresh(self, key: tuple[str, date]) -> _Period | None:
+        period = self._periods.get(key)
+        if period is None or time.monotonic() - period.loaded_at >= self.ttl:
+            return None
+        return period
+
+    def ranking(
+        self,
+        conn,
+        kind: str,
+        day: date,
+        metric: str,
+        scope: str,
+        scope_id: int,
+        limit: int = 10,
+        bottom: bool = False,
+    ) -> tuple[date, date, list[dict[str, Any]]]:
+        """scope 为 fleet / center。返回 (周期第一天, 周期最后一天, 排名行)。"""
+        start, end = period_range(kind, day)
+        key = (kind, start)
+        with self._lock:
+            period = self._fresh(key)
+            generation = self._generation
+        if period is None:
+            with self._load_lock:
+                with self._lock:
+                    period = self._fresh(key)
+                    generation = self._generation
+                if period is None:
+                    period = self._load(conn, start, end)
+        with self._lock:
+            if generation == self._generation:
+                self._periods[key] = period
+                self._periods.move_to_end(key)
+                while len(self._periods) > self.max_periods:
+                    self._periods.popitem(last=False)
+            m = METRICS.index(metric)
+            ranking = period.rankings.get((scope, scope_id, m))
+            keys = [] if ranking is None else list(ranking.tail(limit) if bottom else ranking.head(limit))
+            rows = []
+            for rank, (_, person_id) in enumerate(keys, 1):
+                d = period.drivers[person_id]
+                rows.append({
+                    "rank": rank,
+                    "person_id": f"D{person_id}",
+                    "person_name": d.person_name,
+                    "fleet_id": d.fleet_id,
+                    **dict(zip(METRICS, d.values)),
+                })
+        return start, end - timedelta(days=1), rows
+
+    def record(self, person_id: int, day: date, orders: int = 0, incidents: int = 0, fines: float = 0.0) -> None:
+        """本进程提交的写入：更新已加载且包含 day 的周期快照。"""
+        deltas = (orders, incidents, round(float(fines), 2))
+        with self._lock:
+            for period in self._periods.values():
+                if period.start <= day < period.end:
+                    period.apply(person_id, deltas)
+
+    def record_completions(self, completions: Iterable[tuple[int, date, int]]) -> None:
+        """completions 为 (person_id, completed_at, 完成单数)。"""
+        for person_id, day, n in completions:
+            self.record(person_id, day, orders=n)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._periods.clear()
+            self._generation += 1
+
+
+leaderboard = LeaderboardIndex(
+    ttl=float(os.getenv("LEADERBOARD_TTL", "60")),
+    max_periods=int(os.getenv("LEADERBOARD_PERIODS", "8")),
+)
@@ -0,0 +1,82 @@
+"""请求级实体加载器（identity map）。
+
+同一个请求里，鉴权依赖和接口函数经常按主键查同一条记录（如先确认车辆归属、再读车辆状态）。
+EntityLoader 挂在 request.state.loader 上，由 get_loader 依赖提供，同一请求内共用一份：
+每个主键最多查一次，查不到的结果也会记住；vehicles() 可一次性批量加载多辆车。
+"""
+
+from typing import Any, Iterable
+
+from fastapi import Depends, Request
+
+from app.db import get_db
+
+# 车辆行附带当前分配的司机（Assignments 中 vehicle_id 唯一，且只认未删除的司机）
+VEHICLE_SQL = (
+    "SELECT v.vehicle_id, v.max_weight, v.max_volume, v.vehicle_status, v.fleet_id, "
+    "a.person_id AS driver_id, d.fleet_id AS driver_fleet_id "
+    "FROM Vehicles v "
+    "LEFT JOIN Assignments a ON a.vehicle_id = v.vehicle_id "
+    "LEFT JOIN Drivers d ON d.person_id = a.person_id AND d.is_deleted = 0 "
+    "WHERE v.is_deleted = 0 AND "
+)
+DRIVER_SQL = (
+    "SELECT person_id, person_name, driver_license, driver_status, person_contact, fleet_id "
+    "FROM Drivers WHERE is_deleted = 0 AND person_id = %s"
+)
+# fleet_id 取自异常记录所属车辆，车辆已删除时为 NULL
+INCIDENT_SQL = (
+    "SELECT i.incident_id, i.vehicle_id, i.driver_id, i.incident_type, i.fine_amount, "
+    "i.incident_description, i.handle_status, i.occurrence_time, v.fleet_id "
+    "FROM Incidents i LEFT JOIN Vehicles v ON v.vehicle_id = i.vehicle_id AND v.is_deleted = 0 "
+    "WHERE i.is_deleted = 0 AND i.incident_id = %s"
+)
+
+
+class EntityLoader:
+    def __init__(self, conn):
+        self.conn = conn
+        self._vehicles: dict[str, dict[str, Any] | None] = {}
+        self._drivers: dict[int, dict[str, Any] | None] = {}
+        self._incidents: dict[int, dict[str, Any] | None] = {}
+
+    def vehicle(self, vehicle_id: str) -> dict[str, Any] | None:
+        if vehicle_id not in self._vehicles:
+            self.vehicles([vehicle_id])
+        return self._vehicles[vehicle_id]
+
+    def vehicles(self, vehicle_ids: Iterable[str]) -> dict[str, dict[str, Any] | None]:
+        """批量加载，只查询尚未加载过的 ID；返回 {vehicle_id: 行或 None}。"""
+        ids = list(dict.fromkeys(vehicle_ids))
+        missing = [vid for vid in ids if vid not in self._vehicles]
+        if missing:
+            cursor = self.conn.cursor()
+            placeholders = ", ".join(["%s"] * len(missing))
+            cursor.execute(VEHICLE_SQL + f"v.vehicle_id IN ({placeholders})", tuple(missing))
+            found = {row["vehicle_id"]: row for row in cursor.fetchall()}
+            for vid in missing:
+                self._vehicles[vid] = found.get(vid)
+        return {vid: self._vehicles[vid] for vid in ids}
+
+    def driver(self, person_id: int) -> dict[str, Any] | None:
+        if person_id not in self._drivers:
+            cursor = self.conn.cursor()
+            cursor.execute(DRIVER_SQL, (person_id,))
+            self._drivers[person_id] = cursor.fetchone()
+        return self._drivers[person_id]
+
+    def incident(self, incident_id: int) -> dict[str, Any] | None:
+        if incident_id not in self._incidents:
+            cursor = self.conn.cursor()
+            cursor.execute(INCIDENT_SQL, (incident_id,))
+            self._incidents[incident_id] = cursor.fetchone()
+        return self._incidents[incident_id]
+
+
+
+def get_loader(request: Request, conn=Depends(get_db)) -> EntityLoader:
+    loader = getattr(request.state, "loader", None)
+    if loader is None:
+        loader = EntityLoader(conn)
+        request.state.loader = loader
+    return loader
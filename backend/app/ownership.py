@@ -0,0 +1,85 @@
+"""车辆 / 司机 / 异常记录 → 所属车队 的归属缓存。
+
+调度主管的鉴权依赖每次都要确认目标对象属于自己的车队，而这些归属关系几乎不变，
+因此缓存在进程内，命中时不再访问数据库；未命中时经请求级 EntityLoader 加载，与接口函数共用同一行。
+移动或删除车辆、司机的接口需显式调用 invalidate_*。
+查不到（不存在或已软删除）的结果不缓存。
+"""
+
+import os
+
+from app.cache import TTLCache
+from app.loader import EntityLoader
+
+_ttl = float(os.getenv("OWNERSHIP_CACHE_TTL", "300"))
+_size = int(os.getenv("OWNERSHIP_CACHE_SIZE", "10000"))
+
+_vehicle_fleet = TTLCache(max_entries=_size, ttl=_ttl)
+_driver_fleet = TTLCache(max_entries=_size, ttl=_ttl)
+# incident_id -> (fleet_id, vehicle_id)，保留 vehicle_id 以便车辆删除时连带失效
+_incident_fleet = TTLCache(max_entries=_size, ttl=_ttl)
+
+
+def vehicle_fleet(loader: EntityLoader, vehicle_id: str) -> int | None:
+    fleet_id = _vehicle_fleet.get(vehicle_id)
+    if fleet_id is not None:
+        return fleet_id
+    row = loader.vehicle(vehicle_id)
+    if not row:
+        return None
+    _vehicle_fleet.set(vehicle_id, row["fleet_id"])
+    return row["fleet_id"]
+
+
+def cached_vehicle_fleet(vehicle_id: str) -> int | None:
+    """只查缓存，不访问数据库；未缓存时返回 None。"""
+    return _vehicle_fleet.get(vehicle_id)
+
+
+def driver_fleet(loader: EntityLoader, person_id: int) -> int | None:
+    fleet_id = _driver_fleet.get(person_id)
+    if fleet_id is not None:
+        return fleet_id
+    row = loader.driver(person_id)
+    if not row:
+        return None
+    _driver_fleet.set(person_id, row["fleet_id"])
+    return row["fleet_id"]
+
+
+def incident_fleet(loader: EntityLoader, incident_id: int) -> int | None:
+    """异常记录所属车队（按其车辆归属）；记录或车辆已删除时返回 None。"""
+    cached = _incident_fleet.get(incident_id)
+    if cached is not None:
+        return cached[0]
+    row = loader.incident(incident_id)
+    if not row or row["fleet_id"] is None:
+        return None
+    _incident_fleet.set(incident_id, (row["fleet_id"], row["vehicle_id"]))
+    return row["fleet_id"]
+
+
+def invalidate_vehicle(vehicle_id: str) -> None:
+    _vehicle_fleet.pop(vehicle_id)
+    _incident_fleet.discard_where(lambda _, v: v[1] == vehicle_id)
+
+
+def invalidate_driver(person_id: int) -> None:
+    _driver_fleet.pop(person_id)
+
+
+def invalidate_incident(incident_id: int) -> None:
+    _incident_fleet.pop(incident_id)
+
+
+def invalidate_fleet(fleet_id: int) -> None:
+    """车队被删除时连带软删除其车辆和司机。"""
+    _vehicle_fleet.discard_where(lambda _, v: v == fleet_id)
+    _driver_fleet.discard_where(lambda _, v: v == fleet_id)
+    _incident_fleet.discard_where(lambda _, v: v[0] == fleet_id)
+
+
+def invalidate_all() -> None:
+    _vehicle_fleet.clear()
+    _driver_fleet.clear()
+    _incident_fleet.clear()
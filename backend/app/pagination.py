@@ -0,0 +1,196 @@
+import base64
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any
+
+from fastapi import HTTPException, status
+
+# count=estimate 时最多向后数多少页，超过则不再给出 total，只返回 has_more
+ESTIMATE_PAGES = 10
+
+COUNT_MODES = "^(exact|estimate|none)$"
+
+
+@dataclass(frozen=True)
+class SortKey:
+    """列表排序键：expr 为 SQL 中的排序表达式（如 i.incident_id），需能唯一确定一行。"""
+
+    expr: str
+    desc: bool = False
+
+
+@dataclass(frozen=True)
+class Page:
+    """分页参数：传 after/before 时走游标分页（keyset），否则兼容原有的 limit/offset。
+
+    count 控制总数的计算方式：
+    - exact：与分页数据在同一条语句里用 COUNT(*) OVER() 得到精确总数
+    - estimate：只数到当前位置之后 ESTIMATE_PAGES 页，数不完时 total 为 None
+    - none：不计算总数，只返回 has_more
+    游标翻页时 exact / estimate 都按 none 处理（total 为 None），总数以第一页为准。
+    """
+
+    limit: int
+    offset: int = 0
+    after: str | None = None
+    before: str | None = None
+    count: str = "exact"
+
+    @property
+    def is_keyset(self) -> bool:
+        return bool(self.after or self.before)
+
+    @property
+    def is_backward(self) -> bool:
+        return bool(self.before) and not self.after
+
+
+@dataclass
+class PageResult:
+    rows: list[dict[str, Any]]
+    total: int | None
+    has_more: bool
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
+
+    def meta(self) -> dict[str, Any]:
+        """供 XxxSelect(data=..., **result.meta()) 使用。"""
+        return {
+            "total": self.total,
+            "has_more": self.has_more,
+            "next_cursor": self.next_cursor,
+            "prev_cursor": self.prev_cursor,
+        }
+
+
+def encode_cursor(values: list[Any]) -> str:
+    values = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in values]
+    raw = json.dumps(values, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, size: int) -> list[Any]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="分页游标无效")
+    return values
+
+
+def _seek_predicate(keys: tuple[SortKey, ...], values: list[Any], forward: bool) -> tuple[str, list[Any]]:
+    """展开为 (k1 > v1) OR (k1 = v1 AND k2 > v2) ...，每个键按自身方向取比较符。"""
+    branches = []
+    params: list[Any] = []
+    for i, key in enumerate(keys):
+        terms = []
+        for prev, prev_value in zip(keys[:i], values[:i]):
+            terms.append(f"{prev.expr} = %s")
+            params.append(prev_value)
+        op = ">" if key.desc != forward else "<"
+        terms.append(f"{key.expr} {op} %s")
+        params.append(values[i])
+        branches.append("(" + " AND ".join(terms) + ")")
+    return "(" + " OR ".join(branches) + ")", params
+
+
+def _keyset_where(keys: tuple[SortKey, ...], page: Page) -> tuple[str, list[Any]]:
+    if page.after:
+        sql, params = _seek_predicate(keys, decode_cursor(page.after, len(keys)), forward=True)
+    elif page.before:
+        sql, params = _seek_predicate(keys, decode_cursor(page.before, len(keys)), forward=False)
+    else:
+        return "", []
+    return f" AND {sql}", params
+
+
+def _order_by(keys: tuple[SortKey, ...], reverse: bool = False) -> str:
+    parts = []
+    for key in keys:
+        desc = key.desc != reverse
+        parts.append(f"{key.expr} {'DESC' if desc else 'ASC'}")
+    return "ORDER BY " + ", ".join(parts)
+
+
+def select_page(conn, columns: str, from_sql: str, params: list[Any], keys: tuple[SortKey, ...], page: Page) -> PageResult:
+    """通用列表查询：一条语句同时取回当前页数据与总数。
+
+    columns 为 SELECT 列清单（每列都需有列名），from_sql 为 "FROM ... WHERE ..."（不含 ORDER BY），
+    params 为 from_sql 中的参数。排序键会以 _k0、_k1 ... 的列名带出，用于游标定位，返回前剔除。
+    """
+    cols = [f"_k{i}" for i in range(len(keys))]
+    inner = tuple(SortKey(col, key.desc) for col, key in zip(cols, keys))
+    key_columns = ", ".join(f"{key.expr} AS {col}" for col, key in zip(cols, keys))
+    seek_sql, seek_params = _keyset_where(inner, page)
+    # before 翻页时反向扫描，取到结果后再翻转回正常顺序
+    order_sql = _order_by(inner, reverse=page.is_backward)
+    offset = 0 if page.is_keyset else page.offset
+    # 多取一行用于判断是否还有下一页
+    fetch = [offset, page.limit + 1]
+
+    count = page.count
+    if page.is_keyset:
+        # 窗口计数必须先算出整个过滤结果才能附加到每一行，游标条件推不进去，页深又会影响耗时；
+        # 估算也没有“当前位置之前有多少行”的信息。游标翻页不再计算总数
+        count = "none"
+
+    if count == "exact":
+        sql = (
+            f"WITH base AS (SELECT {columns}, {key_columns}, COUNT(*) OVER() AS _total {from_sql}) "
+            f"SELECT * FROM base {order_sql} OFFSET %s ROWS FETCH NEXT %s ROWS ONLY"
+        )
+        args = list(params) + fetch
+    elif count == "estimate":
+        cap = page.offset + page.limit * ESTIMATE_PAGES + 1
+        sql = (
+            f"WITH base AS (SELECT TOP (%s) {columns}, {key_columns} {from_sql} {_order_by(inner)}) "
+            f"SELECT *, COUNT(*) OVER() AS _total FROM base {order_sql} OFFSET %s ROWS FETCH NEXT %s ROWS ONLY"
+        )
+        args = [cap] + list(params) + fetch
+    else:
+        sql = (
+            f"WITH base AS (SELECT {columns}, {key_columns} {from_sql}) "
+            f"SELECT * FROM base WHERE 1 = 1{seek_sql} {order_sql} OFFSET %s ROWS FETCH NEXT %s ROWS ONLY"
+        )
+        args = list(params) + seek_params + fetch
+
+    cursor = conn.cursor()
+    cursor.execute(sql, tuple(args))
+    rows = cursor.fetchall()
+
+    total: int | None = None
+    if count != "none":
+        if rows:
+            total = int(rows[0]["_total"])
+            if count == "estimate" and total >= cap:
+                total = None
+        elif page.offset > 0:
+            # 越界的页拿不到窗口计数，退回单独 COUNT（极少发生）
+            cursor.execute(f"SELECT COUNT(*) AS total {from_sql}", tuple(params))
+            total = int(cursor.fetchone()["total"])
+        else:
+            total = 0
+
+    has_more = len(rows) > page.limit
+    rows = rows[: page.limit]
+    if page.is_backward:
+        rows.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, page.is_keyset or page.offset > 0
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_next:
+            next_cursor = encode_cursor([rows[-1][c] for c in cols])
+        if has_prev:
+            prev_cursor = encode_cursor([rows[0][c] for c in cols])
+    for r in rows:
+        r.pop("_total", None)
+        for c in cols:
+            r.pop(c, None)
+
+    return PageResult(rows=rows, total=total, has_more=has_more, next_cursor=next_cursor, prev_cursor=prev_cursor)
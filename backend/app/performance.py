@@ -0,0 +1,92 @@
+"""司机绩效汇总：一条语句分别按 (person_id, completed_at) 与 (driver_id, occurrence_time) 索引
+聚合 CompletedOrder 与 Incidents，返回运单数、完成重量/体积、各类型异常数与罚款合计。
+
+已结束的时间段（end 早于今天）结果缓存在进程内：完成记录只会以当天日期写入，
+之后能改变这些时间段的只有补录过去日期的异常和删除异常，对应的写入路径调用 invalidate_performance。
+已完成的运单之后仍可能被取消（逻辑删除），但完成记录保留，照常计入司机绩效（与排行榜一致），
+因此运单不按 is_deleted 过滤，取消运单也不会让缓存过期。
+多 worker 部署下其他进程的写入最长在 ttl 之后可见。
+"""
+
+import os
+from datetime import date
+from typing import Any
+
+from app.cache import TTLCache
+
+_closed = TTLCache(
+    max_entries=int(os.getenv("PERFORMANCE_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("PERFORMANCE_CACHE_TTL", "3600")),
+)
+
+
+def _range_sql(column: str, start: date | None, end: date | None) -> tuple[str, list[Any]]:
+    sql, params = "", []
+    if start is not None:
+        sql += f" AND {column} >= %s"
+        params.append(start)
+    if end is not None:
+        sql += f" AND {column} <= %s"
+        params.append(end)
+    return sql, params
+
+
+def _query(conn, driver_id: int, start: date | None, end: date | None) -> dict[str, Any]:
+    order_range, order_params = _range_sql("c.completed_at", start, end)
+    incident_range, incident_params = _range_sql("i.occurrence_time", start, end)
+    cursor = conn.cursor()
+    # 第一行（incident_type 为 NULL）是运单汇总，没有完成记录时也会返回；其余每种异常类型一行
+    cursor.execute(
+        "SELECT CAST(NULL AS NVARCHAR(20)) AS incident_type, COUNT(*) AS n, "
+        "ISNULL(SUM(o.weight), 0) AS weight, ISNULL(SUM(o.volume), 0) AS volume, CAST(0 AS DECIMAL(12,2)) AS fines "
+        "FROM CompletedOrder c JOIN Orders o ON o.order_id = c.order_id "
+        f"WHERE c.person_id = %s{order_range} "
+        "UNION ALL "
+        "SELECT i.incident_type, COUNT(*), NULL, NULL, SUM(i.fine_amount) "
+        f"FROM Incidents i WHERE i.driver_id = %s AND i.is_deleted = 0{incident_range} "
+        "GROUP BY i.incident_type",
+        tuple([driver_id, *order_params, driver_id, *incident_params]),
+    )
+    result: dict[str, Any] = {
+        "orders": 0,
+        "completed_weight": 0.0,
+        "completed_volume": 0.0,
+        "incidents": 0,
+        "incidents_by_type": {},
+        "fines": 0.0,
+    }
+    for r in cursor.fetchall():
+        if r["incident_type"] is None:
+            result["orders"] = int(r["n"])
+            result["completed_weight"] = float(r["weight"])
+            result["completed_volume"] = float(r["volume"])
+        else:
+            result["incidents_by_type"][r["incident_type"]] = int(r["n"])
+            result["incidents"] += int(r["n"])
+            result["fines"] += float(r["fines"] or 0)
+    result["fines"] = round(result["fines"], 2)
+    return result
+
+
+def driver_performance(conn, driver_id: int, start: date | None, end: date | None) -> dict[str, Any]:
+    closed = end is not None and end < date.today()
+    key = (driver_id, start, end)
+    if closed:
+        cached = _closed.get(key)
+        if cached is not None:
+            return cached
+    result = _query(conn, driver_id, start, end)
+    if closed:
+        _closed.set(key, result)
+    return result
+
+
+def invalidate_performance(day: date, driver_id: int | None = None) -> None:
+    """某天的异常有变化：丢弃覆盖这一天的缓存；不知道司机时丢弃所有司机的。"""
+    if day >= date.today():
+        return
+    _closed.discard_where(
+        lambda k, _: (driver_id is None or k[0] == driver_id)
+        and (k[1] is None or k[1] <= day)
+        and k[2] >= day
+    )
@@ -2,7 +2,7 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
 from app import auth_core
-from app.db import connect_db
+from app.db import db_pool
 
 router = APIRouter()
 
@@ -39,8 +39,7 @@ def login(payload: LoginRequest):
     if prefix not in {"M", "D"}:
         raise HTTPException(status_code=404, detail="工号不存在，请先用 admin 创建人员")
 
-    conn = connect_db()
-    try:
+    with db_pool.connection() as conn:
         cursor = conn.cursor()
         if prefix == "M":
             # 调度主管
@@ -81,5 +80,3 @@ def login(payload: LoginRequest):
                 )
 
         raise HTTPException(status_code=404, detail="工号不存在或已被删除")
-    finally:
-        conn.close()
@@ -1,7 +1,11 @@
+from datetime import date, datetime
+
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from pydantic import BaseModel
 
 from app.db import get_db
+from app.ownership import invalidate_all
+from app.pagination import COUNT_MODES, Page, SortKey, select_page
 from app.auth_core import require_admin
 
 router = APIRouter()
@@ -14,7 +18,32 @@ class DistributionCenter(BaseModel):
 
 class DistributionCenterSelect(BaseModel):
     data: list[DistributionCenter]
-    total: int
+    total: int | None = None
+    has_more: bool = False
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
+
+
+CENTER_KEYS = (SortKey("center_id"),)
+
+
+class ReportFleet(BaseModel):
+    fleet_id: int
+    fleet_name: str
+
+
+class CenterMonthlyReport(BaseModel):
+    center_id: int
+    months: list[str]
+    fleets: list[ReportFleet]
+    # 下面三个矩阵的行与 fleets 对应、列与 months 对应
+    orders: list[list[int]]
+    incidents: list[list[int]]
+    fines: list[list[float]]
+
+
+# 一次最多查询的月份数
+MAX_REPORT_MONTHS = 120
 
 
 class DistributionCenterCreate(BaseModel):
@@ -39,17 +68,26 @@ def insert_distribution_center(center: DistributionCenterCreate, auth_info=Depen
 
 
 @router.get("/api/distribution-centers", response_model=DistributionCenterSelect)
-def get_distribution_centers(limit: int = Query(10, ge=1), offset: int = Query(0, ge=0), auth_info=Depends(require_admin), conn=Depends(get_db)):
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT COUNT(*) AS total FROM DistributionCenters WHERE is_deleted = 0")
-    total = cursor.fetchone()["total"]
-
-    cursor.execute("SELECT center_id, center_name FROM DistributionCenters WHERE is_deleted = 0 ORDER BY center_id OFFSET %s ROWS FETCH NEXT %s ROWS ONLY", (offset, limit))
-    rows = cursor.fetchall()
-    data = [DistributionCenter(**r) for r in rows]
-
-    return DistributionCenterSelect(data=data, total=total)
+def get_distribution_centers(
+    limit: int = Query(10, ge=1),
+    offset: int = Query(0, ge=0),
+    after: str | None = Query(None),
+    before: str | None = Query(None),
+    count: str = Query("exact", pattern=COUNT_MODES),
+    auth_info=Depends(require_admin),
+    conn=Depends(get_db),
+):
+    result = select_page(
+        conn,
+        "center_id, center_name",
+        "FROM DistributionCenters WHERE is_deleted = 0",
+        [],
+        CENTER_KEYS,
+        Page(limit, offset, after, before, count),
+    )
+    data = [DistributionCenter(**r) for r in result.rows]
+
+    return DistributionCenterSelect(data=data, **result.meta())
 
 
 @router.get("/api/distribution-centers/{center_id}", response_model=DistributionCenter)
@@ -105,7 +143,84 @@ def delete_distribution_center(center_id: int, auth_info=Depends(require_admin),
         cursor.execute("UPDATE DistributionCenters SET is_deleted = 1 WHERE center_id = %s AND is_deleted = 0", (center_id,))
 
         conn.commit()
+        # 涉及多个车队，直接清空归属缓存
+        invalidate_all()
         return {"detail": "配送中心删除成功"}
     except Exception as e:
         conn.rollback()
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="删除配送中心时发生错误") from e
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="删除配送中心时发生错误") from e
+
+
+def _parse_month(value: str, name: str) -> date:
+    try:
+        return datetime.strptime(value.strip(), "%Y-%m").date()
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"{name} 参数格式必须为 YYYY-MM")
+
+
+def _month_index(d: date) -> int:
+    return d.year * 12 + d.month - 1
+
+
+@router.get("/api/distribution-centers/{center_id}/reports/monthly", response_model=CenterMonthlyReport)
+def get_center_monthly_report(
+    center_id: int,
+    from_: str | None = Query(None, alias="from", description="格式: YYYY-MM，默认为 to 之前 11 个月"),
+    to: str | None = Query(None, description="格式: YYYY-MM，默认为当月"),
+    auth_info=Depends(require_admin),
+    conn=Depends(get_db),
+):
+    """配送中心下所有车队 × 月份的安全与效率报表，一条查询按 (fleet_id, month_start) 范围读取 FleetMonthlyStats。"""
+    end = _parse_month(to, "to") if to else date.today().replace(day=1)
+    if from_:
+        start = _parse_month(from_, "from")
+    else:
+        i = _month_index(end) - 11
+        start = date(i // 12, i % 12 + 1, 1)
+    count = _month_index(end) - _month_index(start) + 1
+    if count < 1:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="from 不能晚于 to")
+    if count > MAX_REPORT_MONTHS:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"一次最多查询 {MAX_REPORT_MONTHS} 个月")
+    months = [date((_month_index(start) + k) // 12, (_month_index(start) + k) % 12 + 1, 1) for k in range(count)]
+
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT f.fleet_id, f.fleet_name, s.month_start, s.total_orders, s.total_incidents, s.total_fines "
+        "FROM Fleets f "
+        "LEFT JOIN FleetMonthlyStats s ON s.fleet_id = f.fleet_id AND s.month_start >= %s AND s.month_start <= %s "
+        "WHERE f.center_id = %s AND f.is_deleted = 0 "
+        "ORDER BY f.fleet_id",
+        (start, end, center_id),
+    )
+    rows = cursor.fetchall()
+    if not rows:
+        cursor.execute("SELECT 1 AS found FROM DistributionCenters WHERE center_id = %s AND is_deleted = 0", (center_id,))
+        if cursor.fetchone() is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"找不到配送中心 ID={center_id} 的记录")
+
+    fleets: list[ReportFleet] = []
+    orders: list[list[int]] = []
+    incidents: list[list[int]] = []
+    fines: list[list[float]] = []
+    for r in rows:
+        if not fleets or fleets[-1].fleet_id != r["fleet_id"]:
+            fleets.append(ReportFleet(fleet_id=r["fleet_id"], fleet_name=r["fleet_name"]))
+            orders.append([0] * count)
+            incidents.append([0] * count)
+            fines.append([0.0] * count)
+        if r["month_start"] is None:
+            continue
+        col = _month_index(r["month_start"]) - _month_index(start)
+        orders[-1][col] = int(r["total_orders"])
+        incidents[-1][col] = int(r["total_incidents"])
+        fines[-1][col] = float(r["total_fines"])
+
+    return CenterMonthlyReport(
+        center_id=center_id,
+        months=[m.strftime("%Y-%m") for m in months],
+        fleets=fleets,
+        orders=orders,
+        incidents=incidents,
+        fines=fines,
+    )
@@ -1,7 +1,14 @@
-from fastapi import APIRouter, HTTPException, Query, status, Path
-from pydantic import BaseModel
+from datetime import date
+
+from fastapi import APIRouter, HTTPException, Query, Request, status, Path
+from pydantic import BaseModel, ValidationError
 from fastapi import Depends
-from app.db import get_db
+from app.bulk import BULK_FORMATS, active_fleet_exists, bulk_format, bulk_import, validation_message
+from app.db import get_db, run_db
+from app.loader import EntityLoader, get_loader
+from app.ownership import driver_fleet, invalidate_driver
+from app.pagination import COUNT_MODES, Page, SortKey, select_page
+from app.performance import driver_performance
 from app.auth_core import require_admin, require_admin_or_fleet_manager, require_admin_manager_or_driver_self, require_admin_or_manager
 
 router = APIRouter()
@@ -29,9 +36,24 @@ class DriverCreate(BaseModel):
     driver_license: str
 
 
+class BulkDriverRow(BaseModel):
+    person_name: str
+    person_contact: str | None = None
+    driver_license: str
+
+
 class DriversSelect(BaseModel):
     data: list[Driver]
-    total: int
+    total: int | None = None
+    has_more: bool = False
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
+
+
+DRIVER_KEYS = (SortKey("person_id"),)
+DRIVER_COLUMNS = "'D' + CAST(person_id AS NVARCHAR) AS person_id, person_name, driver_license, driver_status, person_contact, fleet_id"
+# 与 Drivers.driver_license 的 CHECK 约束一致
+DRIVER_LICENSES = {"A2", "B2", "C1", "C2", "C3", "C4", "C6"}
 
 
 @router.post("/api/fleets/{fleet_id}/drivers", status_code=status.HTTP_201_CREATED)
@@ -56,12 +78,77 @@ def insert_driver(fleet_id: int, payload: DriverCreate, auth_info=Depends(requir
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="创建司机失败") from e
 
 
+def _parse_bulk_driver(record: dict) -> tuple[BulkDriverRow | None, str | None]:
+    try:
+        row = BulkDriverRow.model_validate(record)
+    except ValidationError as e:
+        return None, validation_message(e)
+    row.person_name = row.person_name.strip()
+    row.person_contact = (row.person_contact or "").strip() or None
+    row.driver_license = row.driver_license.strip().upper()
+    if not row.person_name or len(row.person_name) > 50:
+        return None, "姓名不能为空且最长 50 个字符"
+    if row.person_contact is not None and len(row.person_contact) > 50:
+        return None, "联系方式最长 50 个字符"
+    if row.driver_license not in DRIVER_LICENSES:
+        return None, f"驾照类型应为 {'/'.join(sorted(DRIVER_LICENSES))} 之一"
+    return row, None
+
+
+def insert_driver_chunk(fleet_id: int, rows: list[tuple[int, BulkDriverRow]], conn) -> dict[int, dict]:
+    """一条语句插入一批司机，返回 {行号: {"driver_id": "D..."}}。
+
+    司机主键是自增列、没有业务唯一键，与 insert_driver 一样每行都新建，不存在复活已删除记录的情况。
+    用 MERGE ... ON 1 = 0 是为了在 OUTPUT 中带出行号；Drivers 有触发器，OUTPUT 需 INTO 表变量。
+    """
+    values = ", ".join(["(%s, %s, %s, %s)"] * len(rows))
+    params = [p for line, r in rows for p in (line, r.person_name, r.person_contact, r.driver_license)]
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SET NOCOUNT ON; DECLARE @ids TABLE (line INT, person_id INT); "
+            f"MERGE Drivers AS t USING (VALUES {values}) AS s(line, person_name, person_contact, driver_license) ON 1 = 0 "
+            "WHEN NOT MATCHED THEN INSERT (person_name, person_contact, driver_license, fleet_id) "
+            "VALUES (s.person_name, s.person_contact, s.driver_license, %s) "
+            "OUTPUT s.line, inserted.person_id INTO @ids; "
+            "SET NOCOUNT OFF; SELECT line, person_id FROM @ids;",
+            tuple(params) + (fleet_id,),
+        )
+        result = {r["line"]: {"driver_id": f"D{r['person_id']}"} for r in cursor.fetchall()}
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+
+
+@router.post("/api/fleets/{fleet_id}/drivers:bulk")
+async def bulk_insert_drivers(
+    fleet_id: int,
+    request: Request,
+    fmt: str | None = Query(None, alias="format", pattern=BULK_FORMATS),
+    auth_info=Depends(require_admin),
+):
+    """批量导入司机：请求体为 NDJSON 或 CSV（表头 person_name,person_contact,driver_license），
+    每 BULK_CHUNK_SIZE 行一条语句插入。返回 NDJSON：每行一条 {line, ok, driver_id | error}，最后一行为 summary。
+    """
+    if not await run_db(active_fleet_exists, fleet_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"找不到ID为{fleet_id}的车队")
+    return await bulk_import(
+        request,
+        bulk_format(request, fmt),
+        _parse_bulk_driver,
+        lambda rows, conn: insert_driver_chunk(fleet_id, rows, conn),
+    )
+
+
 @router.patch("/api/drivers/{driver_id}")
 def update_driver(
     driver_id: str,
     updates: DriverUpdate,
     auth_info=Depends(require_admin_or_manager),
     conn=Depends(get_db),
+    loader: EntityLoader = Depends(get_loader),
 ):
     update_data = updates.model_dump(exclude_unset=True)
     if not update_data:
@@ -86,14 +173,10 @@ def update_driver(
             if next_status not in {"空闲", "休息中"}:
                 raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="driver_status 仅支持 空闲/休息中")
 
-            cursor.execute(
-                "SELECT fleet_id FROM Drivers WHERE person_id = %s AND is_deleted = 0",
-                (person_id,),
-            )
-            row = cursor.fetchone()
-            if not row:
+            fleet_id = driver_fleet(loader, person_id)
+            if fleet_id is None:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="找不到司机记录")
-            if row.get("fleet_id") != auth_info.get("fleet_id"):
+            if fleet_id != auth_info.get("fleet_id"):
                 raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="权限不足：仅允许操作本车队司机")
 
         set_clause = ", ".join(f"{k} = %s" for k in update_data)
@@ -132,6 +215,7 @@ def delete_driver(driver_id: str, auth_info=Depends(require_admin), conn=Depends
         cursor.execute("DELETE FROM Assignments WHERE person_id = %s", (driver_id[1:],))
         cursor.execute("UPDATE Drivers SET is_deleted = 1 WHERE person_id = %s AND is_deleted = 0", (driver_id[1:],))
         conn.commit()
+        invalidate_driver(int(driver_id[1:]))
         return {"detail": "司机删除成功"}
     except Exception as e:
         conn.rollback()
@@ -144,26 +228,31 @@ def list_fleet_drivers(
     q: str | None = Query(""),
     limit: int = Query(10, ge=1),
     offset: int = Query(0, ge=0),
+    after: str | None = Query(None),
+    before: str | None = Query(None),
+    count: str = Query("exact", pattern=COUNT_MODES),
     auth_info=Depends(require_admin_or_fleet_manager),
     conn=Depends(get_db),
 ):
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) AS total FROM Drivers WHERE fleet_id = %s AND is_deleted = 0 AND (person_name LIKE %s OR person_contact LIKE %s)", (fleet_id, f"%{q}%", f"%{q}%"))
-    total = cursor.fetchone()["total"]
-
-    cursor.execute(
-        "SELECT 'D' + CAST(person_id AS NVARCHAR) AS person_id, person_name, driver_license, driver_status, person_contact, fleet_id FROM Drivers WHERE fleet_id = %s AND is_deleted = 0 AND (person_name LIKE %s OR person_contact LIKE %s) ORDER BY person_id OFFSET %s ROWS FETCH NEXT %s ROWS ONLY",
-        (fleet_id, f"%{q}%", f"%{q}%", offset, limit),
+    result = select_page(
+        conn,
+        DRIVER_COLUMNS,
+        "FROM Drivers WHERE fleet_id = %s AND is_deleted = 0 AND (person_name LIKE %s OR person_contact LIKE %s)",
+        [fleet_id, f"%{q}%", f"%{q}%"],
+        DRIVER_KEYS,
+        Page(limit, offset, after, before, count),
     )
-    rows = cursor.fetchall()
-    data = [Driver(**r) for r in rows]
-    return DriversSelect(data=data, total=total)
+    data = [Driver(**r) for r in result.rows]
+    return DriversSelect(data=data, **result.meta())
 
 @router.get("/api/drivers", response_model=DriversSelect)
 def list_drivers(
     q: str | None = Query(""),
     limit: int = Query(10, ge=1),
     offset: int = Query(0, ge=0),
+    after: str | None = Query(None),
+    before: str | None = Query(None),
+    count: str = Query("exact", pattern=COUNT_MODES),
     auth_info=Depends(require_admin_or_manager),
     conn=Depends(get_db),
 ):
@@ -172,8 +261,6 @@ def list_drivers(
     - 调度主管：仅查询所属车队的司机
     返回的 `person_id` 为带前缀的形式如 `D1`
     """
-    cursor = conn.cursor()
-
     # 过滤条件：管理员不限制，主管限制到自己的车队
     where_base = "FROM Drivers WHERE is_deleted = 0 AND (person_name LIKE %s OR person_contact LIKE %s)"
     where_params = [f"%{q}%", f"%{q}%"]
@@ -184,16 +271,9 @@ def list_drivers(
         where_base = "FROM Drivers WHERE is_deleted = 0 AND fleet_id = %s AND (person_name LIKE %s OR person_contact LIKE %s)"
         where_params = [fleet_id, f"%{q}%", f"%{q}%"]
 
-    cursor.execute(f"SELECT COUNT(*) AS total {where_base}", tuple(where_params))
-    total = cursor.fetchone()["total"]
-
-    cursor.execute(
-        f"SELECT 'D' + CAST(person_id AS NVARCHAR) AS person_id, person_name, driver_license, driver_status, person_contact, fleet_id {where_base} ORDER BY person_id OFFSET %s ROWS FETCH NEXT %s ROWS ONLY",
-        tuple(where_params + [offset, limit]),
-    )
-    rows = cursor.fetchall()
-    data = [Driver(**r) for r in rows]
-    return DriversSelect(data=data, total=total)
+    result = select_page(conn, DRIVER_COLUMNS, where_base, where_params, DRIVER_KEYS, Page(limit, offset, after, before, count))
+    data = [Driver(**r) for r in result.rows]
+    return DriversSelect(data=data, **result.meta())
 
 @router.get("/api/drivers/{person_id}", response_model=Driver)
 def get_driver_detail(
@@ -220,3 +300,33 @@ def get_driver_detail(
     if not row:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="找不到司机记录")
     return Driver(**row)
+
+
+class DriverPerformance(BaseModel):
+    person_id: str
+    start: date | None = None
+    end: date | None = None
+    orders: int
+    completed_weight: float
+    completed_volume: float
+    incidents: int
+    incidents_by_type: dict[str, int]
+    fines: float
+
+
+@router.get("/api/drivers/{person_id}/performance", response_model=DriverPerformance)
+def get_driver_performance(
+    person_id: str = Path(..., description="司机 ID，可为 D+数字（如 D1）或纯数字"),
+    start: date | None = Query(None),
+    end: date | None = Query(None),
+    auth_info=Depends(require_admin_manager_or_driver_self),
+    conn=Depends(get_db),
+):
+    """司机在时间段内的绩效汇总（起止日期均包含）：运单数、完成重量/体积、各类型异常数与罚款合计。"""
+    raw = person_id.strip().lstrip("Dd")
+    if not raw.isdigit():
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="person_id 格式错误，应为数字或 D+数字（如 D1）")
+    if start is not None and end is not None and start > end:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="start 不能晚于 end")
+    driver_id = int(raw)
+    return DriverPerformance(person_id=f"D{driver_id}", start=start, end=end, **driver_performance(conn, driver_id, start, end))
@@ -1,10 +1,14 @@
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 
 from fastapi import APIRouter, HTTPException, Query, status, Depends
 from pydantic import BaseModel
 
 from app.auth_core import require_admin, require_admin_or_fleet_manager
 from app.db import get_db
+from app.leaderboard import PERIODS, leaderboard
+from app.ownership import invalidate_fleet
+from app.pagination import COUNT_MODES, Page, SortKey, select_page
+from app.utilization import fleet_utilization
 
 router = APIRouter()
 
@@ -23,7 +27,13 @@ class FleetCreate(BaseModel):
 
 class FleetSelect(BaseModel):
     data: list[Fleet]
-    total: int
+    total: int | None = None
+    has_more: bool = False
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
+
+
+FLEET_KEYS = (SortKey("f.fleet_id"),)
 
 
 class FleetUpdate(BaseModel):
@@ -37,16 +47,27 @@ class FleetMonthlyReport(BaseModel):
 
 
 @router.get("/api/distribution-centers/{center_id}/fleets")
-def get_center_fleets(center_id: int, limit: int = Query(10, ge=1), offset: int = Query(0, ge=0), auth_info=Depends(require_admin), conn=Depends(get_db)):
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) AS total FROM Fleets WHERE center_id = %s AND is_deleted = 0", (center_id,))
-    total = cursor.fetchone()["total"]
-
-    cursor.execute("SELECT f.fleet_id, f.fleet_name, 'M' + CAST(m.person_id AS VARCHAR) AS manager_id, m.person_name AS manager_name, m.person_contact AS manager_contact, f.center_id FROM Fleets f JOIN Managers m ON f.fleet_id = m.fleet_id WHERE f.center_id = %s AND f.is_deleted = 0 ORDER BY fleet_id OFFSET %s ROWS FETCH NEXT %s ROWS ONLY", (center_id, offset, limit))
-    rows = cursor.fetchall()
-    data = [Fleet(**r) for r in rows]
+def get_center_fleets(
+    center_id: int,
+    limit: int = Query(10, ge=1),
+    offset: int = Query(0, ge=0),
+    after: str | None = Query(None),
+    before: str | None = Query(None),
+    count: str = Query("exact", pattern=COUNT_MODES),
+    auth_info=Depends(require_admin),
+    conn=Depends(get_db),
+):
+    result = select_page(
+        conn,
+        "f.fleet_id, f.fleet_name, 'M' + CAST(m.person_id AS VARCHAR) AS manager_id, m.person_name AS manager_name, m.person_contact AS manager_contact, f.center_id",
+        "FROM Fleets f JOIN Managers m ON f.fleet_id = m.fleet_id WHERE f.center_id = %s AND f.is_deleted = 0",
+        [center_id],
+        FLEET_KEYS,
+        Page(limit, offset, after, before, count),
+    )
+    data = [Fleet(**r) for r in result.rows]
 
-    return FleetSelect(data=data, total=total)
+    return FleetSelect(data=data, **result.meta())
 
 
 @router.post("/api/distribution-centers/{center_id}/fleets", status_code=status.HTTP_201_CREATED)
@@ -213,7 +234,172 @@ def delete_fleet(fleet_id: int, auth_info=Depends(require_admin), conn=Depends(g
         cursor.execute("UPDATE d SET d.is_deleted = 1 FROM Drivers d JOIN Fleets f ON d.fleet_id = f.fleet_id WHERE f.fleet_id = %s AND d.is_deleted = 0", (fleet_id,))
         cursor.execute("UPDATE m SET m.is_deleted = 1 FROM Managers m JOIN Fleets f ON m.fleet_id = f.fleet_id WHERE f.fleet_id = %s AND m.is_deleted = 0", (fleet_id,))
         conn.commit()
+        invalidate_fleet(fleet_id)
         return {"detail": "车队删除成功"}
     except Exception as e:
         conn.rollback()
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="删除车队时发生错误") from e
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="删除车队时发生错误") from e
+
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    person_id: str
+    person_name: str
+    fleet_id: int
+    orders: int
+    incidents: int
+    fines: float
+
+
+class Leaderboard(BaseModel):
+    period_start: date
+    period_end: date
+    metric: str
+    order: str
+    data: list[LeaderboardEntry]
+
+
+LEADERBOARD_METRICS = "^(orders|incidents|fines)$"
+LEADERBOARD_ORDERS = "^(top|bottom)$"
+
+
+def _leaderboard(conn, scope: str, scope_id: int, period: str, day: date | None, metric: str, order: str, limit: int) -> Leaderboard:
+    start, end, rows = leaderboard.ranking(
+        conn, period, day or date.today(), metric, scope, scope_id, limit=limit, bottom=order == "bottom"
+    )
+    return Leaderboard(period_start=start, period_end=end, metric=metric, order=order, data=[LeaderboardEntry(**r) for r in rows])
+
+
+@router.get("/api/fleets/{fleet_id}/leaderboard", response_model=Leaderboard)
+def get_fleet_leaderboard(
+    fleet_id: int,
+    period: str = Query("week", pattern=PERIODS),
+    day: date | None = Query(None, alias="date", description="周期内任一天，默认今天"),
+    metric: str = Query("orders", pattern=LEADERBOARD_METRICS),
+    order: str = Query("top", pattern=LEADERBOARD_ORDERS),
+    limit: int = Query(10, ge=1, le=100),
+    auth_info=Depends(require_admin_or_fleet_manager),
+    conn=Depends(get_db),
+):
+    """车队内司机在本周 / 本月的排名（top 为从高到低，bottom 为从低到高），数值相同按司机 ID。"""
+    return _leaderboard(conn, "fleet", fleet_id, period, day, metric, order, limit)
+
+
+@router.get("/api/distribution-centers/{center_id}/leaderboard", response_model=Leaderboard)
+def get_center_leaderboard(
+    center_id: int,
+    period: str = Query("week", pattern=PERIODS),
+    day: date | None = Query(None, alias="date", description="周期内任一天，默认今天"),
+    metric: str = Query("orders", pattern=LEADERBOARD_METRICS),
+    order: str = Query("top", pattern=LEADERBOARD_ORDERS),
+    limit: int = Query(10, ge=1, le=100),
+    auth_info=Depends(require_admin),
+    conn=Depends(get_db),
+):
+    """配送中心内全部司机的排名，规则同车队排行榜。"""
+    return _leaderboard(conn, "center", center_id, period, day, metric, order, limit)
+
+
+class WeeklyAlert(BaseModel):
+    incident_id: int
+    vehicle_id: str
+    vehicle_status: str
+    driver_name: str | None = None
+    driver_contact: str | None = None
+    incident_type: str
+    incident_description: str
+    fine_amount: float
+    occurrence_time: date
+    handle_status: str
+
+
+class WeeklyAlertFeed(BaseModel):
+    week_start: date
+    week_end: date
+    unhandled: int
+    data: list[WeeklyAlert]
+
+
+def week_range(day: date) -> tuple[date, date]:
+    """包含 day 的一周 [周日, 下周日)，与 View_WeeklyIncidentAlert 原来的 DATEDIFF(week, ...) 口径一致。"""
+    start = day - timedelta(days=(day.weekday() + 1) % 7)
+    return start, start + timedelta(days=7)
+
+
+@router.get("/api/fleets/{fleet_id}/alerts/weekly", response_model=WeeklyAlertFeed)
+def get_fleet_weekly_alerts(
+    fleet_id: int,
+    day: date | None = Query(None, alias="date", description="周内任一天，默认今天"),
+    handle_status: str | None = Query(None, pattern="^(已处理|未处理)$"),
+    auth_info=Depends(require_admin_or_fleet_manager),
+    conn=Depends(get_db),
+):
+    """车队本周异常告警，按发生时间倒序；司机为车辆当前绑定的司机。"""
+    start, end = week_range(day or date.today())
+    where = ["v.fleet_id = %s", "v.is_deleted = 0", "i.is_deleted = 0", "i.occurrence_time >= %s", "i.occurrence_time < %s"]
+    params: list[object] = [fleet_id, start, end]
+    if handle_status is not None:
+        where.append("i.handle_status = %s")
+        params.append(handle_status)
+    cursor = conn.cursor()
+    # 按 occurrence_time 范围过滤（不对列套 DATEDIFF），先按车队找到车辆，再在 IX_Incidents_Vehicle_Time 上逐车查找
+    cursor.execute(
+        "SELECT i.incident_id, v.vehicle_id, v.vehicle_status, d.person_name AS driver_name, d.person_contact AS driver_contact, "
+        "i.incident_type, i.incident_description, i.fine_amount, i.occurrence_time, i.handle_status "
+        "FROM Vehicles v "
+        "JOIN Incidents i ON i.vehicle_id = v.vehicle_id "
+        "LEFT JOIN Assignments a ON a.vehicle_id = v.vehicle_id "
+        "LEFT JOIN Drivers d ON d.person_id = a.person_id "
+        f"WHERE {' AND '.join(where)} "
+        "ORDER BY i.occurrence_time DESC, i.incident_id DESC",
+        tuple(params),
+    )
+    data = [WeeklyAlert(**r) for r in cursor.fetchall()]
+    return WeeklyAlertFeed(
+        week_start=start,
+        week_end=end - timedelta(days=1),
+        unhandled=sum(1 for a in data if a.handle_status == "未处理"),
+        data=data,
+    )
+
+
+class VehicleUtilization(BaseModel):
+    vehicle_id: str
+    tracked_seconds: int
+    seconds: dict[str, int]
+    ratios: dict[str, float]
+    utilization: float
+
+
+class FleetUtilization(BaseModel):
+    fleet_id: int
+    from_date: date
+    to_date: date
+    window_seconds: int
+    tracked_seconds: int
+    seconds: dict[str, int]
+    ratios: dict[str, float]
+    utilization: float
+    vehicles: list[VehicleUtilization]
+
+
+# 一次最多统计的天数
+MAX_UTILIZATION_DAYS = 366
+
+
+@router.get("/api/fleets/{fleet_id}/utilization", response_model=FleetUtilization)
+def get_fleet_utilization(
+    fleet_id: int,
+    from_date: date | None = Query(None, alias="from", description="起始日期（含），默认 6 天前"),
+    to_date: date | None = Query(None, alias="to", description="结束日期（含），默认今天"),
+    auth_info=Depends(require_admin_or_fleet_manager),
+    conn=Depends(get_db),
+):
+    """车队内每辆车及整个车队在各状态的时长与占比，utilization 为装货中 + 运输中所占比例。"""
+    to_date = to_date or date.today()
+    from_date = from_date or to_date - timedelta(days=6)
+    if from_date > to_date:
+        raise HTTPException(status_code=422, detail="from 不能晚于 to")
+    if (to_date - from_date).days + 1 > MAX_UTILIZATION_DAYS:
+        raise HTTPException(status_code=422, detail=f"统计范围不能超过 {MAX_UTILIZATION_DAYS} 天")
+    return fleet_utilization(conn, fleet_id, from_date, to_date)
@@ -1,9 +1,18 @@
+import math
 from datetime import date
 
-from fastapi import APIRouter, HTTPException, Query, status, Depends
+from fastapi import APIRouter, HTTPException, Query, Response, status, Depends
 from pydantic import BaseModel
 
-from app.db import get_db
+from app.bulk import MAX_DECIMAL_10_2
+from app.capacity import capacity_index
+from app.db import get_db, run_db
+from app.incident_queue import IncidentEvent, incident_queue
+from app.leaderboard import leaderboard
+from app.loader import EntityLoader, get_loader
+from app.ownership import incident_fleet, invalidate_incident
+from app.pagination import COUNT_MODES, Page, SortKey, select_page
+from app.performance import invalidate_performance
 from app.auth_core import require_admin_or_manager, require_admin_manager_or_driver_self
 
 router = APIRouter()
@@ -46,9 +55,68 @@ class IncidentUpdate(BaseModel):
     handle_status: str | None = None
 
 
+class IncidentEventIn(BaseModel):
+    vehicle_id: str
+    # 不传时按车辆当前状态推导（运输中异常/空闲时异常），自动告警可传如“超速报警”
+    incident_type: str | None = None
+    incident_description: str | None = None
+    fine_amount: float | None = None
+    occurrence_time: date | None = None
+
+
+class IncidentEventBatch(BaseModel):
+    events: list[IncidentEventIn]
+
+
+class IncidentIngestResult(BaseModel):
+    accepted: int
+    duplicates: int
+    rejected_full: int
+    invalid: int
+    queued: int
+
+
+class IncidentHandleBatch(BaseModel):
+    incident_ids: list[int]
+
+
+class SkippedIncident(BaseModel):
+    incident_id: int
+    reason: str
+
+
+class IncidentHandleResult(BaseModel):
+    handled: list[int]
+    skipped: list[SkippedIncident]
+
+
 class IncidentSelect(BaseModel):
     data: list[Incident]
-    total: int
+    total: int | None = None
+    has_more: bool = False
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
+
+
+# 单次批量提交/处理的最大条数
+MAX_INCIDENT_BATCH = 5000
+
+INCIDENT_KEYS = (SortKey("i.incident_id"),)
+VEHICLE_OPTION_KEYS = (SortKey("v.vehicle_id"),)
+INCIDENT_COLUMNS = (
+    "i.incident_id, 'D' + CAST(i.driver_id AS NVARCHAR) AS driver_id, d.person_name AS driver_name, "
+    "i.vehicle_id, i.occurrence_time, i.incident_type, i.fine_amount, i.incident_description, i.handle_status"
+)
+
+
+def _to_incident(r: dict) -> Incident:
+    # r['driver_id'] 形如 'D5'；driver_name 可能为 None（如果司机已软删除）
+    driver_id = r.get("driver_id")
+    driver_name = r.get("driver_name")
+    if isinstance(driver_id, str) and isinstance(driver_name, str) and driver_name.strip():
+        r["driver_id"] = {"person_id": driver_id, "person_name": driver_name}
+    r.pop("driver_name", None)
+    return Incident(**r)
 
 
 @router.post("/api/incidents", status_code=status.HTTP_201_CREATED)
@@ -56,17 +124,14 @@ def insert_incident(
     incident: IncidentCreate,
     auth_info=Depends(require_admin_or_manager),
     conn=Depends(get_db),
+    loader: EntityLoader = Depends(get_loader),
 ):
     try:
         role = auth_info.get("role")
         cursor = conn.cursor()
 
-        # 车辆必须存在且非异常状态
-        cursor.execute(
-            "SELECT vehicle_status, fleet_id FROM Vehicles WHERE vehicle_id = %s AND is_deleted = 0",
-            (incident.vehicle_id,),
-        )
-        v = cursor.fetchone()
+        # 车辆必须存在且非异常状态；车辆行里已带出当前分配的司机
+        v = loader.vehicle(incident.vehicle_id)
         if not v:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="找不到车辆记录")
 
@@ -75,24 +140,16 @@ def insert_incident(
             raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="车辆处于异常状态，无法新增异常记录")
 
         # 车辆必须已分配司机（Assignments），且司机未被软删除
-        cursor.execute(
-            "SELECT a.person_id AS driver_id, d.fleet_id AS driver_fleet_id "
-            "FROM Assignments a "
-            "JOIN Drivers d ON a.person_id = d.person_id AND d.is_deleted = 0 "
-            "WHERE a.vehicle_id = %s",
-            (incident.vehicle_id,),
-        )
-        arow = cursor.fetchone()
-        if not arow:
+        if v.get("driver_fleet_id") is None:
             raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="该车辆未分配司机，无法新增异常记录")
 
         # 调度主管：只能为自己车队内车辆新增异常（车辆和分配司机都必须属于该车队）
         if role == "manager":
             fleet_id = auth_info.get("fleet_id")
-            if v.get("fleet_id") != fleet_id or arow.get("driver_fleet_id") != fleet_id:
+            if v.get("fleet_id") != fleet_id or v.get("driver_fleet_id") != fleet_id:
                 raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="该车辆不属于你管理的车队")
 
-        driver_id = int(arow.get("driver_id"))
+        driver_id = int(v.get("driver_id"))
         incident_type = "运输中异常" if vehicle_status == "运输中" else "空闲时异常"
         occurrence_time = date.today()
         handle_status = "未处理"
@@ -101,9 +158,13 @@ def insert_incident(
         fine_amount = float(incident.fine_amount) if incident.fine_amount is not None else 0.0
 
         # 由于表结构 incident_description NOT NULL，这里默认空字符串；fine_amount 默认 0
+        # Incidents 上有触发器，OUTPUT 必须 INTO 表变量；与取回 ID 合并为一次往返
         cursor.execute(
+            "SET NOCOUNT ON; DECLARE @ids TABLE (incident_id INT); "
             "INSERT INTO Incidents (vehicle_id, driver_id, incident_type, fine_amount, incident_description, handle_status, occurrence_time) "
-            "VALUES (%s, %s, %s, %s, %s, %s, %s);",
+            "OUTPUT inserted.incident_id INTO @ids "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s); "
+            "SET NOCOUNT OFF; SELECT incident_id FROM @ids;",
             (
                 incident.vehicle_id,
                 driver_id,
@@ -114,9 +175,11 @@ def insert_incident(
                 occurrence_time,
             ),
         )
-        cursor.execute("SELECT SCOPE_IDENTITY() AS incident_id;")
         incident_id = int(cursor.fetchone()["incident_id"])
         conn.commit()
+        # 新增/处理异常会经触发器改变车辆状态
+        capacity_index.invalidate([incident.vehicle_id])
+        leaderboard.record(driver_id, occurrence_time, incidents=1, fines=fine_amount)
         return {"detail": "异常记录创建成功", "incident_id": incident_id}
     except Exception as e:
         conn.rollback()
@@ -129,6 +192,7 @@ def update_incident(
     updates: IncidentUpdate,
     auth_info=Depends(require_admin_or_manager),
     conn=Depends(get_db),
+    loader: EntityLoader = Depends(get_loader),
 ):
     update_data = updates.model_dump(exclude_unset=True)
     if not update_data:
@@ -138,12 +202,7 @@ def update_incident(
         cursor = conn.cursor()
 
         if auth_info.get("role") == "manager":
-            cursor.execute(
-                "SELECT 1 FROM Incidents i JOIN Vehicles v ON i.vehicle_id = v.vehicle_id "
-                "WHERE i.incident_id = %s AND i.is_deleted = 0 AND v.is_deleted = 0 AND v.fleet_id = %s",
-                (incident_id, auth_info.get("fleet_id")),
-            )
-            if cursor.fetchone() is None:
+            if incident_fleet(loader, incident_id) != auth_info.get("fleet_id"):
                 raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="无权操作该异常记录")
 
         # 作业要求：编辑仅允许把处理状态标记为“已处理”
@@ -156,26 +215,135 @@ def update_incident(
         if next_status != "已处理":
             raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="handle_status 仅支持设置为 已处理")
 
+        # Incidents 上有触发器，OUTPUT 必须 INTO 表变量；取回车辆以便只刷新这辆车的推荐索引
         cursor.execute(
-            "UPDATE Incidents SET handle_status = %s WHERE incident_id = %s AND is_deleted = 0",
+            "SET NOCOUNT ON; DECLARE @updated TABLE (vehicle_id NVARCHAR(10)); "
+            "UPDATE Incidents SET handle_status = %s OUTPUT inserted.vehicle_id INTO @updated "
+            "WHERE incident_id = %s AND is_deleted = 0; "
+            "SET NOCOUNT OFF; SELECT vehicle_id FROM @updated;",
             ("已处理", incident_id),
         )
-        if cursor.rowcount == 0:
+        row = cursor.fetchone()
+        if row is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="找不到异常记录")
         conn.commit()
+        # 新增/处理异常会经触发器改变车辆状态
+        capacity_index.invalidate([row["vehicle_id"]])
         return {"detail": "异常记录更新成功"}
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"更新异常记录失败: {e}") from e
 
 
+def _to_event(e: IncidentEventIn, fleet_id: int | None) -> IncidentEvent | None:
+    vehicle_id = e.vehicle_id.strip()
+    incident_type = (e.incident_type or "").strip() or None
+    description = (e.incident_description or "").strip()
+    fine_amount = float(e.fine_amount) if e.fine_amount is not None else 0.0
+    # 与 Incidents 表的列长度一致
+    if not vehicle_id or len(vehicle_id) > 10 or len(incident_type or "") > 20 or len(description) > 255:
+        return None
+    # 超出 DECIMAL(10,2) 会让整批 INSERT 溢出失败
+    if not math.isfinite(fine_amount) or not 0 <= fine_amount <= MAX_DECIMAL_10_2:
+        return None
+    return IncidentEvent(vehicle_id, incident_type, description, fine_amount, e.occurrence_time or date.today(), fleet_id)
+
+
+@router.post("/api/incidents/bulk", status_code=status.HTTP_202_ACCEPTED, response_model=IncidentIngestResult)
+async def ingest_incidents(
+    batch: IncidentEventBatch,
+    response: Response,
+    auth_info=Depends(require_admin_or_manager),
+):
+    """批量上报异常事件（如自动告警）：校验后放入写后队列立即返回，由后台按批写库。
+
+    同一车辆、同一类型的事件在去重窗口内只记一次；队列已满时多出的事件计入 rejected_full，
+    并通过 Retry-After 提示稍后重试。写入时不满足 insert_incident 规则的事件会被丢弃。
+    """
+    if len(batch.events) > MAX_INCIDENT_BATCH:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"单次最多提交 {MAX_INCIDENT_BATCH} 条")
+    # 调度主管：只允许上报本车队车辆的异常，在写库时按车队过滤
+    fleet_id = auth_info.get("fleet_id") if auth_info.get("role") == "manager" else None
+    events = [_to_event(e, fleet_id) for e in batch.events]
+    valid = [e for e in events if e is not None]
+    result = incident_queue.submit(valid)
+    if result["rejected_full"]:
+        response.headers["Retry-After"] = str(max(1, math.ceil(incident_queue.flush_interval)))
+    return IncidentIngestResult(**result, invalid=len(events) - len(valid), queued=incident_queue.stats()["queued"])
+
+
+@router.patch("/api/incidents:handle", response_model=IncidentHandleResult)
+def handle_incidents(
+    batch: IncidentHandleBatch,
+    auth_info=Depends(require_admin_or_manager),
+    conn=Depends(get_db),
+):
+    """批量把异常标记为已处理：一条 UPDATE 完成，车辆状态由 Incidents 上的触发器按语句恢复。"""
+    ids = list(dict.fromkeys(batch.incident_ids))
+    if not ids:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="incident_ids 不能为空")
+    if len(ids) > MAX_INCIDENT_BATCH:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"单次最多处理 {MAX_INCIDENT_BATCH} 条")
+
+    # 调度主管：只处理本车队车辆的异常
+    fleet_id = auth_info.get("fleet_id") if auth_info.get("role") == "manager" else None
+    placeholders = ", ".join(["%s"] * len(ids))
+    fleet_join = "JOIN Vehicles v ON v.vehicle_id = i.vehicle_id AND v.is_deleted = 0 AND v.fleet_id = %s " if fleet_id is not None else ""
+    params = ([fleet_id] if fleet_id is not None else []) + ids
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SET NOCOUNT ON; DECLARE @handled TABLE (incident_id INT PRIMARY KEY, vehicle_id NVARCHAR(10)); "
+            "UPDATE i SET i.handle_status = N'已处理' OUTPUT inserted.incident_id, inserted.vehicle_id INTO @handled "
+            f"FROM Incidents i {fleet_join}"
+            f"WHERE i.is_deleted = 0 AND i.handle_status = N'未处理' AND i.incident_id IN ({placeholders}); "
+            "SET NOCOUNT OFF; SELECT incident_id, vehicle_id FROM @handled;",
+            tuple(params),
+        )
+        handled = {r["incident_id"]: r["vehicle_id"] for r in cursor.fetchall()}
+        rest = [i for i in ids if i not in handled]
+        found: dict[int, dict] = {}
+        if rest:
+            cursor.execute(
+                "SELECT i.incident_id, i.handle_status, v.fleet_id FROM Incidents i "
+                "LEFT JOIN Vehicles v ON v.vehicle_id = i.vehicle_id AND v.is_deleted = 0 "
+                f"WHERE i.is_deleted = 0 AND i.incident_id IN ({', '.join(['%s'] * len(rest))})",
+                tuple(rest),
+            )
+            found = {r["incident_id"]: r for r in cursor.fetchall()}
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"批量处理异常记录失败: {e}") from e
+
+    skipped = []
+    for incident_id in rest:
+        r = found.get(incident_id)
+        if r is None:
+            reason = "找不到异常记录"
+        elif fleet_id is not None and r["fleet_id"] != fleet_id:
+            reason = "无权操作该异常记录"
+        elif r["handle_status"] == "已处理":
+            reason = "异常记录已处理"
+        else:
+            reason = "异常记录状态已变化"
+        skipped.append(SkippedIncident(incident_id=incident_id, reason=reason))
+    if handled:
+        # 处理异常会经触发器改变车辆状态
+        capacity_index.invalidate(handled.values())
+    return IncidentHandleResult(handled=[i for i in ids if i in handled], skipped=skipped)
+
+
 class VehicleOption(BaseModel):
     vehicle_id: str
 
 
 class VehicleOptionSelect(BaseModel):
     data: list[VehicleOption]
-    total: int
+    total: int | None = None
+    has_more: bool = False
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
 
 
 @router.get("/api/incidents/available-vehicles", response_model=VehicleOptionSelect)
@@ -183,115 +351,67 @@ def list_available_vehicles_for_incident(
     q: str | None = Query(""),
     limit: int = Query(10, ge=1),
     offset: int = Query(0, ge=0),
+    after: str | None = Query(None),
+    before: str | None = Query(None),
+    count: str = Query("exact", pattern=COUNT_MODES),
     auth_info=Depends(require_admin_or_manager),
     conn=Depends(get_db),
 ):
     """用于异常新增的车辆下拉：仅返回“非异常状态 + 已分配司机(Assignments)”的车辆。"""
-    cursor = conn.cursor()
-
     keyword = (q or "").strip()
     like_kw = f"%{keyword}%"
     role = auth_info.get("role")
 
+    from_sql = (
+        "FROM Vehicles v "
+        "JOIN Assignments a ON v.vehicle_id = a.vehicle_id "
+        "JOIN Drivers d ON a.person_id = d.person_id AND d.is_deleted = 0 "
+        "WHERE v.is_deleted = 0 AND v.vehicle_status <> N'异常' AND v.vehicle_id LIKE %s"
+    )
+    params: list[object] = [like_kw]
     if role == "manager":
         fleet_id = auth_info.get("fleet_id")
-        cursor.execute(
-            "SELECT COUNT(*) AS total "
-            "FROM Vehicles v "
-            "JOIN Assignments a ON v.vehicle_id = a.vehicle_id "
-            "JOIN Drivers d ON a.person_id = d.person_id AND d.is_deleted = 0 "
-            "WHERE v.is_deleted = 0 AND v.vehicle_status <> N'异常' "
-            "AND v.fleet_id = %s AND d.fleet_id = %s "
-            "AND v.vehicle_id LIKE %s",
-            (fleet_id, fleet_id, like_kw),
-        )
-        total = cursor.fetchone()["total"]
-        cursor.execute(
-            "SELECT v.vehicle_id "
-            "FROM Vehicles v "
-            "JOIN Assignments a ON v.vehicle_id = a.vehicle_id "
-            "JOIN Drivers d ON a.person_id = d.person_id AND d.is_deleted = 0 "
-            "WHERE v.is_deleted = 0 AND v.vehicle_status <> N'异常' "
-            "AND v.fleet_id = %s AND d.fleet_id = %s "
-            "AND v.vehicle_id LIKE %s "
-            "ORDER BY v.vehicle_id OFFSET %s ROWS FETCH NEXT %s ROWS ONLY",
-            (fleet_id, fleet_id, like_kw, offset, limit),
-        )
-    else:
-        cursor.execute(
-            "SELECT COUNT(*) AS total "
-            "FROM Vehicles v "
-            "JOIN Assignments a ON v.vehicle_id = a.vehicle_id "
-            "JOIN Drivers d ON a.person_id = d.person_id AND d.is_deleted = 0 "
-            "WHERE v.is_deleted = 0 AND v.vehicle_status <> N'异常' AND v.vehicle_id LIKE %s",
-            (like_kw,),
-        )
-        total = cursor.fetchone()["total"]
-        cursor.execute(
-            "SELECT v.vehicle_id "
-            "FROM Vehicles v "
-            "JOIN Assignments a ON v.vehicle_id = a.vehicle_id "
-            "JOIN Drivers d ON a.person_id = d.person_id AND d.is_deleted = 0 "
-            "WHERE v.is_deleted = 0 AND v.vehicle_status <> N'异常' AND v.vehicle_id LIKE %s "
-            "ORDER BY v.vehicle_id OFFSET %s ROWS FETCH NEXT %s ROWS ONLY",
-            (like_kw, offset, limit),
-        )
+        from_sql += " AND v.fleet_id = %s AND d.fleet_id = %s"
+        params.extend([fleet_id, fleet_id])
 
-    rows = cursor.fetchall()
-    data = [VehicleOption(vehicle_id=r.get("vehicle_id")) for r in rows]
-    return VehicleOptionSelect(data=data, total=total)
+    result = select_page(conn, "v.vehicle_id", from_sql, params, VEHICLE_OPTION_KEYS, Page(limit, offset, after, before, count))
+    data = [VehicleOption(vehicle_id=r.get("vehicle_id")) for r in result.rows]
+    return VehicleOptionSelect(data=data, **result.meta())
 
 
 @router.get("/api/incidents", response_model=IncidentSelect)
-def list_incidents(
+async def list_incidents(
     limit: int = Query(10, ge=1),
     offset: int = Query(0, ge=0),
+    after: str | None = Query(None),
+    before: str | None = Query(None),
+    count: str = Query("exact", pattern=COUNT_MODES),
     auth_info=Depends(require_admin_or_manager),
-    conn=Depends(get_db),
 ):
-    cursor = conn.cursor()
+    fleet_id = auth_info.get("fleet_id") if auth_info.get("role") == "manager" else None
+    return await run_db(select_incidents, fleet_id, Page(limit, offset, after, before, count))
 
-    if auth_info.get("role") == "manager":
-        cursor.execute(
-            "SELECT COUNT(*) AS total FROM Incidents i JOIN Vehicles v ON i.vehicle_id = v.vehicle_id "
-            "WHERE i.is_deleted = 0 AND v.is_deleted = 0 AND v.fleet_id = %s",
-            (auth_info.get("fleet_id"),),
-        )
-        total = cursor.fetchone()["total"]
-        cursor.execute(
-            "SELECT i.incident_id, 'D' + CAST(i.driver_id AS NVARCHAR) AS driver_id, d.person_name AS driver_name, "
-            "i.vehicle_id, i.occurrence_time, i.incident_type, i.fine_amount, i.incident_description, i.handle_status AS handle_status "
+
+def select_incidents(fleet_id: int | None, page: Page, conn) -> IncidentSelect:
+    if fleet_id is not None:
+        from_sql = (
             "FROM Incidents i "
             "JOIN Vehicles v ON i.vehicle_id = v.vehicle_id "
             "LEFT JOIN Drivers d ON i.driver_id = d.person_id AND d.is_deleted = 0 "
-            "WHERE i.is_deleted = 0 AND v.is_deleted = 0 AND v.fleet_id = %s "
-            "ORDER BY i.incident_id OFFSET %s ROWS FETCH NEXT %s ROWS ONLY",
-            (auth_info.get("fleet_id"), offset, limit),
+            "WHERE i.is_deleted = 0 AND v.is_deleted = 0 AND v.fleet_id = %s"
         )
+        params = [fleet_id]
     else:
-        cursor.execute("SELECT COUNT(*) AS total FROM Incidents WHERE is_deleted = 0")
-        total = cursor.fetchone()["total"]
-        cursor.execute(
-            "SELECT i.incident_id, 'D' + CAST(i.driver_id AS NVARCHAR) AS driver_id, d.person_name AS driver_name, "
-            "i.vehicle_id, i.occurrence_time, i.incident_type, i.fine_amount, i.incident_description, i.handle_status "
+        from_sql = (
             "FROM Incidents i "
             "LEFT JOIN Drivers d ON i.driver_id = d.person_id AND d.is_deleted = 0 "
-            "WHERE i.is_deleted = 0 "
-            "ORDER BY i.incident_id OFFSET %s ROWS FETCH NEXT %s ROWS ONLY",
-            (offset, limit),
+            "WHERE i.is_deleted = 0"
         )
+        params = []
 
-    rows = cursor.fetchall()
-    data: list[Incident] = []
-    for r in rows:
-        # r['driver_id'] 形如 'D5'；driver_name 可能为 None（如果司机已软删除）
-        driver_id = r.get("driver_id")
-        driver_name = r.get("driver_name")
-        if isinstance(driver_id, str) and isinstance(driver_name, str) and driver_name.strip():
-            r["driver_id"] = {"person_id": driver_id, "person_name": driver_name}
-        r.pop("driver_name", None)
-        data.append(Incident(**r))
-    return IncidentSelect(data=data, total=total)
+    result = select_page(conn, INCIDENT_COLUMNS, from_sql, params, INCIDENT_KEYS, page)
+    data = [_to_incident(r) for r in result.rows]
+    return IncidentSelect(data=data, **result.meta())
 
 
 @router.delete("/api/incidents/{incident_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -299,23 +419,31 @@ def delete_incident(
     incident_id: int,
     auth_info=Depends(require_admin_or_manager),
     conn=Depends(get_db),
+    loader: EntityLoader = Depends(get_loader),
 ):
     try:
-        cursor = conn.cursor(as_dict=False)
+        cursor = conn.cursor()
 
         if auth_info.get("role") == "manager":
-            cursor.execute(
-                "SELECT 1 FROM Incidents i JOIN Vehicles v ON i.vehicle_id = v.vehicle_id "
-                "WHERE i.incident_id = %s AND i.is_deleted = 0 AND v.is_deleted = 0 AND v.fleet_id = %s",
-                (incident_id, auth_info.get("fleet_id")),
-            )
-            if cursor.fetchone() is None:
+            if incident_fleet(loader, incident_id) != auth_info.get("fleet_id"):
                 raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="无权删除该异常记录")
 
-        cursor.execute("UPDATE Incidents SET is_deleted = 1 WHERE incident_id = %s AND is_deleted = 0", (incident_id,))
-        if cursor.rowcount == 0:
+        # 取回司机、日期与罚款，用于更新司机绩效缓存与排行榜
+        cursor.execute(
+            "SET NOCOUNT ON; DECLARE @deleted TABLE (driver_id INT, occurrence_time DATE, fine_amount DECIMAL(10,2)); "
+            "UPDATE Incidents SET is_deleted = 1 "
+            "OUTPUT inserted.driver_id, inserted.occurrence_time, inserted.fine_amount INTO @deleted "
+            "WHERE incident_id = %s AND is_deleted = 0; "
+            "SET NOCOUNT OFF; SELECT driver_id, occurrence_time, fine_amount FROM @deleted;",
+            (incident_id,),
+        )
+        row = cursor.fetchone()
+        if row is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="找不到异常记录")
         conn.commit()
+        invalidate_incident(incident_id)
+        invalidate_performance(row["occurrence_time"], row["driver_id"])
+        leaderboard.record(row["driver_id"], row["occurrence_time"], incidents=-1, fines=-float(row["fine_amount"]))
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"删除异常记录失败: {e}") from e
@@ -328,10 +456,12 @@ def get_driver_incidents(
     end: str | None = Query(None),
     limit: int = Query(10, ge=1),
     offset: int = Query(0, ge=0),
+    after: str | None = Query(None),
+    before: str | None = Query(None),
+    count: str = Query("exact", pattern=COUNT_MODES),
     auth_info=Depends(require_admin_manager_or_driver_self),
     conn=Depends(get_db)
 ):
-    cursor = conn.cursor(as_dict=True)
     driver_id = person_id.lstrip("D")
 
     # 构建 WHERE 条件和参数
@@ -347,39 +477,13 @@ def get_driver_incidents(
 
     where_sql = " AND ".join(where_clauses)
 
-    # COUNT 查询
-    cursor.execute(f"SELECT COUNT(*) AS total FROM Incidents i WHERE {where_sql}", params)
-    total = cursor.fetchone()["total"]
-
-    # 分页查询：注意 offset 和 limit 必须是最后两个参数
-    params_with_pagination = params + [offset, limit]
-    cursor.execute(
-        f"""
-        SELECT i.incident_id,
-               'D' + CAST(i.driver_id AS NVARCHAR) AS driver_id,
-               d.person_name AS driver_name,
-               i.vehicle_id,
-               i.occurrence_time,
-               i.incident_type,
-               i.fine_amount,
-               i.incident_description,
-               i.handle_status
-        FROM Incidents i
-        LEFT JOIN Drivers d ON i.driver_id = d.person_id AND d.is_deleted = 0
-        WHERE {where_sql}
-        ORDER BY i.incident_id
-        OFFSET %s ROWS FETCH NEXT %s ROWS ONLY
-        """,
-        params_with_pagination
+    result = select_page(
+        conn,
+        INCIDENT_COLUMNS,
+        f"FROM Incidents i LEFT JOIN Drivers d ON i.driver_id = d.person_id AND d.is_deleted = 0 WHERE {where_sql}",
+        params,
+        INCIDENT_KEYS,
+        Page(limit, offset, after, before, count),
     )
-    rows = cursor.fetchall()
-    data: list[Incident] = []
-    for r in rows:
-        driver_id = r.get("driver_id")
-        driver_name = r.get("driver_name")
-        if isinstance(driver_id, str) and isinstance(driver_name, str) and driver_name.strip():
-            r["driver_id"] = {"person_id": driver_id, "person_name": driver_name}
-        r.pop("driver_name", None)
-        data.append(Incident(**r))
-
-    return IncidentSelect(data=data, total=total)
\ No newline at end of file
+    data = [_to_incident(r) for r in result.rows]
+    return IncidentSelect(data=data, **result.meta())
@@ -1,8 +1,14 @@
 from datetime import date
-from fastapi import APIRouter, HTTPException, Query, status, Depends
-from pydantic import BaseModel
-from app.db import get_db, format_db_error
-from app.auth_core import require_admin_manager_or_driver_self
+from fastapi import APIRouter, HTTPException, Query, Request, status, Depends
+from pydantic import BaseModel, ValidationError
+from app.bulk import BULK_FORMATS, MAX_DECIMAL_10_2, bulk_format, bulk_import, validation_message
+from app.capacity import CANDIDATE_STATUSES, capacity_index
+from app.db import get_db, format_db_error, run_db
+from app.dispatch import plan_dispatch
+from app.lanes import lane_index, pack_lane
+from app.pagination import COUNT_MODES, Page, SortKey, select_page
+from app.transitions import cancel_orders, load_orders
+from app.auth_core import require_admin_manager_or_driver_self, require_admin_or_manager
 
 router = APIRouter()
 
@@ -20,7 +26,10 @@ class Order(BaseModel):
 
 class OrderSelect(BaseModel):
     data: list[Order]
-    total: int
+    total: int | None = None
+    has_more: bool = False
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
 
 class OrderCreate(BaseModel):
     origin: str
@@ -33,68 +42,176 @@ class OrderCreate(BaseModel):
 class OrderUpdate(BaseModel):
     vehicle_id: str | None = None
 
+class BulkOrderRow(BaseModel):
+    origin: str
+    destination: str
+    weight: float
+    volume: float
+
+class OrderAssignment(BaseModel):
+    order_id: int
+    vehicle_id: str
+
+class OrderAssignmentBatch(BaseModel):
+    assignments: list[OrderAssignment]
+
+class OrderAssignmentResult(BaseModel):
+    order_id: int
+    vehicle_id: str
+    success: bool
+    detail: str
+
+class OrderAssignmentBatchResult(BaseModel):
+    succeeded: int
+    failed: int
+    results: list[OrderAssignmentResult]
+
+class DispatchResult(BaseModel):
+    dry_run: bool
+    strategy: str
+    pending_orders: int
+    vehicles: int
+    planned: int
+    unassigned: int
+    weight_utilization: float
+    volume_utilization: float
+    elapsed_ms: float
+    timed_out: bool
+    assignments: list[OrderAssignment]
+    # 以下仅在实际落库时返回；results 只列出失败的行
+    succeeded: int | None = None
+    failed: int | None = None
+    results: list[OrderAssignmentResult] | None = None
+
+class ConsolidationLoad(BaseModel):
+    order_ids: list[int]
+    weight: float
+    volume: float
+
+class ConsolidationLane(BaseModel):
+    origin: str
+    destination: str
+    pending_orders: int
+    total_weight: float
+    total_volume: float
+    loads: list[ConsolidationLoad]
+
+class ConsolidationSelect(BaseModel):
+    max_weight: float
+    max_volume: float
+    data: list[ConsolidationLane]
+
+class CandidateVehicle(BaseModel):
+    vehicle_id: str
+    fleet_id: int
+    vehicle_status: str
+    max_weight: float
+    max_volume: float
+    remaining_weight: float
+    remaining_volume: float
+    # 装入该运单后剩下的空间，越小越贴合
+    leftover_weight: float
+    leftover_volume: float
+
+class CandidateVehicleSelect(BaseModel):
+    order_id: int
+    weight: float
+    volume: float
+    data: list[CandidateVehicle]
+
 # --- 内部工具函数 ---
 
-def select_orders_by_status(status_value: str, limit: int, offset: int, conn) -> OrderSelect:
-    """通用状态查询函数"""
-    cursor = conn.cursor()
-    
-    # 1. 统计总数
-    cursor.execute("SELECT COUNT(*) AS total FROM Orders WHERE order_status = %s AND is_deleted = 0", (status_value,))
-    total = cursor.fetchone()["total"]
-
-    # 2. 分页查询数据 (如果是已完成状态，需要关联 CompletedOrder)
-    
-
-    query = """
-        SELECT order_id, origin, destination, weight, volume, 
-                order_status AS status, vehicle_id, NULL AS completed_at
-        FROM Orders
-        WHERE order_status = %s
-        ORDER BY order_id
-        OFFSET %s ROWS FETCH NEXT %s ROWS ONLY
-    """
-    
-    cursor.execute(query, (status_value, offset, limit))
-    rows = cursor.fetchall()
-    data = [Order(**r) for r in rows]
-    return OrderSelect(data=data, total=total)
+ORDER_KEYS = (SortKey("order_id"),)
+FINISHED_ORDER_KEYS = (SortKey("c.completed_at", desc=True), SortKey("o.order_id", desc=True))
+
+# 批量分配单次最多的行数，限制单条 SQL 的长度与锁定范围
+MAX_BATCH_ASSIGNMENTS = 500
+
+
+def select_orders_by_status(status_value: str, page: Page, conn) -> OrderSelect:
+    """通用状态查询函数：总数与分页数据一次取回；传入 after/before 游标时按 order_id 定位"""
+    result = select_page(
+        conn,
+        "order_id, origin, destination, weight, volume, order_status AS status, vehicle_id, NULL AS completed_at",
+        "FROM Orders WHERE order_status = %s",
+        [status_value],
+        ORDER_KEYS,
+        page,
+    )
+    data = [Order(**r) for r in result.rows]
+    return OrderSelect(data=data, **result.meta())
 
 # --- 路由接口实现 ---
 
 @router.get("/api/orders/pending", response_model=OrderSelect)
-def get_orders_pending(limit: int = Query(10, ge=1), offset: int = Query(0, ge=0), conn=Depends(get_db)):
-    return select_orders_by_status("待处理", limit, offset, conn)
+async def get_orders_pending(
+    limit: int = Query(10, ge=1),
+    offset: int = Query(0, ge=0),
+    after: str | None = Query(None),
+    before: str | None = Query(None),
+    count: str = Query("exact", pattern=COUNT_MODES),
+):
+    return await run_db(select_orders_by_status, "待处理", Page(limit, offset, after, before, count))
 # loading
 @router.get("/api/orders/loading", response_model=OrderSelect)
-def get_orders_loading(limit: int = Query(10, ge=1), offset: int = Query(0, ge=0), conn=Depends(get_db)):
-    return select_orders_by_status("装货中", limit, offset, conn)
+async def get_orders_loading(
+    limit: int = Query(10, ge=1),
+    offset: int = Query(0, ge=0),
+    after: str | None = Query(None),
+    before: str | None = Query(None),
+    count: str = Query("exact", pattern=COUNT_MODES),
+):
+    return await run_db(select_orders_by_status, "装货中", Page(limit, offset, after, before, count))
 # 运输中
 @router.get("/api/orders/transit", response_model=OrderSelect)
-def get_orders_in_transit(limit: int = Query(10, ge=1), offset: int = Query(0, ge=0), conn=Depends(get_db)):
-    return select_orders_by_status("运输中", limit, offset, conn)
+async def get_orders_in_transit(
+    limit: int = Query(10, ge=1),
+    offset: int = Query(0, ge=0),
+    after: str | None = Query(None),
+    before: str | None = Query(None),
+    count: str = Query("exact", pattern=COUNT_MODES),
+):
+    return await run_db(select_orders_by_status, "运输中", Page(limit, offset, after, before, count))
 @router.get("/api/orders/done", response_model=OrderSelect)
-def get_orders_done(limit: int = Query(10, ge=1), offset: int = Query(0, ge=0), conn=Depends(get_db)):
-    return select_orders_by_status("已完成", limit, offset, conn)
+async def get_orders_done(
+    limit: int = Query(10, ge=1),
+    offset: int = Query(0, ge=0),
+    after: str | None = Query(None),
+    before: str | None = Query(None),
+    count: str = Query("exact", pattern=COUNT_MODES),
+):
+    return await run_db(select_orders_by_status, "已完成", Page(limit, offset, after, before, count))
 
 @router.get("/api/orders/cancelled", response_model=OrderSelect)
-def get_orders_cancelled(limit: int = Query(10, ge=1), offset: int = Query(0, ge=0), conn=Depends(get_db)):
-    return select_orders_by_status("已取消", limit, offset, conn)
+async def get_orders_cancelled(
+    limit: int = Query(10, ge=1),
+    offset: int = Query(0, ge=0),
+    after: str | None = Query(None),
+    before: str | None = Query(None),
+    count: str = Query("exact", pattern=COUNT_MODES),
+):
+    return await run_db(select_orders_by_status, "已取消", Page(limit, offset, after, before, count))
 
 @router.post("/api/orders", status_code=status.HTTP_201_CREATED)
 def insert_order(order: OrderCreate, conn=Depends(get_db)):
     """创建新订单"""
     try:
         cursor = conn.cursor()
+        # Orders 上有触发器，OUTPUT 必须 INTO 表变量；插入与取回 ID 合并为一次往返
         cursor.execute(
-            """INSERT INTO Orders (weight, volume, origin, destination, order_status, vehicle_id) 
-               VALUES (%s, %s, %s, %s, %s, %s);""",
+            """SET NOCOUNT ON; DECLARE @ids TABLE (order_id INT);
+               INSERT INTO Orders (weight, volume, origin, destination, order_status, vehicle_id)
+               OUTPUT inserted.order_id INTO @ids
+               VALUES (%s, %s, %s, %s, %s, %s);
+               SET NOCOUNT OFF; SELECT order_id FROM @ids;""",
             (order.weight, order.volume, order.origin, order.destination, order.status, order.vehicle_id)
         )
-        # 获取 SQL Server 自动生成的 ID
-        cursor.execute("SELECT SCOPE_IDENTITY() AS order_id;")
         order_id = int(cursor.fetchone()["order_id"])
         conn.commit()
+        if order.vehicle_id:
+            capacity_index.invalidate([order.vehicle_id])
+        if order.status == "待处理":
+            lane_index.add(order_id, order.origin, order.destination, order.weight, order.volume)
         return {"detail": "订单创建成功", "order_id": order_id}
     except Exception as e:
         conn.rollback()
@@ -104,14 +221,71 @@ def insert_order(order: OrderCreate, conn=Depends(get_db)):
             raise HTTPException(status_code=400, detail="分配失败：车辆剩余载重不足")
         raise HTTPException(status_code=500, detail=f"服务器错误: {msg}")
 
+def _parse_bulk_order(record: dict) -> tuple[BulkOrderRow | None, str | None]:
+    try:
+        row = BulkOrderRow.model_validate(record)
+    except ValidationError as e:
+        return None, validation_message(e)
+    row.origin, row.destination = row.origin.strip(), row.destination.strip()
+    if not row.origin or not row.destination:
+        return None, "起点和终点不能为空"
+    if len(row.origin) > 100 or len(row.destination) > 100:
+        return None, "起点、终点最长 100 个字符"
+    if not (0 < row.weight <= MAX_DECIMAL_10_2) or not (0 < row.volume <= MAX_DECIMAL_10_2):
+        return None, "重量和体积必须为正数"
+    return row, None
+
+
+def insert_order_chunk(rows: list[tuple[int, BulkOrderRow]], conn) -> dict[int, dict]:
+    """一条语句插入一批待处理运单，返回 {行号: {"order_id": ...}}。
+
+    用 MERGE ... ON 1 = 0 代替 INSERT：只有 MERGE 的 OUTPUT 能带出源数据列（行号），
+    从而把生成的 order_id 对应回请求中的行；Orders 有触发器，OUTPUT 需 INTO 表变量。
+    """
+    values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(rows))
+    params = [p for line, r in rows for p in (line, r.weight, r.volume, r.origin, r.destination)]
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SET NOCOUNT ON; DECLARE @ids TABLE (line INT, order_id INT); "
+            f"MERGE Orders AS t USING (VALUES {values}) AS s(line, weight, volume, origin, destination) ON 1 = 0 "
+            "WHEN NOT MATCHED THEN INSERT (weight, volume, origin, destination, order_status) "
+            "VALUES (s.weight, s.volume, s.origin, s.destination, N'待处理') "
+            "OUTPUT s.line, inserted.order_id INTO @ids; "
+            "SET NOCOUNT OFF; SELECT line, order_id FROM @ids;",
+            tuple(params),
+        )
+        ids = {r["line"]: {"order_id": r["order_id"]} for r in cursor.fetchall()}
+        conn.commit()
+        return ids
+    except Exception:
+        conn.rollback()
+        raise
+
+
+@router.post("/api/orders/bulk")
+async def bulk_insert_orders(request: Request, fmt: str | None = Query(None, alias="format", pattern=BULK_FORMATS)):
+    """批量导入待处理运单：请求体为 NDJSON 或 CSV（表头 origin,destination,weight,volume），边读边校验，
+    每 BULK_CHUNK_SIZE 行一个事务插入。返回 NDJSON：每行一条 {line, ok, order_id | error}，最后一行为 summary。
+    """
+    return await bulk_import(
+        request,
+        bulk_format(request, fmt),
+        _parse_bulk_order,
+        insert_order_chunk,
+        on_written=lambda row, fields: lane_index.add(fields["order_id"], row.origin, row.destination, row.weight, row.volume),
+    )
+
+
 @router.delete("/api/orders/{order_id}", status_code=status.HTTP_204_NO_CONTENT)
 def cancel_order(order_id: int, conn=Depends(get_db)):
     """逻辑删除或取消订单"""
-    cursor = conn.cursor()
-    cursor.execute("UPDATE Orders SET order_status = '已取消', is_deleted = 1 WHERE order_id = %s", (order_id,))
-    if cursor.rowcount == 0:
+    vehicles: set[str] = set()
+    if not cancel_orders(conn, [order_id], vehicles):
         raise HTTPException(status_code=404, detail="未找到该订单")
     conn.commit()
+    capacity_index.invalidate(vehicles)
+    lane_index.discard(order_id)
     return {"detail": "订单已取消"}
 
 @router.get("/api/drivers/{person_id}/orders", response_model=OrderSelect)
@@ -121,12 +295,13 @@ def get_driver_finished_orders(
     end: str | None = Query(None),
     limit: int = Query(10, ge=1),
     offset: int = Query(0, ge=0),
+    after: str | None = Query(None),
+    before: str | None = Query(None),
+    count: str = Query("exact", pattern=COUNT_MODES),
     auth_info=Depends(require_admin_manager_or_driver_self),
     conn=Depends(get_db)
 ):
     """查询特定司机的历史完成订单"""
-    cursor = conn.cursor()
-    
     # 构造动态 SQL 过滤时间
     base_query = """
         FROM Orders o
@@ -141,39 +316,117 @@ def get_driver_finished_orders(
         base_query += " AND c.completed_at <= %s"
         params.append(end)
 
-    # 1. 统计总数
-    cursor.execute(f"SELECT COUNT(*) AS total {base_query}", tuple(params))
-    total = cursor.fetchone()["total"]
-
-    # 2. 查询明细
-    query = f"""
-        SELECT o.order_id, o.origin, o.destination, o.weight, o.volume, 
-               o.order_status AS status, o.vehicle_id, c.completed_at
-        {base_query}
-        ORDER BY c.completed_at DESC
-        OFFSET %s ROWS FETCH NEXT %s ROWS ONLY
+    # 按 (completed_at, order_id) 倒序，order_id 保证游标唯一
+    result = select_page(
+        conn,
+        "o.order_id, o.origin, o.destination, o.weight, o.volume, o.order_status AS status, o.vehicle_id, c.completed_at",
+        base_query,
+        params,
+        FINISHED_ORDER_KEYS,
+        Page(limit, offset, after, before, count),
+    )
+    return OrderSelect(data=[Order(**r) for r in result.rows], **result.meta())
+
+
+@router.get("/api/orders/consolidation", response_model=ConsolidationSelect)
+def get_consolidation(
+    max_weight: float | None = Query(None, gt=0),
+    max_volume: float | None = Query(None, gt=0),
+    min_orders: int = Query(2, ge=2),
+    limit: int = Query(20, ge=1, le=200),
+    auth_info=Depends(require_admin_or_manager),
+    conn=Depends(get_db),
+):
+    """拼车建议：把同一线路（归一化后的起点 → 终点）的待处理运单拼成不超过单车载重/容积的车次。
+
+    未指定 max_weight/max_volume 时按可用车辆（调度主管为本车队）中的最大载重、容积计算。
     """
-    params.extend([offset, limit])
-    cursor.execute(query, tuple(params))
-    
-    rows = cursor.fetchall()
-    return OrderSelect(data=[Order(**r) for r in rows], total=total)
+    if max_weight is None or max_volume is None:
+        cursor = conn.cursor()
+        sql = "SELECT MAX(max_weight) AS max_weight, MAX(max_volume) AS max_volume FROM Vehicles WHERE is_deleted = 0"
+        if auth_info.get("role") == "manager":
+            cursor.execute(sql + " AND fleet_id = %s", (auth_info.get("fleet_id"),))
+        else:
+            cursor.execute(sql)
+        row = cursor.fetchone() or {}
+        max_weight = max_weight or float(row.get("max_weight") or 0)
+        max_volume = max_volume or float(row.get("max_volume") or 0)
+
+    lane_index.sync(conn)
+    lanes = lane_index.lanes(min_orders=min_orders, limit=limit)
+    verified = lane_index.verify(conn, [o.order_id for lane in lanes for o in lane["orders"]])
+
+    data = []
+    for lane in lanes:
+        orders = [o for o in lane["orders"] if o.order_id in verified]
+        if len(orders) < min_orders:
+            continue
+        loads = [
+            ConsolidationLoad(
+                order_ids=[o.order_id for o in items],
+                weight=round(sum(o.weight for o in items), 2),
+                volume=round(sum(o.volume for o in items), 2),
+            )
+            for items in pack_lane(orders, max_weight, max_volume)
+            if len(items) > 1
+        ]
+        data.append(
+            ConsolidationLane(
+                origin=lane["origin"],
+                destination=lane["destination"],
+                pending_orders=len(orders),
+                total_weight=round(sum(o.weight for o in orders), 2),
+                total_volume=round(sum(o.volume for o in orders), 2),
+                loads=loads,
+            )
+        )
+    return ConsolidationSelect(max_weight=max_weight, max_volume=max_volume, data=data)
+
+
+@router.get("/api/orders/{order_id}/candidate-vehicles", response_model=CandidateVehicleSelect)
+def get_candidate_vehicles(
+    order_id: int,
+    q: str | None = Query(""),
+    fleet_id: int | None = Query(None),
+    limit: int = Query(10, ge=1, le=100),
+    auth_info=Depends(require_admin_or_manager),
+    conn=Depends(get_db),
+):
+    """为待处理运单推荐车辆：只返回剩余载重与容积都够用的空闲/装货中车辆，剩余空间最少的排在最前。"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT weight, volume, order_status FROM Orders WHERE order_id = %s AND is_deleted = 0", (order_id,))
+    row = cursor.fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="未找到该订单或订单已被删除")
+    if row["order_status"] != "待处理":
+        raise HTTPException(status_code=400, detail="只有待处理的订单可以分配车辆")
+
+    # 调度主管：只推荐自己车队的车辆
+    if auth_info.get("role") == "manager":
+        fleet_id = auth_info.get("fleet_id")
+    weight, volume = float(row["weight"]), float(row["volume"])
+    rows = capacity_index.candidates(conn, weight, volume, fleet_id=fleet_id, q=(q or "").strip(), limit=limit)
+    data = [
+        CandidateVehicle(
+            **r,
+            leftover_weight=r["remaining_weight"] - weight,
+            leftover_volume=r["remaining_volume"] - volume,
+        )
+        for r in rows
+    ]
+    return CandidateVehicleSelect(order_id=order_id, weight=weight, volume=volume, data=data)
 
 
 @router.patch("/api/orders/{order_id}")
 def assign_order(order_id: int, order: OrderUpdate, conn=Depends(get_db)):
     """将订单分配给车辆"""
     try:
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE Orders SET vehicle_id = %s, order_status = %s WHERE order_id = %s and order_status = '待处理'",
-            (order.vehicle_id, "装货中", order_id)
-        )
-        # 
-        if cursor.rowcount == 0:
+        # 运单 → 装货中，空闲车辆随之 → 装货中
+        if not load_orders(conn, [(order_id, order.vehicle_id)]):
             raise HTTPException(status_code=404, detail="未找到该订单或订单已被删除")
-        # 更改汽车的状态为“装货中”
         conn.commit()
+        capacity_index.invalidate([order.vehicle_id])
+        lane_index.discard(order_id)
         return {"detail": "订单分配成功"}
     except Exception as e:
         conn.rollback()
@@ -181,3 +434,178 @@ def assign_order(order_id: int, order: OrderUpdate, conn=Depends(get_db)):
         if "超出最大载重或容积" in msg:
             raise HTTPException(status_code=400, detail="分配失败：车辆剩余载重不足")
         raise HTTPException(status_code=500, detail=f"服务器错误: {msg}")
+
+
+def apply_assignments(
+    conn, items: list[OrderAssignment], fleet_id: int | None = None
+) -> tuple[list[OrderAssignmentResult], int]:
+    """在当前事务内校验并执行一批分配（不提交），返回逐行结果与成功行数。
+
+    车辆须处于可接单状态（空闲/装货中，与 capacity_index 一致）；给出 fleet_id 时只能分配给该车队的车辆。
+    按 items 顺序依次占用车辆剩余载重/容积，放不下的行失败，不影响其他行。
+    items 不超过 MAX_BATCH_ASSIGNMENTS 条。
+    """
+    order_ids = list(dict.fromkeys(a.order_id for a in items))
+    vehicle_ids = list(dict.fromkeys(a.vehicle_id for a in items))
+    cursor = conn.cursor()
+    # 锁住涉及的运单与车辆，校验结果在提交前不会被并发分配改变
+    cursor.execute(
+        f"SELECT order_id, weight, volume, order_status, is_deleted FROM Orders WITH (UPDLOCK, ROWLOCK) "
+        f"WHERE order_id IN ({', '.join(['%s'] * len(order_ids))})",
+        tuple(order_ids),
+    )
+    orders = {r["order_id"]: r for r in cursor.fetchall()}
+    vehicle_sql = (
+        "SELECT v.vehicle_id, v.vehicle_status, v.max_weight - ISNULL(l.used_weight, 0) AS remaining_weight, "
+        "v.max_volume - ISNULL(l.used_volume, 0) AS remaining_volume "
+        "FROM Vehicles v WITH (UPDLOCK, ROWLOCK) "
+        "LEFT JOIN VehicleLoad l WITH (UPDLOCK, ROWLOCK) ON l.vehicle_id = v.vehicle_id "
+        f"WHERE v.is_deleted = 0 AND v.vehicle_id IN ({', '.join(['%s'] * len(vehicle_ids))})"
+    )
+    if fleet_id is not None:
+        cursor.execute(vehicle_sql + " AND v.fleet_id = %s", (*vehicle_ids, fleet_id))
+    else:
+        cursor.execute(vehicle_sql, tuple(vehicle_ids))
+    vehicles = {r["vehicle_id"]: r for r in cursor.fetchall()}
+    remaining = {vid: [float(r["remaining_weight"]), float(r["remaining_volume"])] for vid, r in vehicles.items()}
+
+    results: list[OrderAssignmentResult] = []
+    accepted: list[OrderAssignment] = []
+    seen: set[int] = set()
+    for a in items:
+        o = orders.get(a.order_id)
+        cap = remaining.get(a.vehicle_id)
+        if a.order_id in seen:
+            detail = "同一批次中重复的订单"
+        elif o is None or o["is_deleted"]:
+            detail = "未找到该订单或订单已被删除"
+        elif o["order_status"] != "待处理":
+            detail = f"订单当前状态为{o['order_status']}，无法分配"
+        elif cap is None:
+            detail = "找不到车辆记录" if fleet_id is None else "找不到车辆记录或车辆不属于本车队"
+        elif vehicles[a.vehicle_id]["vehicle_status"] not in CANDIDATE_STATUSES:
+            detail = f"车辆当前状态为{vehicles[a.vehicle_id]['vehicle_status']}，无法分配"
+        elif float(o["weight"]) > cap[0] or float(o["volume"]) > cap[1]:
+            detail = "车辆剩余载重或容积不足"
+        else:
+            detail = ""
+        seen.add(a.order_id)
+        if detail:
+            results.append(OrderAssignmentResult(order_id=a.order_id, vehicle_id=a.vehicle_id, success=False, detail=detail))
+            continue
+        cap[0] -= float(o["weight"])
+        cap[1] -= float(o["volume"])
+        accepted.append(a)
+        results.append(OrderAssignmentResult(order_id=a.order_id, vehicle_id=a.vehicle_id, success=True, detail="订单分配成功"))
+
+    if accepted:
+        # 每张表一条语句完成全部分配，超载检查按语句只执行一次，且只检查涉及的车辆
+        if len(load_orders(conn, [(a.order_id, a.vehicle_id) for a in accepted])) != len(accepted):
+            raise HTTPException(status_code=409, detail="订单状态已变化，请重试")
+    return results, len(accepted)
+
+
+def _assignment_error(conn, e: Exception) -> HTTPException:
+    conn.rollback()
+    if isinstance(e, HTTPException):
+        return e
+    msg = format_db_error(e)
+    if "超出最大载重或容积" in msg:
+        return HTTPException(status_code=400, detail="分配失败：车辆剩余载重不足")
+    return HTTPException(status_code=500, detail=f"服务器错误: {msg}")
+
+
+@router.post("/api/orders/assignments", response_model=OrderAssignmentBatchResult)
+def assign_orders(
+    batch: OrderAssignmentBatch,
+    auth_info=Depends(require_admin_or_manager),
+    conn=Depends(get_db),
+):
+    """批量将订单分配给车辆：同一事务内一次校验、一次 UPDATE，逐行返回成功或失败原因。
+
+    调度主管只能分配给本车队的车辆，其他车辆的行失败。
+    """
+    fleet_id = auth_info.get("fleet_id") if auth_info.get("role") == "manager" else None
+    items = batch.assignments
+    if not items:
+        raise HTTPException(status_code=422, detail="assignments 不能为空")
+    if len(items) > MAX_BATCH_ASSIGNMENTS:
+        raise HTTPException(status_code=422, detail=f"单次最多分配 {MAX_BATCH_ASSIGNMENTS} 条")
+
+    try:
+        results, succeeded = apply_assignments(conn, items, fleet_id)
+        conn.commit()
+    except Exception as e:
+        raise _assignment_error(conn, e) from e
+    if succeeded:
+        capacity_index.invalidate(r.vehicle_id for r in results if r.success)
+        lane_index.discard(*(r.order_id for r in results if r.success))
+    return OrderAssignmentBatchResult(succeeded=succeeded, failed=len(items) - succeeded, results=results)
+
+
+@router.post("/api/orders/dispatch", response_model=DispatchResult)
+def dispatch_orders(
+    dry_run: bool = Query(True),
+    time_budget: float = Query(2.0, gt=0, le=30),
+    fleet_id: int | None = Query(None),
+    auth_info=Depends(require_admin_or_manager),
+    conn=Depends(get_db),
+):
+    """自动调度：把全部待处理运单装入空闲/装货中车辆，dry_run 时只返回方案不落库。
+
+    落库时方案按 MAX_BATCH_ASSIGNMENTS 分批走与 /api/orders/assignments 相同的校验，整体一个事务提交；
+    计算期间被并发改动的行在 results 中报告失败原因。
+    """
+    # 调度主管：只调度自己车队的车辆
+    if auth_info.get("role") == "manager":
+        fleet_id = auth_info.get("fleet_id")
+
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT order_id, weight, volume FROM Orders WHERE order_status = N'待处理' AND is_deleted = 0 ORDER BY order_id"
+    )
+    orders = cursor.fetchall()
+    vehicle_sql = (
+        "SELECT vehicle_id, max_weight, max_volume, remaining_weight, remaining_volume "
+        "FROM View_VehicleResourceStatus WHERE vehicle_status IN (N'空闲', N'装货中')"
+    )
+    if fleet_id is not None:
+        cursor.execute(vehicle_sql + " AND fleet_id = %s", (fleet_id,))
+    else:
+        cursor.execute(vehicle_sql)
+    vehicles = cursor.fetchall()
+
+    plan = plan_dispatch(orders, vehicles, time_budget=time_budget)
+    result = DispatchResult(
+        dry_run=dry_run,
+        strategy=plan.strategy,
+        pending_orders=len(orders),
+        vehicles=len(vehicles),
+        planned=len(plan.assignments),
+        unassigned=len(plan.unassigned),
+        weight_utilization=round(plan.weight_utilization, 4),
+        volume_utilization=round(plan.volume_utilization, 4),
+        elapsed_ms=round(plan.elapsed * 1000, 3),
+        timed_out=plan.timed_out,
+        assignments=[OrderAssignment(order_id=o, vehicle_id=v) for o, v in plan.assignments],
+    )
+    if dry_run or not plan.assignments:
+        return result
+
+    results: list[OrderAssignmentResult] = []
+    succeeded = 0
+    try:
+        for i in range(0, len(result.assignments), MAX_BATCH_ASSIGNMENTS):
+            chunk_results, chunk_succeeded = apply_assignments(conn, result.assignments[i:i + MAX_BATCH_ASSIGNMENTS], fleet_id)
+            results.extend(r for r in chunk_results if not r.success)
+            succeeded += chunk_succeeded
+        conn.commit()
+    except Exception as e:
+        raise _assignment_error(conn, e) from e
+    failed_ids = {r.order_id for r in results}
+    capacity_index.invalidate(a.vehicle_id for a in result.assignments if a.order_id not in failed_ids)
+    lane_index.discard(*(a.order_id for a in result.assignments if a.order_id not in failed_ids))
+    result.succeeded = succeeded
+    result.failed = len(results)
+    result.results = results
+    return result
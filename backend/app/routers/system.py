@@ -0,0 +1,159 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel
+
+from app.auth_core import require_admin
+from app.db import db_pool, format_db_error, get_db
+from app.incident_queue import incident_queue
+from app.telemetry import telemetry_engine
+
+router = APIRouter()
+
+
+class PoolStats(BaseModel):
+    max_size: int
+    in_use: int
+    idle: int
+    opening: int
+    waiters: int
+    created: int
+    closed: int
+    acquired: int
+    timeouts: int
+    wait_total_ms: float
+    wait_max_ms: float
+
+
+@router.get("/api/system/db-pool", response_model=PoolStats)
+def get_db_pool_stats(auth_info=Depends(require_admin)):
+    """连接池运行状态，用于评估 DB_POOL_SIZE 是否合适。"""
+    return PoolStats(**db_pool.stats())
+
+
+class IncidentQueueStats(BaseModel):
+    accepted: int
+    duplicates: int
+    rejected_full: int
+    written: int
+    dropped: int
+    failed: int
+    flushes: int
+    queued: int
+    max_size: int
+    batch_size: int
+    flush_interval: float
+    dedup_window: float
+    last_error: str | None = None
+
+
+@router.get("/api/system/incident-queue", response_model=IncidentQueueStats)
+def get_incident_queue_stats(auth_info=Depends(require_admin)):
+    """异常事件写后队列的运行状态：积压、去重、丢弃与写库失败的计数。"""
+    return IncidentQueueStats(**incident_queue.stats())
+
+
+class TelemetryStats(BaseModel):
+    samples: int
+    stale: int
+    out_of_window: int
+    rejected_vehicles: int
+    evicted: int
+    overspeed: int
+    stalled: int
+    vehicles: int
+    max_vehicles: int
+    speed_limit: float
+    overspeed_duration: float
+    stall_speed: float
+    stall_duration: float
+    max_age: float
+    max_skew: float
+
+
+@router.get("/api/system/telemetry", response_model=TelemetryStats)
+def get_telemetry_stats(auth_info=Depends(require_admin)):
+    """遥测规则引擎的运行状态：跟踪的车辆数、乱序采样与触发的告警次数。"""
+    return TelemetryStats(**telemetry_engine.stats())
+
+
+class VehicleLoadMismatch(BaseModel):
+    vehicle_id: str
+    ledger_weight: float | None
+    ledger_volume: float | None
+    expected_weight: float
+    expected_volume: float
+
+
+class VehicleLoadCheck(BaseModel):
+    consistent: bool
+    rebuilt: bool
+    mismatches: list[VehicleLoadMismatch]
+
+
+def _check_vehicle_load(conn, rebuild: bool) -> VehicleLoadCheck:
+    try:
+        cursor = conn.cursor()
+        cursor.execute("EXEC CheckVehicleLoadLedger @Rebuild=%s", (1 if rebuild else 0,))
+        rows = cursor.fetchall()
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"载重台账校验失败: {format_db_error(e)}") from e
+    mismatches = [VehicleLoadMismatch(**r) for r in rows]
+    return VehicleLoadCheck(consistent=not mismatches, rebuilt=rebuild and bool(mismatches), mismatches=mismatches)
+
+
+@router.get("/api/system/vehicle-load/check", response_model=VehicleLoadCheck)
+def check_vehicle_load(auth_info=Depends(require_admin), conn=Depends(get_db)):
+    """按 Orders 重算车辆载重台账并与 VehicleLoad 比对，只报告不修改。"""
+    return _check_vehicle_load(conn, rebuild=False)
+
+
+@router.post("/api/system/vehicle-load/rebuild", response_model=VehicleLoadCheck)
+def rebuild_vehicle_load(auth_info=Depends(require_admin), conn=Depends(get_db)):
+    """按 Orders 重算并修正车辆载重台账，返回修正前不一致的车辆。"""
+    return _check_vehicle_load(conn, rebuild=True)
+
+
+class FleetMonthlyStatsMismatch(BaseModel):
+    fleet_id: int
+    month: str
+    stats_orders: int | None
+    stats_incidents: int | None
+    stats_fines: float | None
+    expected_orders: int
+    expected_incidents: int
+    expected_fines: float
+
+
+class FleetMonthlyStatsCheck(BaseModel):
+    consistent: bool
+    rebuilt: bool
+    mismatches: list[FleetMonthlyStatsMismatch]
+
+
+def _check_fleet_monthly_stats(conn, rebuild: bool) -> FleetMonthlyStatsCheck:
+    try:
+        cursor = conn.cursor()
+        cursor.execute("EXEC CheckFleetMonthlyStats @Rebuild=%s", (1 if rebuild else 0,))
+        rows = cursor.fetchall()
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"车队月度汇总校验失败: {format_db_error(e)}") from e
+    mismatches = [
+        FleetMonthlyStatsMismatch(**{k: v for k, v in r.items() if k != "month_start"}, month=r["month_start"].strftime("%Y-%m"))
+        for r in rows
+    ]
+    return FleetMonthlyStatsCheck(consistent=not mismatches, rebuilt=rebuild and bool(mismatches), mismatches=mismatches)
+
+
+@router.get("/api/system/fleet-monthly-stats/check", response_model=FleetMonthlyStatsCheck)
+def check_fleet_monthly_stats(auth_info=Depends(require_admin), conn=Depends(get_db)):
+    """按 CompletedOrder / Incidents 明细重算车队月度汇总并与 FleetMonthlyStats 比对，只报告不修改。"""
+    return _check_fleet_monthly_stats(conn, rebuild=False)
+
+
+@router.post("/api/system/fleet-monthly-stats/rebuild", response_model=FleetMonthlyStatsCheck)
+def rebuild_fleet_monthly_stats(auth_info=Depends(require_admin), conn=Depends(get_db)):
+    """按明细回填并修正车队月度汇总，返回修正前不一致的行。"""
+    return _check_fleet_monthly_stats(conn, rebuild=True)
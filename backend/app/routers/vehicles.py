@@ -1,8 +1,19 @@
-from fastapi import APIRouter, HTTPException, Query, status, Depends
-from pydantic import BaseModel
+import math
+
+from fastapi import APIRouter, HTTPException, Query, Request, status, Depends
+from pydantic import BaseModel, ValidationError
 
 from app.auth_core import require_admin, require_admin_or_fleet_manager, require_admin_or_vehicle_fleet_manager, require_admin_or_manager
-from app.db import get_db
+from app.bulk import BULK_FORMATS, MAX_DECIMAL_10_2, active_fleet_exists, bulk_format, bulk_import, iter_records, validation_message
+from app.capacity import capacity_index
+from app.db import get_db, run_db
+from app.incident_queue import incident_queue
+from app.leaderboard import leaderboard
+from app.loader import EntityLoader, get_loader
+from app.ownership import cached_vehicle_fleet, invalidate_vehicle, vehicle_fleet
+from app.pagination import COUNT_MODES, Page, SortKey, select_page
+from app.telemetry import parse_timestamp, telemetry_engine
+from app.transitions import set_vehicle_status
 
 router = APIRouter()
 
@@ -20,7 +31,14 @@ class Vehicle(BaseModel):
 
 class VehiclesSelect(BaseModel):
     data: list[Vehicle]
-    total: int
+    total: int | None = None
+    has_more: bool = False
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
+
+
+VEHICLE_KEYS = (SortKey("vehicle_id"),)
+VEHICLE_COLUMNS = "vehicle_id, max_weight, max_volume, remaining_weight, remaining_volume, vehicle_status, fleet_id, driver_name"
 
 
 class VehicleUpdate(BaseModel):
@@ -37,6 +55,27 @@ class VehicleCreate(BaseModel):
     fleet_id: int | None = None
 
 
+class FleetVehicleTransition(BaseModel):
+    # 不传表示本车队全部符合条件的车辆
+    vehicle_ids: list[str] | None = None
+
+
+class SkippedVehicle(BaseModel):
+    vehicle_id: str
+    reason: str
+
+
+class FleetVehicleTransitionResult(BaseModel):
+    moved: list[str]
+    skipped: list[SkippedVehicle]
+
+
+class BulkVehicleRow(BaseModel):
+    vehicle_id: str
+    max_weight: float
+    max_volume: float
+
+
 @router.post("/api/fleets/{fleet_id}/vehicles", status_code=status.HTTP_201_CREATED)
 def insert_vehicle(fleet_id: int, vehicle: VehicleCreate, auth_info=Depends(require_admin), conn=Depends(get_db)):
     try:
@@ -72,18 +111,210 @@ def insert_vehicle(fleet_id: int, vehicle: VehicleCreate, auth_info=Depends(requ
                 VALUES (source.vehicle_id, source.max_weight, source.max_volume, source.vehicle_status, source.fleet_id, 0);
         """, (vehicle.vehicle_id, vehicle.max_weight, vehicle.max_volume, "空闲", fleet_id))
         conn.commit()
+        capacity_index.invalidate([vehicle.vehicle_id])
+        # 复活已删除的同 ID 车辆时 fleet_id 可能改变
+        invalidate_vehicle(vehicle.vehicle_id)
         return {"detail": "车辆创建成功", "vehicle_id": vehicle.vehicle_id}
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"创建车辆失败: {e}") from e
 
 
+def _parse_bulk_vehicle(record: dict) -> tuple[BulkVehicleRow | None, str | None]:
+    try:
+        row = BulkVehicleRow.model_validate(record)
+    except ValidationError as e:
+        return None, validation_message(e)
+    row.vehicle_id = row.vehicle_id.strip()
+    if not row.vehicle_id or len(row.vehicle_id) > 10:
+        return None, "车辆ID不能为空且最长 10 个字符"
+    if not (0 < row.max_weight <= MAX_DECIMAL_10_2) or not (0 < row.max_volume <= MAX_DECIMAL_10_2):
+        return None, "最大载重和最大容积必须为正数"
+    return row, None
+
+
+def merge_vehicle_chunk(fleet_id: int, rows: list[tuple[int, BulkVehicleRow]], conn) -> dict[int, dict]:
+    """一条 MERGE 写入一批车辆，语义同 insert_vehicle：新 ID 插入，已删除的同 ID 车辆复活并改挂到本车队，
+    未删除的同 ID 车辆不动（不出现在返回值中）。返回 {行号: {"vehicle_id", "revived"}}。
+    """
+    values = ", ".join(["(%s, %s, %s, %s)"] * len(rows))
+    params = [p for line, r in rows for p in (line, r.vehicle_id, r.max_weight, r.max_volume)]
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SET NOCOUNT ON; DECLARE @out TABLE (line INT, vehicle_id NVARCHAR(10), action NVARCHAR(10)); "
+            f"MERGE Vehicles WITH (HOLDLOCK) AS t USING (VALUES {values}) AS s(line, vehicle_id, max_weight, max_volume) "
+            "ON t.vehicle_id = s.vehicle_id "
+            "WHEN MATCHED AND t.is_deleted = 1 THEN UPDATE SET "
+            "max_weight = s.max_weight, max_volume = s.max_volume, vehicle_status = N'空闲', fleet_id = %s, is_deleted = 0 "
+            "WHEN NOT MATCHED THEN INSERT (vehicle_id, max_weight, max_volume, vehicle_status, fleet_id, is_deleted) "
+            "VALUES (s.vehicle_id, s.max_weight, s.max_volume, N'空闲', %s, 0) "
+            "OUTPUT s.line, inserted.vehicle_id, $action INTO @out; "
+            "SET NOCOUNT OFF; SELECT line, vehicle_id, action FROM @out;",
+            tuple(params) + (fleet_id, fleet_id),
+        )
+        result = {
+            r["line"]: {"vehicle_id": r["vehicle_id"], "revived": r["action"] == "UPDATE"}
+            for r in cursor.fetchall()
+        }
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+
+
+@router.post("/api/fleets/{fleet_id}/vehicles:bulk")
+async def bulk_insert_vehicles(
+    fleet_id: int,
+    request: Request,
+    fmt: str | None = Query(None, alias="format", pattern=BULK_FORMATS),
+    auth_info=Depends(require_admin),
+):
+    """批量导入车辆：请求体为 NDJSON 或 CSV（表头 vehicle_id,max_weight,max_volume），
+    每 BULK_CHUNK_SIZE 行一条 MERGE。返回 NDJSON：每行一条 {line, ok, vehicle_id, revived | error}，最后一行为 summary。
+    """
+    if not await run_db(active_fleet_exists, fleet_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"找不到ID为 {fleet_id} 的车队")
+
+    # 同一请求内重复的 ID 会让 MERGE 整批失败，解析时先挡掉（按不区分大小写比较，与库的排序规则一致）
+    seen: set[str] = set()
+
+    def parse(record: dict) -> tuple[BulkVehicleRow | None, str | None]:
+        row, error = _parse_bulk_vehicle(record)
+        if row is not None:
+            key = row.vehicle_id.casefold()
+            if key in seen:
+                return None, f"车辆ID {row.vehicle_id} 在本次导入中重复"
+            seen.add(key)
+        return row, error
+
+    # 写入的车辆在导入结束后一次性让容量索引失效
+    written: list[str] = []
+
+    def on_written(row: BulkVehicleRow, fields: dict) -> None:
+        written.append(row.vehicle_id)
+        if fields["revived"]:
+            invalidate_vehicle(row.vehicle_id)
+
+    try:
+        return await bulk_import(
+            request,
+            bulk_format(request, fmt),
+            parse,
+            lambda rows, conn: merge_vehicle_chunk(fleet_id, rows, conn),
+            rejected=lambda row: f"车辆ID {row.vehicle_id} 已存在，无法重复创建",
+            on_written=on_written,
+        )
+    finally:
+        # 中途出错（如某行超长）时已提交的批次同样需要失效
+        if written:
+            capacity_index.invalidate(written)
+
+
+class TelemetryLineError(BaseModel):
+    line: int
+    error: str
+
+
+class TelemetryIngestResult(BaseModel):
+    samples: int
+    accepted: int
+    invalid: int
+    incidents: int
+    queued: int
+    duplicates: int
+    rejected_full: int
+    errors: list[TelemetryLineError]
+
+
+# 响应中最多列出的错误行数
+_TELEMETRY_MAX_ERRORS = 20
+
+
+def _parse_sample(record: dict) -> tuple[tuple[str, float, float] | None, str | None]:
+    vehicle_id = str(record.get("vehicle_id") or "").strip()
+    if not vehicle_id or len(vehicle_id) > 10:
+        return None, "vehicle_id 不能为空且不超过 10 个字符"
+    try:
+        ts = parse_timestamp(record.get("ts"))
+    except ValueError:
+        ts = math.nan
+    if not math.isfinite(ts):
+        return None, "ts 应为 Unix 秒或 ISO 8601 时间"
+    if not telemetry_engine.in_window(ts):
+        return None, (
+            f"ts 应在服务器时间之前 {telemetry_engine.max_age:.0f} 秒到之后 {telemetry_engine.max_skew:.0f} 秒之间"
+        )
+    try:
+        speed = float(record.get("speed"))
+    except (TypeError, ValueError):
+        speed = math.nan
+    if not math.isfinite(speed) or speed < 0:
+        return None, "speed 应为非负数值"
+    return (vehicle_id, ts, speed), None
+
+
+def _load_vehicle_fleet(vehicle_id: str, conn) -> int | None:
+    return vehicle_fleet(EntityLoader(conn), vehicle_id)
+
+
+@router.post("/api/vehicles/telemetry", response_model=TelemetryIngestResult)
+async def ingest_telemetry(
+    request: Request,
+    fmt: str | None = Query(None, alias="format", pattern=BULK_FORMATS),
+    auth_info=Depends(require_admin_or_manager),
+):
+    """上报车辆遥测：请求体为 NDJSON 或 CSV（表头 vehicle_id,ts,speed），可分块持续上传。
+
+    ts 为 Unix 秒或 ISO 8601，speed 单位 km/h。采样边读边交给规则引擎，持续超速、运输途中停滞时
+    生成异常事件放入写后队列成批写库。调度主管只能上报本车队车辆的采样，其他车辆的行记为无效，
+    不会进入规则引擎（引擎状态按车辆共享，别的车队的车辆被写入未来时间会压制它的告警）。
+    """
+    fleet_id = auth_info.get("fleet_id") if auth_info.get("role") == "manager" else None
+    # 本次上传内已确认过的车辆归属，缓存未命中的车辆每次上传只查一次库
+    owners: dict[str, int | None] = {}
+    counts = {"samples": 0, "accepted": 0, "invalid": 0, "incidents": 0}
+    queued = {"accepted": 0, "duplicates": 0, "rejected_full": 0}
+    errors: list[TelemetryLineError] = []
+    async for line, record, error in iter_records(request, bulk_format(request, fmt)):
+        counts["samples"] += 1
+        if error is None:
+            sample, error = _parse_sample(record)
+        if error is None and fleet_id is not None:
+            vehicle_id = sample[0]
+            if vehicle_id not in owners:
+                owner = cached_vehicle_fleet(vehicle_id)
+                owners[vehicle_id] = owner if owner is not None else await run_db(_load_vehicle_fleet, vehicle_id)
+            if owners[vehicle_id] != fleet_id:
+                error = f"车辆 {vehicle_id} 不存在或不属于本车队"
+        if error is not None:
+            counts["invalid"] += 1
+            if len(errors) < _TELEMETRY_MAX_ERRORS:
+                errors.append(TelemetryLineError(line=line, error=error))
+            continue
+        counts["accepted"] += 1
+        event = telemetry_engine.process(*sample, fleet_id)
+        if event is not None:
+            counts["incidents"] += 1
+            for k, v in incident_queue.submit([event]).items():
+                queued[k] += v
+    return TelemetryIngestResult(
+        **counts,
+        queued=queued["accepted"],
+        duplicates=queued["duplicates"],
+        rejected_full=queued["rejected_full"],
+        errors=errors,
+    )
+
+
 @router.patch("/api/vehicles/{vehicle_id}", status_code=status.HTTP_201_CREATED)
 def update_vehicle(
     vehicle_id: str,
     updates: VehicleUpdate,
     auth_info=Depends(require_admin_or_vehicle_fleet_manager),
     conn=Depends(get_db),
+    loader: EntityLoader = Depends(get_loader),
 ):
     update_data = updates.model_dump(exclude_unset=True)
     if not update_data:
@@ -109,24 +340,29 @@ def update_vehicle(
             if next_status not in {"空闲", "维修中"}:
                 raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="vehicle_status 仅支持 空闲/维修中")
 
-            cursor.execute(
-                "SELECT vehicle_status FROM Vehicles WHERE vehicle_id = %s AND is_deleted = 0",
-                (vehicle_id,),
-            )
-            row = cursor.fetchone()
+            # 鉴权依赖若已查过这辆车，这里直接复用
+            row = loader.vehicle(vehicle_id)
             if not row:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="找不到车辆记录")
             current = str(row.get("vehicle_status") or "")
             if current in {"运输中", "装货中"}:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="车辆存在进行中的运单，无法切换维修状态")
 
-        set_clause = ", ".join(f"{k} = %s" for k in update_data)
-        update_values = list(update_data.values())
-        cursor.execute(
-            f"UPDATE Vehicles SET {set_clause} WHERE vehicle_id = %s AND is_deleted = 0",
-            update_values + [vehicle_id],
-        )
+        # 状态单独走流转逻辑，以便联动该车的运单
+        next_status = update_data.pop("vehicle_status", None)
+        if update_data:
+            set_clause = ", ".join(f"{k} = %s" for k in update_data)
+            update_values = list(update_data.values())
+            cursor.execute(
+                f"UPDATE Vehicles SET {set_clause} WHERE vehicle_id = %s AND is_deleted = 0",
+                update_values + [vehicle_id],
+            )
+        completed: list = []
+        if next_status is not None:
+            set_vehicle_status(conn, [vehicle_id], next_status, completed=completed)
         conn.commit()
+        capacity_index.invalidate([vehicle_id])
+        leaderboard.record_completions(completed)
         return {"detail": "车辆信息更新成功"}
     except HTTPException:
         conn.rollback()
@@ -153,14 +389,11 @@ def get_vehicle(
 @router.post("/api/vehicles/{vehicle_id}/depart")
 def depart_vehicle(vehicle_id: str, auth_info=Depends(require_admin_or_vehicle_fleet_manager), conn=Depends(get_db)):
     try:
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE Vehicles SET vehicle_status = %s WHERE vehicle_id = %s AND is_deleted = 0",
-            ("运输中", vehicle_id),
-        )
-        if cursor.rowcount == 0:
+        # 装货中的运单随车辆一起 → 运输中
+        if not set_vehicle_status(conn, [vehicle_id], "运输中"):
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="找不到车辆记录")
         conn.commit()
+        capacity_index.invalidate([vehicle_id])
         return {"detail": "车辆已发车"}
     except Exception as e:
         conn.rollback()
@@ -176,6 +409,8 @@ def delete_vehicle(vehicle_id: str, auth_info=Depends(require_admin), conn=Depen
         if cursor.rowcount == 0:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="找不到车辆记录")
         conn.commit()
+        capacity_index.invalidate([vehicle_id])
+        invalidate_vehicle(vehicle_id)
         return {"detail": "车辆已删除"}
     except Exception as e:
         conn.rollback()
@@ -185,15 +420,13 @@ def delete_vehicle(vehicle_id: str, auth_info=Depends(require_admin), conn=Depen
 @router.post("/api/vehicles/{vehicle_id}/deliver")
 def deliver_vehicle(vehicle_id: str, auth_info=Depends(require_admin_or_vehicle_fleet_manager), conn=Depends(get_db)):
     try:
-        cursor = conn.cursor()
-        # 更新车辆状态为空闲
-        cursor.execute(
-            "UPDATE Vehicles SET vehicle_status = %s WHERE vehicle_id = %s AND is_deleted = 0",
-            ("空闲", vehicle_id),
-        )
-        if cursor.rowcount == 0:
+        # 更新车辆状态为空闲，运输中的运单随之 → 已完成
+        completed: list = []
+        if not set_vehicle_status(conn, [vehicle_id], "空闲", completed=completed):
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="找不到车辆记录")
         conn.commit()
+        capacity_index.invalidate([vehicle_id])
+        leaderboard.record_completions(completed)
         return {"detail": "车辆已送达，订单状态更新为已完成"}
     except Exception as e:
         # 打印报错信息以便调试
@@ -201,6 +434,91 @@ def deliver_vehicle(vehicle_id: str, auth_info=Depends(require_admin_or_vehicle_
         conn.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="wtf车辆送达确认失败") from e
 
+def transition_fleet_vehicles(
+    fleet_id: int,
+    vehicle_ids: list[str] | None,
+    from_status: str,
+    to_status: str,
+    conn,
+    require_driver: bool = False,
+) -> FleetVehicleTransitionResult:
+    """把本车队处于 from_status 的车辆一次改为 to_status（运单随之联动），返回实际流转与被跳过的车辆。"""
+    try:
+        completed: list = []
+        moved = set_vehicle_status(
+            conn,
+            vehicle_ids,
+            to_status,
+            from_status=from_status,
+            fleet_id=fleet_id,
+            require_driver=require_driver,
+            completed=completed,
+        )
+        # 指定了车辆时逐个说明未流转的原因；“全部”时报告仍停在 from_status 的车辆（即缺少司机的）
+        cursor = conn.cursor()
+        base = (
+            "SELECT v.vehicle_id, v.vehicle_status, v.fleet_id, a.person_id FROM Vehicles v "
+            "LEFT JOIN Assignments a ON a.vehicle_id = v.vehicle_id WHERE v.is_deleted = 0 "
+        )
+        rest: list[str] = []
+        if vehicle_ids is not None:
+            rest = [v for v in dict.fromkeys(vehicle_ids) if v not in moved]
+            found = {}
+            if rest:
+                cursor.execute(base + f"AND v.vehicle_id IN ({', '.join(['%s'] * len(rest))})", tuple(rest))
+                found = {r["vehicle_id"]: r for r in cursor.fetchall()}
+        else:
+            cursor.execute(base + "AND v.fleet_id = %s AND v.vehicle_status = %s", (fleet_id, from_status))
+            found = {r["vehicle_id"]: r for r in cursor.fetchall()}
+            rest = list(found)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"车辆状态批量更新失败: {e}") from e
+
+    skipped = []
+    for vehicle_id in rest:
+        r = found.get(vehicle_id)
+        if r is None:
+            reason = "找不到车辆记录"
+        elif r["fleet_id"] != fleet_id:
+            reason = "不属于本车队"
+        elif r["vehicle_status"] != from_status:
+            reason = f"车辆当前状态为{r['vehicle_status']}"
+        elif require_driver and r["person_id"] is None:
+            reason = "车辆未分配司机"
+        else:
+            reason = "车辆状态已变化"
+        skipped.append(SkippedVehicle(vehicle_id=vehicle_id, reason=reason))
+    if moved:
+        capacity_index.invalidate(moved)
+        leaderboard.record_completions(completed)
+    return FleetVehicleTransitionResult(moved=sorted(moved), skipped=skipped)
+
+
+@router.post("/api/fleets/{fleet_id}/vehicles:depart", response_model=FleetVehicleTransitionResult)
+def depart_fleet_vehicles(
+    fleet_id: int,
+    payload: FleetVehicleTransition | None = None,
+    auth_info=Depends(require_admin_or_fleet_manager),
+    conn=Depends(get_db),
+):
+    """批量发车：装货中且已分配司机的车辆 → 运输中，其装货中的运单随之 → 运输中。"""
+    vehicle_ids = payload.vehicle_ids if payload else None
+    return transition_fleet_vehicles(fleet_id, vehicle_ids, "装货中", "运输中", conn, require_driver=True)
+
+
+@router.post("/api/fleets/{fleet_id}/vehicles:deliver", response_model=FleetVehicleTransitionResult)
+def deliver_fleet_vehicles(
+    fleet_id: int,
+    payload: FleetVehicleTransition | None = None,
+    auth_info=Depends(require_admin_or_fleet_manager),
+    conn=Depends(get_db),
+):
+    """批量确认送达：运输中的车辆 → 空闲，其运输中的运单随之 → 已完成。"""
+    vehicle_ids = payload.vehicle_ids if payload else None
+    return transition_fleet_vehicles(fleet_id, vehicle_ids, "运输中", "空闲", conn)
+
 # 定义一个新的返回模型，匹配前端的 data.available 和 data.unavailable
 class CenterVehicleResourcesResponse(BaseModel):
     available: list[Vehicle]
@@ -251,31 +569,43 @@ def get_vehicles_of_fleet(
     q: str | None = Query(""), 
     limit: int = Query(10, ge=1), 
     offset: int = Query(0, ge=0), 
+    after: str | None = Query(None),
+    before: str | None = Query(None),
+    count: str = Query("exact", pattern=COUNT_MODES),
     auth_info=Depends(require_admin_or_fleet_manager), 
     conn=Depends(get_db)
 ):
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) AS total FROM View_VehicleResourceStatus WHERE fleet_id = %s AND (vehicle_id LIKE %s)", (fleet_id, f"%{q}%"))
-    total = cursor.fetchone()["total"]
-
-    cursor.execute("SELECT vehicle_id, max_weight, max_volume, remaining_weight, remaining_volume, vehicle_status, fleet_id, driver_name FROM View_VehicleResourceStatus WHERE fleet_id = %s AND (vehicle_id LIKE %s) ORDER BY vehicle_id OFFSET %s ROWS FETCH NEXT %s ROWS ONLY", (fleet_id, f"%{q}%", offset, limit))
-    rows = cursor.fetchall()
-    data = [Vehicle(**r) for r in rows]
+    # 视图带聚合，总数与分页在同一条语句里算，避免 GROUP BY 重复计算
+    result = select_page(
+        conn,
+        VEHICLE_COLUMNS,
+        "FROM View_VehicleResourceStatus WHERE fleet_id = %s AND (vehicle_id LIKE %s)",
+        [fleet_id, f"%{q}%"],
+        VEHICLE_KEYS,
+        Page(limit, offset, after, before, count),
+    )
+    data = [Vehicle(**r) for r in result.rows]
 
-    return VehiclesSelect(data=data, total=total)
+    return VehiclesSelect(data=data, **result.meta())
 
 
 @router.get("/api/vehicles")
-def get_vehicles(
+async def get_vehicles(
     q: str | None = Query(""), 
     status: str | None = Query(None),
     limit: int = Query(10, ge=1), 
     offset: int = Query(0, ge=0), 
+    after: str | None = Query(None),
+    before: str | None = Query(None),
+    count: str = Query("exact", pattern=COUNT_MODES),
     auth_info=Depends(require_admin_or_manager), 
-    conn=Depends(get_db)
 ):
-    cursor = conn.cursor()
+    # 调度主管：仅允许查看自己车队的车辆
+    fleet_id = auth_info.get("fleet_id") if auth_info.get("role") == "manager" else None
+    return await run_db(select_vehicles, q, status, fleet_id, Page(limit, offset, after, before, count))
+
 
+def select_vehicles(q: str | None, status: str | None, fleet_id: int | None, page: Page, conn) -> VehiclesSelect:
     where_sql = "WHERE (vehicle_id LIKE %s)"
     params: list[object] = [f"%{q}%"]
 
@@ -291,23 +621,14 @@ def get_vehicles(
             where_sql += " AND vehicle_status = %s"
             params.append(status)
 
-    # 调度主管：仅允许查看自己车队的车辆
-    if auth_info.get("role") == "manager":
+    if fleet_id is not None:
         where_sql += " AND fleet_id = %s"
-        params.append(auth_info.get("fleet_id"))
-
-    cursor.execute(f"SELECT COUNT(*) AS total FROM View_VehicleResourceStatus {where_sql}", tuple(params))
-    total = cursor.fetchone()["total"]
+        params.append(fleet_id)
 
-    cursor.execute(
-        f"SELECT vehicle_id, max_weight, max_volume, remaining_weight, remaining_volume, vehicle_status, fleet_id, driver_name "
-        f"FROM View_VehicleResourceStatus {where_sql} ORDER BY vehicle_id OFFSET %s ROWS FETCH NEXT %s ROWS ONLY",
-        tuple(params + [offset, limit]),
-    )
-    rows = cursor.fetchall()
-    data = [Vehicle(**r) for r in rows]
+    result = select_page(conn, VEHICLE_COLUMNS, f"FROM View_VehicleResourceStatus {where_sql}", params, VEHICLE_KEYS, page)
+    data = [Vehicle(**r) for r in result.rows]
 
-    return VehiclesSelect(data=data, total=total)
+    return VehiclesSelect(data=data, **result.meta())
 
 @router.post("/api/vehicles/{vehicle_id}/driver")
 def assign_or_free_driver_to_vehicle(
@@ -0,0 +1,159 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Protocol
+
+
+class SessionStore(Protocol):
+    """会话存储接口：auth_middleware 每个请求都会调用 get，实现需保证查找足够快。"""
+
+    def issue(self, session: dict[str, Any]) -> str: ...
+
+    def get(self, token: str) -> dict[str, Any] | None: ...
+
+    def revoke(self, token: str) -> None: ...
+
+
+class MemorySessionStore:
+    """进程内会话存储：滑动过期 + LRU 容量上限。仅适用于单 worker。
+
+    - ttl：会话空闲超过该秒数即失效；每次命中且剩余时间不足一半时续期
+    - max_entries：超过上限时淘汰最久未使用的会话
+    """
+
+    def __init__(self, ttl: float = 8 * 3600, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._store: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+
+    def issue(self, session: dict[str, Any]) -> str:
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._store[token] = (time.time() + self.ttl, session)
+            while len(self._store) > self.max_entries:
+                self._store.popitem(last=False)
+        return token
+
+    def get(self, token: str) -> dict[str, Any] | None:
+        now = time.time()
+        with self._lock:
+            item = self._store.get(token)
+            if item is None:
+                return None
+            expires_at, session = item
+            if expires_at <= now:
+                del self._store[token]
+                return None
+            if expires_at - now < self.ttl / 2:
+                self._store[token] = (now + self.ttl, session)
+            self._store.move_to_end(token)
+            return session
+
+    def revoke(self, token: str) -> None:
+        with self._lock:
+            self._store.pop(token, None)
+
+
+class SQLiteSessionStore:
+    """基于 SQLite 文件的会话存储，多个 uvicorn worker 进程共享同一文件即可共享登录态，重启后不丢失。
+
+    过期与容量语义同 MemorySessionStore。get 在 auth_middleware 中同步调用（事件循环线程），
+    因此只做一次主键查找（WAL 下读不等待写）：过期的会话直接视为无效，留给登录时清理；
+    需要续期时交给后台线程写库，不等待结果，写入因多进程争用失败时下次命中再续。
+    """
+
+    def __init__(self, path: str, ttl: float = 8 * 3600, max_entries: int = 10000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._renew_lock = threading.Lock()
+        self._renewing: set[str] = set()
+        self._renew_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-renew")
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " token TEXT PRIMARY KEY,"
+            " session TEXT NOT NULL,"
+            " expires_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_sessions_expires ON sessions (expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # autocommit；WAL 允许多进程并发读，写入互相等待 busy_timeout
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def issue(self, session: dict[str, Any]) -> str:
+        token = uuid.uuid4().hex
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO sessions (token, session, expires_at) VALUES (?, ?, ?)",
+            (token, json.dumps(session, ensure_ascii=False), now + self.ttl),
+        )
+        # 登录时顺带清理：先删过期，再按过期时间（即最近使用时间）淘汰超出上限的部分
+        conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+        conn.execute(
+            "DELETE FROM sessions WHERE token IN ("
+            " SELECT token FROM sessions ORDER BY expires_at DESC LIMIT -1 OFFSET ?"
+            ")",
+            (self.max_entries,),
+        )
+        return token
+
+    def get(self, token: str) -> dict[str, Any] | None:
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute("SELECT session, expires_at FROM sessions WHERE token = ?", (token,)).fetchone()
+        if row is None:
+            return None
+        raw, expires_at = row
+        if expires_at <= now:
+            return None
+        if expires_at - now < self.ttl / 2:
+            with self._renew_lock:
+                pending = token in self._renewing
+                self._renewing.add(token)
+            if not pending:
+                self._renew_executor.submit(self._renew, token)
+        return json.loads(raw)
+
+    def _renew(self, token: str) -> None:
+        try:
+            self._conn().execute(
+                "UPDATE sessions SET expires_at = ? WHERE token = ? AND expires_at > ?",
+                (time.time() + self.ttl, token, time.time()),
+            )
+        except sqlite3.Error:
+            pass
+        finally:
+            with self._renew_lock:
+                self._renewing.discard(token)
+
+    def revoke(self, token: str) -> None:
+        self._conn().execute("DELETE FROM sessions WHERE token = ?", (token,))
+
+
+def create_session_store() -> SessionStore:
+    """按环境变量选择会话存储：SESSION_BACKEND=memory（默认）| sqlite。"""
+    backend = os.getenv("SESSION_BACKEND", "memory").strip().lower()
+    ttl = float(os.getenv("SESSION_TTL", str(8 * 3600)))
+    max_entries = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.getenv("SESSION_DB_PATH", "sessions.sqlite3"), ttl=ttl, max_entries=max_entries)
+    if backend == "memory":
+        return MemorySessionStore(ttl=ttl, max_entries=max_entries)
+    raise RuntimeError(f"未知的 SESSION_BACKEND: {backend}")
@@ -0,0 +1,196 @@
+"""车辆遥测（速度 + 时间戳采样）的流式规则引擎：持续超速、运输途中停滞时生成异常事件。
+
+- 规则按采样自带的时间判断（不用服务器时钟），回放历史轨迹与实时上报结果一致；
+  但早于服务器时间 max_age 秒、或晚于服务器时间 max_skew 秒（只容许少量时钟偏差）的采样直接丢弃：
+  未来的时间会让同一车辆之后的真实采样全部视为过期、并把其他车辆当作长期无采样淘汰，
+  离谱的数值也无法转换为日期；
+- 每辆车只保存当前这一段“超速 / 停滞”的起点和几个计数，内存与采样频率、窗口长度无关；
+  车辆数超过 max_vehicles 时先淘汰 idle_ttl 秒内没有新采样的车辆，仍然满了就不再接收新车辆；
+- 相邻两个采样间隔超过 max_gap 视为信号中断，重新开始计时，不把中断前后连成一段；
+- 同一段超速 / 停滞只报一次，速度恢复正常后才会再次报警。
+生成的事件交给 incident_queue 成批写库，写入时仍按 insert_incident 的规则过滤。
+"""
+
+import os
+import time
+from datetime import date, datetime
+from typing import Any
+
+from app.incident_queue import IncidentEvent
+
+OVERSPEED_TYPE = "超速报警"
+STALL_TYPE = "严重延误"
+
+
+class _VehicleState:
+    __slots__ = ("last_ts", "over_since", "over_max", "over_fired", "stall_since", "stall_fired")
+
+    def __init__(self):
+        self.last_ts = 0.0
+        self.over_since: float | None = None
+        self.over_max = 0.0
+        self.over_fired = False
+        self.stall_since: float | None = None
+        self.stall_fired = False
+
+
+def parse_timestamp(value: Any) -> float:
+    """采样时间：Unix 秒（数字或数字字符串）或 ISO 8601 字符串，返回 Unix 秒。"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        text = value.strip()
+        try:
+            return float(text)
+        except ValueError:
+            return datetime.fromisoformat(text.replace("Z", "+00:00")).timestamp()
+    raise ValueError("ts 应为 Unix 秒或 ISO 8601 时间")
+
+
+class TelemetryEngine:
+    def __init__(
+        self,
+        speed_limit: float = 100.0,
+        overspeed_duration: float = 30.0,
+        stall_speed: float = 3.0,
+        stall_duration: float = 1800.0,
+        max_gap: float = 120.0,
+        idle_ttl: float = 3600.0,
+        max_vehicles: int = 100000,
+        max_age: float = 86400.0,
+        max_skew: float = 300.0,
+    ):
+        self.speed_limit = speed_limit
+        self.overspeed_duration = overspeed_duration
+        self.stall_speed = stall_speed
+        self.stall_duration = stall_duration
+        self.max_gap = max_gap
+        self.idle_ttl = idle_ttl
+        self.max_vehicles = max_vehicles
+        self.max_age = max_age
+        self.max_skew = max_skew
+        self._vehicles: dict[str, _VehicleState] = {}
+        # 见过的最新采样时间，用于按事件时间淘汰长期无采样的车辆
+        self._newest_ts = 0.0
+        # 上次尝试淘汰时的 _newest_ts；满员时不必每个新车辆都扫描一遍
+        self._evicted_at: float | None = None
+        self._stats = {
+            "samples": 0,
+            "stale": 0,
+            "out_of_window": 0,
+            "rejected_vehicles": 0,
+            "evicted": 0,
+            "overspeed": 0,
+            "stalled": 0,
+        }
+
+    def _state(self, vehicle_id: str) -> _VehicleState | None:
+        state = self._vehicles.get(vehicle_id)
+        if state is not None:
+            return state
+        if len(self._vehicles) >= self.max_vehicles:
+            if self._evicted_at is None or self._newest_ts - self._evicted_at >= min(60.0, self.idle_ttl):
+                self._evicted_at = self._newest_ts
+                self.evict_idle()
+            if len(self._vehicles) >= self.max_vehicles:
+                return None
+        state = self._vehicles[vehicle_id] = _VehicleState()
+        return state
+
+    def evict_idle(self) -> int:
+        cutoff = self._newest_ts - self.idle_ttl
+        stale = [vid for vid, st in self._vehicles.items() if st.last_ts < cutoff]
+        for vid in stale:
+            del self._vehicles[vid]
+        self._stats["evicted"] += len(stale)
+        return len(stale)
+
+    def in_window(self, ts: float) -> bool:
+        """采样时间不早于服务器时间 max_age 秒、不晚于 max_skew 秒。"""
+        return -self.max_age <= ts - time.time() <= self.max_skew
+
+    def process(self, vehicle_id: str, ts: float, speed: float, fleet_id: int | None = None) -> IncidentEvent | None:
+        """处理一个采样（km/h），触发规则时返回要写入的异常事件。同一车辆时间不递增的采样直接忽略。"""
+        self._stats["samples"] += 1
+        if not self.in_window(ts):
+            self._stats["out_of_window"] += 1
+            return None
+        key = vehicle_id.casefold()
+        state = self._state(key)
+        if state is None:
+            self._stats["rejected_vehicles"] += 1
+            return None
+        if ts <= state.last_ts:
+            self._stats["stale"] += 1
+            return None
+        if ts - state.last_ts > self.max_gap:
+            state.over_since = state.stall_since = None
+        state.last_ts = ts
+        if ts > self._newest_ts:
+            self._newest_ts = ts
+
+        event = None
+        if speed > self.speed_limit:
+            if state.over_since is None:
+                state.over_since, state.over_max, state.over_fired = ts, speed, False
+            else:
+                state.over_max = max(state.over_max, speed)
+            if not state.over_fired and ts - state.over_since >= self.overspeed_duration:
+                state.over_fired = True
+                self._stats["overspeed"] += 1
+                event = IncidentEvent(
+                    vehicle_id,
+                    OVERSPEED_TYPE,
+                    f"持续超速 {ts - state.over_since:.0f} 秒，最高 {state.over_max:.0f} km/h（限速 {self.speed_limit:.0f} km/h）",
+                    0.0,
+                    date.fromtimestamp(ts),
+                    fleet_id,
+                )
+        else:
+            state.over_since = None
+
+        if speed <= self.stall_speed:
+            if state.stall_since is None:
+                state.stall_since, state.stall_fired = ts, False
+            if not state.stall_fired and ts - state.stall_since >= self.stall_duration:
+                state.stall_fired = True
+                self._stats["stalled"] += 1
+                # 停车等待在空闲、装货时是正常的，只对运输中的车辆报警
+                event = IncidentEvent(
+                    vehicle_id,
+                    STALL_TYPE,
+                    f"运输途中停滞 {(ts - state.stall_since) / 60:.0f} 分钟",
+                    0.0,
+                    date.fromtimestamp(ts),
+                    fleet_id,
+                    vehicle_status="运输中",
+                )
+        else:
+            state.stall_since = None
+        return event
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **self._stats,
+            "vehicles": len(self._vehicles),
+            "max_vehicles": self.max_vehicles,
+            "speed_limit": self.speed_limit,
+            "overspeed_duration": self.overspeed_duration,
+            "stall_speed": self.stall_speed,
+            "stall_duration": self.stall_duration,
+            "max_age": self.max_age,
+            "max_skew": self.max_skew,
+        }
+
+
+telemetry_engine = TelemetryEngine(
+    speed_limit=float(os.getenv("TELEMETRY_SPEED_LIMIT", "100")),
+    overspeed_duration=float(os.getenv("TELEMETRY_OVERSPEED_SECONDS", "30")),
+    stall_speed=float(os.getenv("TELEMETRY_STALL_SPEED", "3")),
+    stall_duration=float(os.getenv("TELEMETRY_STALL_SECONDS", "1800")),
+    max_gap=float(os.getenv("TELEMETRY_MAX_GAP", "120")),
+    idle_ttl=float(os.getenv("TELEMETRY_IDLE_TTL", "3600")),
+    max_vehicles=int(os.getenv("TELEMETRY_MAX_VEHICLES", "100000")),
+    max_age=float(os.getenv("TELEMETRY_MAX_AGE", "86400")),
+    max_skew=float(os.getenv("TELEMETRY_MAX_SKEW", "300")),
+)
@@ -0,0 +1,156 @@
+"""运单与车辆状态流转：按批、按集合执行，替代原先 Orders/Vehicles 上互相级联的触发器。
+
+流转规则（与原触发器一致）：
+- 运单 待处理 → 装货中（分配车辆）：车辆 空闲 → 装货中
+- 车辆 装货中 → 运输中（发车）：该车 装货中 的运单 → 运输中
+- 车辆 运输中 → 空闲（送达）：该车 运输中 的运单 → 已完成，并按司机分配写入 CompletedOrder
+- 运单取消：车辆不再有未完成运单时 → 空闲
+
+每个函数把一整批变更组成一次往返，每张表一条语句，用 OUTPUT 表变量把前一条语句实际改到的行
+传给下一条，不再有逐行游标和 TRIGGER_NESTLEVEL 防递归。函数只在调用方的事务内执行，不提交。
+载重台账与超载检查仍由 trg_MaintainVehicleLoad / trg_CheckOverload 按语句执行。
+"""
+
+from datetime import date
+from typing import Iterable
+
+# 车辆新状态 -> (车辆原状态, 运单原状态, 运单新状态)
+VEHICLE_CASCADES = {
+    "运输中": ("装货中", "装货中", "运输中"),
+    "空闲": ("运输中", "运输中", "已完成"),
+}
+
+
+def _placeholders(n: int) -> str:
+    return ", ".join(["%s"] * n)
+
+
+def load_orders(conn, assignments: Iterable[tuple[int, str]]) -> list[int]:
+    """把待处理运单分配给车辆（运单 → 装货中），空闲的车辆随之 → 装货中。返回实际分配的 order_id。"""
+    pairs = list(assignments)
+    if not pairs:
+        return []
+    values = ", ".join(["(%s, %s)"] * len(pairs))
+    cursor = conn.cursor()
+    # SET NOCOUNT 对整个会话有效，取结果前先恢复，同一连接之后的 cursor.rowcount 才可信
+    cursor.execute(
+        "SET NOCOUNT ON; "
+        "DECLARE @loaded TABLE (order_id INT PRIMARY KEY, vehicle_id NVARCHAR(10)); "
+        "UPDATE o SET o.vehicle_id = r.vehicle_id, o.order_status = N'装货中' "
+        "OUTPUT inserted.order_id, inserted.vehicle_id INTO @loaded "
+        f"FROM Orders o JOIN (VALUES {values}) AS r(order_id, vehicle_id) ON o.order_id = r.order_id "
+        "WHERE o.order_status = N'待处理' AND o.is_deleted = 0; "
+        "UPDATE Vehicles SET vehicle_status = N'装货中' "
+        "WHERE vehicle_status = N'空闲' AND is_deleted = 0 AND vehicle_id IN (SELECT vehicle_id FROM @loaded); "
+        "SET NOCOUNT OFF; SELECT order_id FROM @loaded;",
+        tuple(p for pair in pairs for p in pair),
+    )
+    return [r["order_id"] for r in cursor.fetchall()]
+
+
+def cancel_orders(conn, order_ids: Iterable[int], vehicles: set[str] | None = None) -> list[int]:
+    """取消运单（同时逻辑删除），涉及的车辆若已没有未完成运单则 → 空闲。返回实际取消的 order_id。
+
+    给出 vehicles 时，加入被取消运单原先分配的车辆，供调用方提交后刷新这些车辆的剩余容量。
+    """
+    ids = list(dict.fromkeys(order_ids))
+    if not ids:
+        return []
+    cursor = conn.cursor()
+    cursor.execute(
+        "SET NOCOUNT ON; "
+        "DECLARE @cancelled TABLE (order_id INT PRIMARY KEY, vehicle_id NVARCHAR(10), old_status NCHAR(3)); "
+        "UPDATE Orders SET order_status = N'已取消', is_deleted = 1 "
+        "OUTPUT inserted.order_id, deleted.vehicle_id, deleted.order_status INTO @cancelled "
+        f"WHERE order_id IN ({_placeholders(len(ids))}); "
+        "UPDATE v SET v.vehicle_status = N'空闲' FROM Vehicles v "
+        "WHERE v.is_deleted = 0 "
+        "AND v.vehicle_id IN (SELECT vehicle_id FROM @cancelled WHERE old_status <> N'已取消') "
+        "AND NOT EXISTS (SELECT 1 FROM Orders o WHERE o.vehicle_id = v.vehicle_id "
+        "AND o.order_status NOT IN (N'已完成', N'已取消') AND o.is_deleted = 0); "
+        "SET NOCOUNT OFF; SELECT order_id, vehicle_id FROM @cancelled;",
+        tuple(ids),
+    )
+    rows = cursor.fetchall()
+    if vehicles is not None:
+        vehicles.update(r["vehicle_id"] for r in rows if r["vehicle_id"] is not None)
+    return [r["order_id"] for r in rows]
+
+
+def set_vehicle_status(
+    conn,
+    vehicle_ids: Iterable[str] | None,
+    to_status: str,
+    *,
+    from_status: str | None = None,
+    fleet_id: int | None = None,
+    require_driver: bool = False,
+    completed: list[tuple[int, date, int]] | None = None,
+) -> dict[str, str]:
+    """把一批车辆改为 to_status，并按 VEHICLE_CASCADES 联动其运单。返回 {vehicle_id: 原状态}，只含实际改动的车辆。
+
+    from_status / fleet_id / require_driver 进一步限定哪些车辆可以流转（不满足的保持不变）；
+    vehicle_ids 为 None 时作用于满足这些条件的全部车辆，此时必须给出 fleet_id。
+    给出 completed 时，追加本次写入 CompletedOrder 的 (person_id, completed_at, 单数)，供调用方提交后更新排行榜。
+    """
+    where = ["is_deleted = 0"]
+    params: list[object] = [to_status]
+    if vehicle_ids is not None:
+        ids = list(dict.fromkeys(vehicle_ids))
+        if not ids:
+            return {}
+        where.append(f"vehicle_id IN ({_placeholders(len(ids))})")
+        params += ids
+    elif fleet_id is None:
+        raise ValueError("vehicle_ids 为 None 时必须指定 fleet_id")
+    if from_status is not None:
+        where.append("vehicle_status = %s")
+        params.append(from_status)
+    if fleet_id is not None:
+        where.append("fleet_id = %s")
+        params.append(fleet_id)
+    if require_driver:
+        where.append("vehicle_id IN (SELECT vehicle_id FROM Assignments)")
+    sql = [
+        "SET NOCOUNT ON; ",
+        "DECLARE @changed TABLE (vehicle_id NVARCHAR(10) PRIMARY KEY, old_status NVARCHAR(10)); ",
+        "UPDATE Vehicles SET vehicle_status = %s OUTPUT inserted.vehicle_id, deleted.vehicle_status INTO @changed ",
+        f"WHERE {' AND '.join(where)}; ",
+    ]
+    cascade = VEHICLE_CASCADES.get(to_status)
+    order_to = None
+    if cascade is not None:
+        vehicle_from, order_from, order_to = cascade
+        sql += [
+            "DECLARE @orders TABLE (order_id INT PRIMARY KEY, vehicle_id NVARCHAR(10)); ",
+            "UPDATE o SET o.order_status = %s OUTPUT inserted.order_id, inserted.vehicle_id INTO @orders ",
+            "FROM Orders o JOIN @changed c ON o.vehicle_id = c.vehicle_id ",
+            "WHERE c.old_status = %s AND o.order_status = %s AND o.is_deleted = 0; ",
+        ]
+        params += [order_to, vehicle_from, order_from]
+        if order_to == "已完成":
+            # CompletedOrder 上有维护月度汇总的触发器，OUTPUT 必须 INTO 表变量
+            sql += [
+                "DECLARE @completed TABLE (person_id INT, completed_at DATE); ",
+                "INSERT INTO CompletedOrder (order_id, person_id, completed_at) "
+                "OUTPUT inserted.person_id, inserted.completed_at INTO @completed "
+                "SELECT fo.order_id, a.person_id, CAST(GETDATE() AS DATE) "
+                "FROM @orders fo JOIN Assignments a ON fo.vehicle_id = a.vehicle_id; ",
+            ]
+    if order_to == "已完成":
+        # 车辆变更与完成记录合并为一个结果集返回，vehicle_id 为 NULL 的行是完成记录
+        sql.append(
+            "SET NOCOUNT OFF; SELECT vehicle_id, old_status, CAST(NULL AS INT) AS person_id, CAST(NULL AS DATE) AS completed_at, 0 AS n FROM @changed "
+            "UNION ALL SELECT NULL, NULL, person_id, completed_at, COUNT(*) FROM @completed GROUP BY person_id, completed_at;"
+        )
+    else:
+        sql.append("SET NOCOUNT OFF; SELECT vehicle_id, old_status FROM @changed;")
+    cursor = conn.cursor()
+    cursor.execute("".join(sql), tuple(params))
+    changed = {}
+    for r in cursor.fetchall():
+        if r["vehicle_id"] is not None:
+            changed[r["vehicle_id"]] = r["old_status"]
+        elif completed is not None:
+            completed.append((r["person_id"], r["completed_at"], int(r["n"])))
+    return changed
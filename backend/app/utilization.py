@@ -0,0 +1,111 @@
+"""车辆利用率：按 VehicleStatusHistory 统计一段时间内每辆车处于各状态的秒数。
+
+一条语句完成区间运算：每辆车按 (vehicle_id, entered_at) 定位到时间范围内开始的各段，
+再加上范围开始时正处于的那一段，把每段裁剪到 [start, end) 后按 (车辆, 状态) 求和，
+返回的行数只与车辆数 × 状态数有关，与流转次数无关。
+
+已结束的时间段（end 不晚于当前时间）结果不再变化（只追加的记录里，之后的流转不会落在这段时间内），
+缓存在进程内；车辆换车队后旧结果最长在 ttl 之后失效。
+"""
+
+import os
+from datetime import date, datetime, timedelta
+from typing import Any
+
+from app.cache import TTLCache
+
+# VehicleStatusHistory.status_code 的编码，与 Vehicles.vehicle_status 的 CHECK 顺序一致
+STATUS_NAMES = ("空闲", "装货中", "运输中", "维修中", "异常")
+# 计入利用率的状态
+IN_USE = ("装货中", "运输中")
+
+_closed = TTLCache(
+    max_entries=int(os.getenv("UTILIZATION_CACHE_SIZE", "1000")),
+    ttl=float(os.getenv("UTILIZATION_CACHE_TTL", "3600")),
+)
+
+
+def _ratios(seconds: dict[str, int], tracked: int) -> tuple[dict[str, float], float]:
+    if not tracked:
+        return {name: 0.0 for name in STATUS_NAMES}, 0.0
+    ratios = {name: round(seconds[name] / tracked, 4) for name in STATUS_NAMES}
+    return ratios, round(sum(seconds[name] for name in IN_USE) / tracked, 4)
+
+
+def _query(conn, fleet_id: int, start: datetime, end: datetime) -> list[dict[str, Any]]:
+    cursor = conn.cursor()
+    # OUTER APPLY 保证没有记录的车辆也返回一行（status_code 为 NULL）
+    cursor.execute(
+        "SELECT v.vehicle_id, h.status_code, "
+        "SUM(DATEDIFF_BIG(second, "
+        "CASE WHEN h.entered_at > %s THEN h.entered_at ELSE %s END, "
+        "CASE WHEN h.exited_at IS NULL OR h.exited_at > %s THEN %s ELSE h.exited_at END)) AS seconds "
+        "FROM Vehicles v "
+        "OUTER APPLY ("
+        "SELECT status_code, entered_at, exited_at FROM VehicleStatusHistory "
+        "WHERE vehicle_id = v.vehicle_id AND entered_at >= %s AND entered_at < %s "
+        "UNION ALL "
+        "SELECT p.status_code, p.entered_at, p.exited_at FROM ("
+        "SELECT TOP 1 status_code, entered_at, exited_at FROM VehicleStatusHistory "
+        "WHERE vehicle_id = v.vehicle_id AND entered_at < %s ORDER BY entered_at DESC"
+        ") p WHERE p.exited_at IS NULL OR p.exited_at > %s"
+        ") h "
+        "WHERE v.fleet_id = %s AND v.is_deleted = 0 "
+        "GROUP BY v.vehicle_id, h.status_code "
+        "ORDER BY v.vehicle_id",
+        (start, start, end, end, start, end, start, start, fleet_id),
+    )
+    vehicles: dict[str, dict[str, int]] = {}
+    for r in cursor.fetchall():
+        seconds = vehicles.setdefault(r["vehicle_id"], {name: 0 for name in STATUS_NAMES})
+        if r["status_code"] is not None:
+            seconds[STATUS_NAMES[r["status_code"]]] += int(r["seconds"])
+
+    rows = []
+    for vehicle_id, seconds in vehicles.items():
+        tracked = sum(seconds.values())
+        ratios, utilization = _ratios(seconds, tracked)
+        rows.append({
+            "vehicle_id": vehicle_id,
+            "tracked_seconds": tracked,
+            "seconds": seconds,
+            "ratios": ratios,
+            "utilization": utilization,
+        })
+    return rows
+
+
+def fleet_utilization(conn, fleet_id: int, first: date, last: date) -> dict[str, Any]:
+    """[first, last] 两天（含）之间车队内每辆车及整个车队的状态时长；尚未到来的时间不计入。
+
+    ratios 与 utilization（装货中 + 运输中所占比例）都以有记录的时长为分母，启用记录之前的时间不计入。
+    """
+    now = datetime.now().replace(microsecond=0)
+    start = datetime.combine(first, datetime.min.time())
+    end = datetime.combine(last + timedelta(days=1), datetime.min.time())
+    closed = end <= now
+    end = min(end, now)
+    if end <= start:
+        vehicles: list[dict[str, Any]] = []
+    else:
+        key = (fleet_id, start, end)
+        vehicles = _closed.get(key) if closed else None
+        if vehicles is None:
+            vehicles = _query(conn, fleet_id, start, end)
+            if closed:
+                _closed.set(key, vehicles)
+
+    seconds = {name: sum(v["seconds"][name] for v in vehicles) for name in STATUS_NAMES}
+    tracked = sum(seconds.values())
+    ratios, utilization = _ratios(seconds, tracked)
+    return {
+        "fleet_id": fleet_id,
+        "from_date": first,
+        "to_date": last,
+        "window_seconds": max(int((end - start).total_seconds()), 0),
+        "tracked_seconds": tracked,
+        "seconds": seconds,
+        "ratios": ratios,
+        "utilization": utilization,
+        "vehicles": vehicles,
+    }
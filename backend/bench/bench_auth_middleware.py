@@ -0,0 +1,110 @@
+"""鉴权中间件开销基准：直接驱动 ASGI 应用，比较每个请求的平均耗时。
+
+- none：不挂鉴权中间件（基线）
+- base_http：同样的鉴权逻辑以 app.middleware("http") 方式挂载（即 BaseHTTPMiddleware，旧写法）
+- asgi：AuthMiddleware 纯 ASGI 实现
+
+用法：
+
+    python bench/bench_auth_middleware.py --requests 20000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from app.auth_core import AuthMiddleware, PermissionTable, _iter_route_paths, parse_bearer_token, token_store  # noqa: E402
+
+
+def build_app(mode: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/fleets/{fleet_id}/vehicles")
+    async def fleet_vehicles(fleet_id: int):
+        return {"fleet_id": fleet_id}
+
+    if mode == "asgi":
+        app.add_middleware(AuthMiddleware, routes=app.router.routes)
+    elif mode == "base_http":
+        table = PermissionTable(_iter_route_paths(app.router.routes))
+
+        @app.middleware("http")
+        async def auth_middleware(request: Request, call_next):
+            token = parse_bearer_token(request.headers.get("Authorization"))
+            session = token_store.get(token) if token else None
+            if not session:
+                return JSONResponse(status_code=401, content={"detail": "Invalid token"})
+            if not table.is_allowed(request.url.path, session):
+                return JSONResponse(status_code=403, content={"detail": "Forbidden"})
+            request.state.auth = session
+            return await call_next(request)
+
+    return app
+
+
+async def drive(app, token: str, n: int) -> float:
+    scope_base = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/fleets/2/vehicles",
+        "raw_path": b"/api/fleets/2/vehicles",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench"), (b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 1),
+        "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    statuses = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    # 预热：触发中间件栈构建与权限表编译
+    await app(dict(scope_base), receive, send)
+    assert statuses[-1] == 200, statuses[-1]
+
+    start = time.perf_counter()
+    for _ in range(n):
+        await app(dict(scope_base), receive, send)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    token = token_store.issue({"role": "manager", "personnel_id": 1, "fleet_id": 2})
+    results = {}
+    for mode in ("none", "base_http", "asgi"):
+        results[mode] = asyncio.run(drive(build_app(mode), token, args.requests)) / args.requests * 1e6
+
+    for mode, us in results.items():
+        extra = "" if mode == "none" else f"  中间件开销 {us - results['none']:.1f} µs"
+        print(f"{mode:<10} {us:8.1f} µs/请求{extra}")
+
+    table = PermissionTable(["/api/fleets/{fleet_id}/vehicles", "/api/vehicles", "/api/drivers/{person_id}/orders"])
+    session = {"role": "manager", "personnel_id": 1, "fleet_id": 2}
+    start = time.perf_counter()
+    for _ in range(200000):
+        table.is_allowed("/api/fleets/2/vehicles", session)
+    print(f"权限表查找 {(time.perf_counter() - start) / 200000 * 1e6:.2f} µs/次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""批量导入基准：向 /api/orders/bulk 流式上传生成的运单，输出客户端吞吐量与服务端汇总。
+
+用法（先启动后端，并用 admin 登录拿到 token）：
+
+    python bench/bench_bulk_orders.py --token <TOKEN> --rows 100000 --format ndjson
+
+不加 --token 时只在本地跑解析与校验（不连数据库），用于衡量不含写库的纯 CPU 开销：
+
+    python bench/bench_bulk_orders.py --rows 100000 --format csv
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+PLACES = ["仓库A", "仓库B", "上海浦东", "北京朝阳", "广州天河", "成都高新"]
+
+
+def generate(rows: int, fmt: str, invalid_ratio: float, batch: int = 1000):
+    """按块产出请求体，避免在内存中拼出整个文件。"""
+    rnd = random.Random(42)
+    buf: list[str] = ["origin,destination,weight,volume\n"] if fmt == "csv" else []
+    for _ in range(rows):
+        origin, destination = rnd.sample(PLACES, 2)
+        weight = round(rnd.uniform(1, 2000), 2)
+        volume = round(rnd.uniform(0.1, 20), 2)
+        if rnd.random() < invalid_ratio:
+            weight = -weight
+        if fmt == "csv":
+            buf.append(f"{origin},{destination},{weight},{volume}\n")
+        else:
+            buf.append(json.dumps({"origin": origin, "destination": destination, "weight": weight, "volume": volume}, ensure_ascii=False) + "\n")
+        if len(buf) >= batch:
+            yield "".join(buf).encode("utf-8")
+            buf = []
+    if buf:
+        yield "".join(buf).encode("utf-8")
+
+
+class _FakeRequest:
+    def __init__(self, chunks, content_type: str):
+        self._chunks = chunks
+        self.headers = {"content-type": content_type}
+
+    async def stream(self):
+        for chunk in self._chunks:
+            yield chunk
+
+
+async def run_offline(args) -> None:
+    from app.bulk import iter_records
+    from app.routers.orders import _parse_bulk_order
+
+    request = _FakeRequest(generate(args.rows, args.format, args.invalid_ratio), "")
+    ok = failed = 0
+    start = time.perf_counter()
+    async for _, record, error in iter_records(request, args.format):
+        if error is None:
+            _, error = _parse_bulk_order(record)
+        if error is None:
+            ok += 1
+        else:
+            failed += 1
+    elapsed = time.perf_counter() - start
+    print(f"格式: {args.format}  行数: {ok + failed}  有效: {ok}  无效: {failed}")
+    print(f"解析+校验: {elapsed:.2f}s  {(ok + failed) / elapsed:.0f} rows/s")
+
+
+async def run_http(args) -> None:
+    import httpx
+
+    content_type = "text/csv" if args.format == "csv" else "application/x-ndjson"
+    headers = {"Authorization": f"Bearer {args.token}", "Content-Type": content_type}
+
+    async def body():
+        for chunk in generate(args.rows, args.format, args.invalid_ratio):
+            yield chunk
+
+    summary = None
+    inserted = failed = 0
+    async with httpx.AsyncClient(base_url=args.base_url, headers=headers, timeout=None) as client:
+        start = time.perf_counter()
+        async with client.stream("POST", "/api/orders/bulk", content=body()) as res:
+            if res.status_code != 200:
+                print(f"请求失败: {res.status_code} {(await res.aread()).decode('utf-8', 'replace')}")
+                return
+            async for line in res.aiter_lines():
+                if not line:
+                    continue
+                item = json.loads(line)
+                if "summary" in item:
+                    summary = item["summary"]
+                elif item["ok"]:
+                    inserted += 1
+                else:
+                    failed += 1
+        elapsed = time.perf_counter() - start
+
+    print(f"格式: {args.format}  行数: {args.rows}  插入: {inserted}  失败: {failed}  查询数: {res.headers.get('x-db-queries')}")
+    print(f"客户端: {elapsed:.2f}s  {args.rows / elapsed:.0f} rows/s")
+    if summary is not None:
+        print(f"服务端: {summary['elapsed_ms'] / 1000:.2f}s  {summary['rows_per_sec']:.0f} rows/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--token", help="不提供时只在本地测解析与校验")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--invalid-ratio", type=float, default=0.01, help="故意生成的无效行比例")
+    args = parser.parse_args()
+    asyncio.run(run_http(args) if args.token else run_offline(args))
+
+
+if __name__ == "__main__":
+    main()
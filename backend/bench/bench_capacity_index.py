@@ -0,0 +1,97 @@
+"""车辆推荐索引基准：在内存快照上查询最佳匹配车辆的单次耗时（不含首次从数据库加载），以及每次查询前都有一辆车失效时的耗时。
+
+用法：
+
+    python bench/bench_capacity_index.py --vehicles 5000 --fleets 50 --lookups 20000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.capacity import CapacityIndex  # noqa: E402
+
+
+class _Cursor:
+    def __init__(self, rows, by_id):
+        self._rows = rows
+        self._by_id = by_id
+        self._ids = None
+
+    def execute(self, sql, params=()):
+        # 前两个参数是车辆状态，其余为按车辆重新读取时的 vehicle_id
+        self._ids = set(params[2:]) if len(params) > 2 else None
+
+    def fetchall(self):
+        if self._ids is None:
+            return [dict(r) for r in self._rows]
+        return [dict(self._by_id[i]) for i in self._ids if i in self._by_id]
+
+
+class _Conn:
+    """模拟 View_VehicleResourceStatus 的查询结果。"""
+
+    def __init__(self, rows):
+        self._rows = rows
+        self._by_id = {r["vehicle_id"]: r for r in rows}
+
+    def cursor(self):
+        return _Cursor(self._rows, self._by_id)
+
+
+def make_vehicles(n: int, fleets: int) -> list[dict]:
+    rows = []
+    for i in range(n):
+        max_weight = random.choice([2000, 5000, 10000, 20000])
+        max_volume = max_weight / 200
+        used = random.random() * 0.9
+        rows.append({
+            "vehicle_id": f"V{i:05d}",
+            "fleet_id": i % fleets,
+            "vehicle_status": random.choice(["空闲", "装货中"]),
+            "max_weight": max_weight,
+            "max_volume": max_volume,
+            "remaining_weight": round(max_weight * (1 - used), 2),
+            "remaining_volume": round(max_volume * (1 - used), 2),
+        })
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vehicles", type=int, default=5000)
+    parser.add_argument("--fleets", type=int, default=50)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    conn = _Conn(make_vehicles(args.vehicles, args.fleets))
+    index = CapacityIndex(ttl=3600)
+    start = time.perf_counter()
+    index.candidates(conn, 0, 0)
+    print(f"加载快照 {args.vehicles} 辆车: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    orders = [(random.uniform(10, 8000), random.uniform(0.1, 40)) for _ in range(args.lookups)]
+    for label, fleet_ids in (("全部车辆", [None]), ("单个车队", list(range(args.fleets)))):
+        start = time.perf_counter()
+        for weight, volume in orders:
+            index.candidates(conn, weight, volume, fleet_id=random.choice(fleet_ids), limit=args.limit)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<6} 平均 {elapsed / args.lookups * 1e6:.1f} µs/次")
+
+    # 模拟写入频繁：每次查询前都有一辆车的剩余容量变化，只重新读取这一辆
+    vehicle_ids = [r["vehicle_id"] for r in conn._rows]
+    start = time.perf_counter()
+    for weight, volume in orders:
+        index.invalidate([random.choice(vehicle_ids)])
+        index.candidates(conn, weight, volume, limit=args.limit)
+    elapsed = time.perf_counter() - start
+    print(f"写后读   平均 {elapsed / args.lookups * 1e6:.1f} µs/次（每次查询前失效 1 辆车）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""HTTP 压测脚本：并发请求热点只读接口，输出吞吐量与延迟分位数。
+
+用法（先启动后端，并用 admin 登录拿到 token）：
+
+    python bench/bench_http.py --token <TOKEN> --concurrency 200 --requests 5000
+
+对比改动前后：分别在两个版本上启动 uvicorn（相同 worker 数）各跑一次即可。
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+DEFAULT_PATHS = [
+    "/api/vehicles?limit=10&offset=0",
+    "/api/orders/pending?limit=10&offset=0",
+    "/api/orders/transit?limit=10&offset=0",
+    "/api/incidents?limit=10&offset=0",
+]
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+async def worker(client: httpx.AsyncClient, paths: list[str], queue: asyncio.Queue, latencies: list[float], errors: list[int]):
+    while True:
+        try:
+            i = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        path = paths[i % len(paths)]
+        start = time.perf_counter()
+        try:
+            res = await client.get(path)
+            if res.status_code != 200:
+                errors.append(res.status_code)
+        except httpx.HTTPError:
+            errors.append(-1)
+        latencies.append(time.perf_counter() - start)
+
+
+async def run(args) -> None:
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(i)
+
+    latencies: list[float] = []
+    errors: list[int] = []
+    headers = {"Authorization": f"Bearer {args.token}"}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, headers=headers, limits=limits, timeout=60) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client, args.paths, queue, latencies, errors) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"并发: {args.concurrency}  请求数: {args.requests}  错误: {len(errors)}")
+    print(f"吞吐量: {args.requests / elapsed:.1f} req/s  总耗时: {elapsed:.2f}s")
+    print(
+        f"延迟(ms): mean={statistics.fmean(latencies) * 1000:.1f} "
+        f"p50={percentile(latencies, 50) * 1000:.1f} "
+        f"p95={percentile(latencies, 95) * 1000:.1f} "
+        f"p99={percentile(latencies, 99) * 1000:.1f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--paths", nargs="*", default=DEFAULT_PATHS)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
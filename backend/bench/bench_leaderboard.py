@@ -0,0 +1,59 @@
+"""排行榜基准：对比每次读取时全量排序与增量维护的有序结构（不连数据库）。
+
+模拟 --drivers 个司机的一个周期快照，交替执行 --ops 次“某司机计数 +1”与“读取 Top-N / Bottom-N”，
+输出两种方式的总耗时，并核对两者读到的排名一致：
+
+    python bench/bench_leaderboard.py --drivers 20000 --ops 1000 --limit 10
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.leaderboard import _Ranking  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--drivers", type=int, default=20000)
+    parser.add_argument("--ops", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    values = {pid: rnd.randint(0, 200) for pid in range(1, args.drivers + 1)}
+    ops = [(rnd.randrange(1, args.drivers + 1), rnd.random() < 0.5) for _ in range(args.ops)]
+
+    naive = dict(values)
+    start = time.perf_counter()
+    naive_reads = []
+    for pid, bottom in ops:
+        naive[pid] += 1
+        keys = sorted((-v, p) for p, v in naive.items())
+        naive_reads.append(keys[-args.limit:][::-1] if bottom else keys[:args.limit])
+    t_naive = time.perf_counter() - start
+
+    current = dict(values)
+    start = time.perf_counter()
+    ranking = _Ranking((-v, p) for p, v in current.items())
+    reads = []
+    for pid, bottom in ops:
+        ranking.remove((-current[pid], pid))
+        current[pid] += 1
+        ranking.add((-current[pid], pid))
+        reads.append(list(ranking.tail(args.limit) if bottom else ranking.head(args.limit)))
+    t_index = time.perf_counter() - start
+
+    print(f"司机: {args.drivers}  操作: {args.ops}  Top/Bottom: {args.limit}")
+    print(f"全量排序: {t_naive:.2f}s  {t_naive / args.ops * 1e6:.0f}us/次")
+    print(f"有序结构: {t_index:.2f}s  {t_index / args.ops * 1e6:.0f}us/次（含初始构建）")
+    print("两种方式排名一致" if reads == naive_reads else "排名不一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""月度报表基准：对比按明细扫描的原查询与读取 FleetMonthlyStats 的 GetFleetMonthlyPerformance（需要可连接的 SQL Server）。
+
+对每个车队、最近 --months 个月分别执行两种查询各 --repeat 次，输出单次耗时的中位数 / P95，
+并逐一比对两者结果是否一致（不一致通常说明需要执行 CheckFleetMonthlyStats @Rebuild = 1 回填）。只读，不修改数据。
+
+用法（环境变量同后端：SQL_SERVER / SQL_USER / SQL_PASSWORD / SQL_DATABASE）：
+
+    python bench/bench_monthly_report.py --months 12 --repeat 5
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.db import connect_db  # noqa: E402
+
+# 原 GetFleetMonthlyPerformance 的查询，按 YEAR()/MONTH() 过滤，需要扫描该车队全部历史明细
+LEGACY_SQL = """
+SELECT
+    (SELECT COUNT(co.order_id)
+     FROM CompletedOrder co
+     JOIN Orders o ON co.order_id = o.order_id
+     JOIN Vehicles v ON o.vehicle_id = v.vehicle_id
+     WHERE v.fleet_id = %s AND YEAR(co.completed_at) = %s AND MONTH(co.completed_at) = %s) AS Total_Orders,
+    ISNULL(x.n, 0) AS Total_Incidents,
+    ISNULL(x.fines, 0.00) AS Total_Fine_Amount
+FROM (
+    SELECT COUNT(i.incident_id) AS n, SUM(i.fine_amount) AS fines
+    FROM Incidents i
+    JOIN Vehicles v ON i.vehicle_id = v.vehicle_id
+    WHERE v.fleet_id = %s AND YEAR(i.occurrence_time) = %s AND MONTH(i.occurrence_time) = %s AND i.is_deleted = 0
+) x
+"""
+
+
+def recent_months(n: int) -> list[tuple[int, int]]:
+    today = date.today()
+    y, m = today.year, today.month
+    result = []
+    for _ in range(n):
+        result.append((y, m))
+        y, m = (y - 1, 12) if m == 1 else (y, m - 1)
+    return result
+
+
+def timed(cursor, sql: str, params: tuple) -> tuple[float, tuple]:
+    start = time.perf_counter()
+    cursor.execute(sql, params)
+    row = cursor.fetchone()
+    elapsed = time.perf_counter() - start
+    return elapsed, (int(row["Total_Orders"]), int(row["Total_Incidents"]), float(row["Total_Fine_Amount"]))
+
+
+def summarize(name: str, samples: list[float]) -> None:
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{name:8s} 次数: {len(samples)}  中位数: {statistics.median(samples) * 1000:.2f}ms  P95: {p95 * 1000:.2f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT fleet_id FROM Fleets WHERE is_deleted = 0 ORDER BY fleet_id")
+        fleets = [r["fleet_id"] for r in cursor.fetchall()]
+        legacy: list[float] = []
+        rollup: list[float] = []
+        mismatches = []
+        for fleet_id in fleets:
+            for year, month in recent_months(args.months):
+                for _ in range(args.repeat):
+                    t_old, old = timed(cursor, LEGACY_SQL, (fleet_id, year, month, fleet_id, year, month))
+                    t_new, new = timed(cursor, "EXEC GetFleetMonthlyPerformance @FleetID=%s, @Year=%s, @Month=%s", (fleet_id, year, month))
+                    legacy.append(t_old)
+                    rollup.append(t_new)
+                if old != new:
+                    mismatches.append((fleet_id, f"{year}-{month:02d}", old, new))
+        conn.rollback()
+    finally:
+        conn.close()
+
+    print(f"车队: {len(fleets)}  月份: {args.months}")
+    summarize("原查询", legacy)
+    summarize("汇总表", rollup)
+    if mismatches:
+        print(f"结果不一致 {len(mismatches)} 处（车队, 月份, 原查询, 汇总表）：")
+        for m in mismatches[:20]:
+            print("  ", m)
+    else:
+        print("两种查询结果一致")
+
+
+if __name__ == "__main__":
+    main()
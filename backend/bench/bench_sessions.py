@@ -0,0 +1,42 @@
+"""会话查找基准：auth_middleware 每个请求都会调用 token_store.get，这里测各实现的单次查找耗时。
+
+用法：
+
+    python bench/bench_sessions.py --sessions 10000 --lookups 200000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.sessions import MemorySessionStore, SQLiteSessionStore  # noqa: E402
+
+
+def bench(name: str, store, sessions: int, lookups: int) -> None:
+    tokens = [store.issue({"role": "manager", "personnel_id": i, "fleet_id": i % 50}) for i in range(sessions)]
+    keys = [random.choice(tokens) for _ in range(lookups)]
+    start = time.perf_counter()
+    for t in keys:
+        store.get(t)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<8} {lookups / elapsed:>12.0f} 次/秒  平均 {elapsed / lookups * 1e6:.2f} µs/次")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--lookups", type=int, default=200000)
+    args = parser.parse_args()
+
+    bench("memory", MemorySessionStore(max_entries=args.sessions), args.sessions, args.lookups)
+    with tempfile.TemporaryDirectory() as tmp:
+        bench("sqlite", SQLiteSessionStore(os.path.join(tmp, "sessions.sqlite3"), max_entries=args.sessions), args.sessions, args.lookups)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""遥测回放压测：按时间顺序回放车辆速度采样，衡量规则引擎 / 上报接口的吞吐量。
+
+轨迹为 NDJSON，每行 {"vehicle_id", "ts", "speed"}，按 ts 排序。可以先生成一份合成轨迹（含持续超速与停滞的车辆）：
+
+    python bench/bench_telemetry.py --generate trace.ndjson --vehicles 2000 --duration 3600
+
+不加 --token 时直接在本进程内回放给规则引擎（不连数据库），输出吞吐量与每辆车的内存占用：
+
+    python bench/bench_telemetry.py --trace trace.ndjson
+
+加 --token 时向 /api/vehicles/telemetry 分块上传（先启动后端并用 admin 登录拿到 token），
+--rate 限制每秒发送的采样数（0 为不限速），--connections 按车辆把轨迹分给多个并发连接：
+
+    python bench/bench_telemetry.py --trace trace.ndjson --token <TOKEN> --connections 4 --rate 5000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+def synthesize(vehicles: int, duration: int, interval: float, seed: int = 42):
+    """合成轨迹：约 5% 的车辆中途持续超速，约 5% 的车辆长时间停滞，其余正常行驶。"""
+    rnd = random.Random(seed)
+    plans = []
+    for i in range(vehicles):
+        kind = rnd.random()
+        start = rnd.uniform(0, duration / 2)
+        plans.append((f"T{i:05d}", kind, start, rnd.uniform(0, interval)))
+    steps = int(duration / interval)
+    # 轨迹截止到生成时刻：上报接口只接受与服务器时间相差一天以内的采样
+    start_ts = time.time() - duration
+    for step in range(steps):
+        for vehicle_id, kind, start, offset in plans:
+            t = step * interval + offset
+            if kind < 0.05 and start <= t < start + 120:
+                speed = rnd.uniform(105, 140)
+            elif 0.05 <= kind < 0.10 and t >= start:
+                speed = rnd.uniform(0, 2)
+            else:
+                speed = rnd.uniform(40, 95)
+            yield {"vehicle_id": vehicle_id, "ts": round(start_ts + t, 3), "speed": round(speed, 1)}
+
+
+def read_trace(path: str):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def run_offline(samples: list[dict]) -> None:
+    from app.telemetry import TelemetryEngine
+
+    # 本地回放不限制采样时间，旧轨迹也能重复使用
+    engine = TelemetryEngine(max_age=float("inf"))
+    tracemalloc.start()
+    start = time.perf_counter()
+    incidents = 0
+    for s in samples:
+        if engine.process(s["vehicle_id"], float(s["ts"]), float(s["speed"])) is not None:
+            incidents += 1
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = engine.stats()
+    print(f"采样: {len(samples)}  车辆: {stats['vehicles']}  超速: {stats['overspeed']}  停滞: {stats['stalled']}  乱序: {stats['stale']}")
+    print(f"规则引擎: {elapsed:.2f}s  {len(samples) / elapsed:.0f} samples/s")
+    print(f"内存: {current / 1024 / 1024:.1f} MiB  约 {current / max(stats['vehicles'], 1):.0f} B/车（含 tracemalloc 统计期间的临时对象）")
+
+
+async def run_http(args, samples: list[dict]) -> None:
+    import httpx
+
+    shards: list[list[dict]] = [[] for _ in range(args.connections)]
+    for s in samples:
+        shards[hash(s["vehicle_id"]) % args.connections].append(s)
+    per_conn_rate = args.rate / args.connections if args.rate else 0
+    headers = {"Authorization": f"Bearer {args.token}", "Content-Type": "application/x-ndjson"}
+
+    async def body(shard: list[dict]):
+        sent = 0
+        start = time.perf_counter()
+        for i in range(0, len(shard), args.chunk):
+            part = shard[i:i + args.chunk]
+            yield "".join(json.dumps(s) + "\n" for s in part).encode("utf-8")
+            sent += len(part)
+            if per_conn_rate:
+                # 按目标速率节流：提前发完的部分等到该发的时刻
+                delay = sent / per_conn_rate - (time.perf_counter() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+    async def send(client, shard: list[dict]) -> dict:
+        res = await client.post("/api/vehicles/telemetry", content=body(shard))
+        if res.status_code != 200:
+            raise RuntimeError(f"请求失败: {res.status_code} {res.text}")
+        return res.json()
+
+    async with httpx.AsyncClient(base_url=args.base_url, headers=headers, timeout=None) as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(send(client, shard) for shard in shards if shard))
+        elapsed = time.perf_counter() - start
+
+    total = {k: sum(r[k] for r in results) for k in ("samples", "accepted", "invalid", "incidents", "queued", "duplicates")}
+    print(f"连接: {args.connections}  " + "  ".join(f"{k}: {v}" for k, v in total.items()))
+    print(f"客户端: {elapsed:.2f}s  {total['samples'] / elapsed:.0f} samples/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--generate", metavar="PATH", help="生成合成轨迹写入 PATH 后退出")
+    parser.add_argument("--trace", metavar="PATH", help="回放的轨迹文件；不提供时在内存中合成")
+    parser.add_argument("--vehicles", type=int, default=1000)
+    parser.add_argument("--duration", type=int, default=3600, help="合成轨迹的时长（秒）")
+    parser.add_argument("--interval", type=float, default=5.0, help="每辆车的采样间隔（秒）")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--token", help="不提供时只在本地回放给规则引擎")
+    parser.add_argument("--connections", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=0, help="每秒发送的采样总数，0 为不限速")
+    parser.add_argument("--chunk", type=int, default=500, help="每个上传分块的采样数")
+    args = parser.parse_args()
+
+    if args.generate:
+        count = 0
+        with open(args.generate, "w", encoding="utf-8") as f:
+            for s in synthesize(args.vehicles, args.duration, args.interval):
+                f.write(json.dumps(s) + "\n")
+                count += 1
+        print(f"已写入 {count} 条采样到 {args.generate}")
+        return
+
+    samples = list(read_trace(args.trace) if args.trace else synthesize(args.vehicles, args.duration, args.interval))
+    if args.token:
+        asyncio.run(run_http(args, samples))
+    else:
+        run_offline(samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""状态流转基准：在同一批数据上对比原级联触发器与 app.transitions 的耗时（需要可连接的 SQL Server）。
+
+每种模式在一个事务里完成：造数（N 辆车、N 个司机及分配、2N 个运单）→ 分配 → 发车 → 送达 → 再分配 → 取消，
+最后回滚，不留下任何数据。legacy 模式在事务内临时创建原来的四个触发器并只执行单表 UPDATE，
+engine 模式在事务内删除这些触发器（若存在）并调用 app.transitions。两种模式结束时的状态计数应一致。
+
+用法（环境变量同后端：SQL_SERVER / SQL_USER / SQL_PASSWORD / SQL_DATABASE）：
+
+    python bench/bench_transitions.py --rows 10000 --chunk 1000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.db import connect_db  # noqa: E402
+from app.transitions import cancel_orders, load_orders, set_vehicle_status  # noqa: E402
+
+TAG = "bench-transitions"
+VEHICLE_PREFIX = "BT"
+LEGACY_NAMES = ("trg_UpdateVehicleToLoading", "trg_SyncOrderToTransit", "trg_CompleteOrderOnVehicleIdle", "trg_SetVehicleIdleOnOrderCancel")
+
+# 原 triggers.sql 中被 app.transitions 取代的四个触发器，仅供本基准在事务内临时重建
+LEGACY_TRIGGERS = [
+    """
+CREATE OR ALTER TRIGGER trg_UpdateVehicleToLoading
+ON Orders
+AFTER UPDATE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF TRIGGER_NESTLEVEL() > 1 RETURN; -- 防递归
+    -- 检查是否更新了 order_status 字段
+    IF UPDATE(order_status)
+    BEGIN
+
+        UPDATE v
+        SET v.vehicle_status = N'装货中'
+        FROM Vehicles v
+        INNER JOIN inserted i ON v.vehicle_id = i.vehicle_id
+        INNER JOIN deleted d ON i.order_id = d.order_id
+        WHERE d.order_status = N'待处理'
+          AND i.order_status = N'装货中'
+          AND v.vehicle_status = N'空闲'
+          AND v.is_deleted = 0;
+
+    END
+END;
+""",
+    """
+CREATE OR ALTER TRIGGER trg_SyncOrderToTransit
+ON Vehicles
+AFTER UPDATE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF TRIGGER_NESTLEVEL() > 1 RETURN; -- 防递归
+    -- 检查是否有实际的行被更新（排除虚拟更新）
+    IF NOT EXISTS (SELECT 1 FROM inserted) OR NOT EXISTS (SELECT 1 FROM deleted)
+        RETURN;
+
+    -- 1. 检查是否更新了 vehicle_status 字段
+    IF UPDATE(vehicle_status)
+    BEGIN
+
+        UPDATE o
+        SET o.order_status = N'运输中'
+        FROM Orders o
+        INNER JOIN inserted i ON o.vehicle_id = i.vehicle_id
+        INNER JOIN deleted d ON i.vehicle_id = d.vehicle_id
+        WHERE i.vehicle_status = N'运输中'     -- 更新后的车辆状态
+          AND d.vehicle_status = N'装货中'     -- 更新前的车辆状态（确保是从装货完成到出发）
+          AND o.order_status = N'装货中'       -- 仅针对正在装货的订单
+          AND o.is_deleted = 0;
+    END
+END;
+""",
+    """
+CREATE OR ALTER TRIGGER trg_CompleteOrderOnVehicleIdle
+ON Vehicles
+AFTER UPDATE
+AS BEGIN
+    SET NOCOUNT ON;
+    IF TRIGGER_NESTLEVEL() > 1 RETURN;
+
+    IF UPDATE(vehicle_status)
+    BEGIN
+        -- 定义表变量，用于暂存本次真正被更新的订单
+        DECLARE @JustFinishedOrders TABLE (
+            order_id INT,
+            vehicle_id NVARCHAR(50)
+        );
+
+        UPDATE o
+        SET o.order_status = N'已完成'
+        OUTPUT inserted.order_id, inserted.vehicle_id INTO @JustFinishedOrders(order_id, vehicle_id)
+        FROM Orders o
+        INNER JOIN inserted i ON o.vehicle_id = i.vehicle_id
+        INNER JOIN deleted d ON i.vehicle_id = d.vehicle_id
+        WHERE i.vehicle_status = N'空闲'        -- 更新后的车辆状态
+          AND d.vehicle_status = N'运输中'      -- 更新前的车辆状态
+          AND o.order_status = N'运输中';       -- 仅针对正在运输的订单
+
+        INSERT INTO CompletedOrder (order_id, person_id, completed_at)
+        SELECT fo.order_id, a.person_id, CAST(GETDATE() AS DATE)
+        FROM @JustFinishedOrders fo
+        INNER JOIN Assignments a ON fo.vehicle_id = a.vehicle_id;
+    END
+END;
+""",
+    """
+CREATE OR ALTER TRIGGER trg_SetVehicleIdleOnOrderCancel
+ON Orders
+AFTER UPDATE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF TRIGGER_NESTLEVEL() > 1 RETURN; -- 防递归
+    -- 检查是否更新了 order_status 字段
+    IF UPDATE(order_status)
+    BEGIN
+        -- 对于每个被取消订单的车辆，检查是否还有其他未完成订单
+        DECLARE @VehicleID NVARCHAR(10);
+
+        DECLARE CancelledOrdersCursor CURSOR FOR
+        SELECT i.vehicle_id
+        FROM inserted i
+        INNER JOIN deleted d ON i.order_id = d.order_id
+        WHERE d.order_status <> N'已取消' AND i.order_status = N'已取消';
+
+        OPEN CancelledOrdersCursor;
+        FETCH NEXT FROM CancelledOrdersCursor INTO @VehicleID;
+
+        WHILE @@FETCH_STATUS = 0
+        BEGIN
+            -- 检查该车辆是否还有其他未完成订单
+            IF NOT EXISTS (
+                SELECT 1
+                FROM Orders o
+                WHERE o.vehicle_id = @VehicleID
+                  AND o.order_status NOT IN (N'已完成', N'已取消')
+                  AND o.is_deleted = 0
+            )
+            BEGIN
+                -- 将车辆状态更新为“空闲”
+                UPDATE Vehicles
+                SET vehicle_status = N'空闲'
+                WHERE vehicle_id = @VehicleID
+                  AND is_deleted = 0;
+            END
+
+            FETCH NEXT FROM CancelledOrdersCursor INTO @VehicleID;
+        END
+
+        CLOSE CancelledOrdersCursor;
+        DEALLOCATE CancelledOrdersCursor;
+    END
+END;
+"""
+]
+
+
+def chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def setup(conn, rows: int) -> tuple[list[str], list[tuple[int, str]], list[tuple[int, str]]]:
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) AS n FROM Vehicles WHERE vehicle_id LIKE %s", (VEHICLE_PREFIX + "%",))
+    if cursor.fetchone()["n"]:
+        raise SystemExit(f"库中已有 {VEHICLE_PREFIX} 开头的车辆，请换一个库再运行")
+    cursor.execute(
+        """SET NOCOUNT ON;
+        INSERT INTO DistributionCenters (center_name) VALUES (%s);
+        DECLARE @center INT = SCOPE_IDENTITY();
+        INSERT INTO Fleets (fleet_name, center_id) VALUES (%s, @center);
+        DECLARE @fleet INT = SCOPE_IDENTITY();
+        DECLARE @drivers TABLE (person_id INT PRIMARY KEY);
+
+        WITH n AS (SELECT TOP (%s) ROW_NUMBER() OVER (ORDER BY (SELECT NULL)) AS i FROM sys.all_objects a CROSS JOIN sys.all_objects b)
+        INSERT INTO Vehicles (vehicle_id, max_weight, max_volume, fleet_id)
+        SELECT %s + RIGHT('00000000' + CAST(i AS VARCHAR(8)), 8), 10000, 100, @fleet FROM n;
+
+        WITH n AS (SELECT TOP (%s) ROW_NUMBER() OVER (ORDER BY (SELECT NULL)) AS i FROM sys.all_objects a CROSS JOIN sys.all_objects b)
+        INSERT INTO Drivers (person_name, driver_license, fleet_id) OUTPUT inserted.person_id INTO @drivers
+        SELECT %s, 'A2', @fleet FROM n;
+
+        INSERT INTO Assignments (person_id, vehicle_id)
+        SELECT d.person_id, v.vehicle_id
+        FROM (SELECT person_id, ROW_NUMBER() OVER (ORDER BY person_id) AS i FROM @drivers) d
+        JOIN (SELECT vehicle_id, ROW_NUMBER() OVER (ORDER BY vehicle_id) AS i FROM Vehicles WHERE fleet_id = @fleet) v ON v.i = d.i;
+
+        -- 每辆车两个运单：第一批走完分配→发车→送达，第二批分配后取消
+        INSERT INTO Orders (weight, volume, origin, destination)
+        SELECT 1, 0.1, %s, v.vehicle_id FROM Vehicles v CROSS JOIN (VALUES (1), (2)) AS k(k) WHERE v.fleet_id = @fleet;""",
+        (TAG, TAG, rows, VEHICLE_PREFIX, rows, TAG, TAG),
+    )
+    cursor.execute("SELECT order_id, destination FROM Orders WHERE origin = %s ORDER BY order_id", (TAG,))
+    first: dict[str, int] = {}
+    second: list[tuple[int, str]] = []
+    for r in cursor.fetchall():
+        if r["destination"] in first:
+            second.append((r["order_id"], r["destination"]))
+        else:
+            first[r["destination"]] = r["order_id"]
+    vehicles = sorted(first)
+    return vehicles, [(first[v], v) for v in vehicles], second
+
+
+def legacy_phases(conn, chunk: int):
+    cursor = conn.cursor()
+
+    def assign(pairs):
+        for part in chunks(pairs, chunk):
+            cursor.execute(
+                "UPDATE o SET o.vehicle_id = r.vehicle_id, o.order_status = N'装货中' "
+                f"FROM Orders o JOIN (VALUES {', '.join(['(%s, %s)'] * len(part))}) AS r(order_id, vehicle_id) "
+                "ON o.order_id = r.order_id WHERE o.order_status = N'待处理' AND o.is_deleted = 0",
+                tuple(p for pair in part for p in pair),
+            )
+
+    def vehicles_to(ids, to_status):
+        for part in chunks(ids, chunk):
+            cursor.execute(
+                f"UPDATE Vehicles SET vehicle_status = %s WHERE is_deleted = 0 AND vehicle_id IN ({', '.join(['%s'] * len(part))})",
+                (to_status, *part),
+            )
+
+    def cancel(ids):
+        for part in chunks(ids, chunk):
+            cursor.execute(
+                f"UPDATE Orders SET order_status = N'已取消', is_deleted = 1 WHERE order_id IN ({', '.join(['%s'] * len(part))})",
+                tuple(part),
+            )
+
+    return assign, vehicles_to, cancel
+
+
+def engine_phases(conn, chunk: int):
+    def assign(pairs):
+        for part in chunks(pairs, chunk):
+            load_orders(conn, part)
+
+    def vehicles_to(ids, to_status):
+        for part in chunks(ids, chunk):
+            set_vehicle_status(conn, part, to_status)
+
+    def cancel(ids):
+        for part in chunks(ids, chunk):
+            cancel_orders(conn, part)
+
+    return assign, vehicles_to, cancel
+
+
+def run_mode(mode: str, rows: int, chunk: int) -> tuple[dict[str, float], list]:
+    conn = connect_db()
+    cursor = conn.cursor()
+    try:
+        if mode == "legacy":
+            for sql in LEGACY_TRIGGERS:
+                cursor.execute(sql)
+            assign, vehicles_to, cancel = legacy_phases(conn, chunk)
+        else:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {', '.join(LEGACY_NAMES)}")
+            assign, vehicles_to, cancel = engine_phases(conn, chunk)
+
+        vehicles, first, second = setup(conn, rows)
+        timings: dict[str, float] = {}
+        for name, fn in (
+            ("分配", lambda: assign(first)),
+            ("发车", lambda: vehicles_to(vehicles, "运输中")),
+            ("送达", lambda: vehicles_to(vehicles, "空闲")),
+            ("再分配", lambda: assign(second)),
+            ("取消", lambda: cancel([order_id for order_id, _ in second])),
+        ):
+            start = time.perf_counter()
+            fn()
+            timings[name] = time.perf_counter() - start
+
+        cursor.execute(
+            "SELECT N'order:' + order_status AS k, COUNT(*) AS n FROM Orders WHERE origin = %s GROUP BY order_status "
+            "UNION ALL SELECT N'vehicle:' + vehicle_status, COUNT(*) FROM Vehicles WHERE vehicle_id LIKE %s GROUP BY vehicle_status "
+            "UNION ALL SELECT N'completed', COUNT(*) FROM CompletedOrder c JOIN Orders o ON o.order_id = c.order_id WHERE o.origin = %s",
+            (TAG, VEHICLE_PREFIX + "%", TAG),
+        )
+        state = sorted((r["k"], r["n"]) for r in cursor.fetchall())
+        return timings, state
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000, help="车辆数，运单数为其两倍")
+    parser.add_argument("--chunk", type=int, default=1000, help="每条语句涉及的行数")
+    parser.add_argument("--modes", nargs="*", choices=["legacy", "engine"], default=["legacy", "engine"])
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.modes:
+        timings, state = run_mode(mode, args.rows, args.chunk)
+        results[mode] = state
+        total = sum(timings.values())
+        print(f"{mode:>6}: " + "  ".join(f"{k}={v:.2f}s" for k, v in timings.items()) + f"  合计={total:.2f}s")
+        print(f"        状态: {dict(state)}")
+    if len(results) == 2:
+        print("两种模式结束状态" + ("一致" if results["legacy"] == results["engine"] else "不一致！"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""车辆利用率基准：对每个车队按不同统计天数执行利用率查询（需要可连接的 SQL Server）。
+
+对最近 --days 中列出的每个天数、每个车队执行 --repeat 次 VehicleStatusHistory 区间聚合，输出单次耗时的中位数 / P95
+与参与统计的车辆数。绕过进程内缓存，直接测量数据库查询。只读，不修改数据。
+
+用法（环境变量同后端：SQL_SERVER / SQL_USER / SQL_PASSWORD / SQL_DATABASE）：
+
+    python bench/bench_utilization.py --days 1 7 30 365 --repeat 5
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.db import connect_db  # noqa: E402
+from app.utilization import _query  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, nargs="+", default=[1, 7, 30, 365])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT fleet_id FROM Fleets WHERE is_deleted = 0 ORDER BY fleet_id")
+        fleets = [r["fleet_id"] for r in cursor.fetchall()]
+        end = datetime.now().replace(microsecond=0)
+        for days in args.days:
+            start = datetime.combine(date.today() - timedelta(days=days - 1), datetime.min.time())
+            samples: list[float] = []
+            vehicles = 0
+            for fleet_id in fleets:
+                for _ in range(args.repeat):
+                    t = time.perf_counter()
+                    rows = _query(conn, fleet_id, start, end)
+                    samples.append(time.perf_counter() - t)
+                vehicles += len(rows)
+            samples.sort()
+            p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+            print(
+                f"{days:4d} 天  车队: {len(fleets)}  车辆: {vehicles}  "
+                f"中位数: {statistics.median(samples) * 1000:.2f}ms  P95: {p95 * 1000:.2f}ms"
+            )
+        conn.rollback()
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
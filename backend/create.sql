@@ -111,4 +111,45 @@ CREATE TABLE CompletedOrder (
     person_id INT NOT NULL,
     completed_at DATE NOT NULL,
     CONSTRAINT FK_CompletedOrder_Orders FOREIGN KEY (order_id) REFERENCES Orders(order_id)
-);
\ No newline at end of file
+);
+
+-- 车辆载重台账：每辆车当前在途（装货中/运输中）运单的总重量与总体积。
+-- 由 trg_MaintainVehicleLoad 随 Orders 的增删改增量维护，View_VehicleResourceStatus 直接读取，不再聚合历史运单。
+-- 部署或怀疑不一致时执行 EXEC CheckVehicleLoadLedger @Rebuild = 1 按 Orders 重算。
+CREATE TABLE VehicleLoad (
+    vehicle_id NVARCHAR(10) PRIMARY KEY,
+    used_weight DECIMAL(12,2) DEFAULT 0 NOT NULL,
+    used_volume DECIMAL(12,2) DEFAULT 0 NOT NULL,
+    CONSTRAINT FK_VehicleLoad_Vehicles FOREIGN KEY (vehicle_id) REFERENCES Vehicles(vehicle_id)
+);
+
+-- 车队月度汇总：每个车队每月完成的运单数、异常数与罚款合计（按车辆当前所属车队归属，与原报表一致）。
+-- 由 CompletedOrder / Incidents / Vehicles 上的触发器按语句增量维护，GetFleetMonthlyPerformance 按主键直接读取，
+-- 报表耗时不再随历史数据增长。部署或怀疑不一致时执行 EXEC CheckFleetMonthlyStats @Rebuild = 1 按明细重算。
+CREATE TABLE FleetMonthlyStats (
+    fleet_id INT NOT NULL,
+    month_start DATE NOT NULL,
+    total_orders INT DEFAULT 0 NOT NULL,
+    total_incidents INT DEFAULT 0 NOT NULL,
+    total_fines DECIMAL(12,2) DEFAULT 0 NOT NULL,
+    CONSTRAINT PK_FleetMonthlyStats PRIMARY KEY (fleet_id, month_start),
+    CONSTRAINT FK_FleetMonthlyStats_Fleets FOREIGN KEY (fleet_id) REFERENCES Fleets(fleet_id)
+);
+
+-- 车辆状态流转记录：只追加，每段状态一行 [entered_at, exited_at)，当前所处的一段 exited_at 为 NULL。
+-- 状态按 Vehicles 的 CHECK 顺序编码为 TINYINT（0 空闲、1 装货中、2 运输中、3 维修中、4 异常），时间精确到秒，
+-- 按 (vehicle_id, entered_at) 聚集，查询某段时间只需按车辆定位到该时间范围。由 trg_Vehicles_StatusHistory 维护。
+-- 在已有数据上启用（或导入车辆时触发器被禁用）后执行 EXEC BackfillVehicleStatusHistory 为现有车辆补上当前状态。
+CREATE TABLE VehicleStatusHistory (
+    history_id INT IDENTITY(1,1) NOT NULL,
+    vehicle_id NVARCHAR(10) NOT NULL,
+    status_code TINYINT NOT NULL CHECK (status_code BETWEEN 0 AND 4),
+    entered_at DATETIME2(0) NOT NULL,
+    exited_at DATETIME2(0) NULL,
+    CONSTRAINT PK_VehicleStatusHistory PRIMARY KEY CLUSTERED (vehicle_id, entered_at, history_id),
+    CONSTRAINT FK_VehicleStatusHistory_Vehicles FOREIGN KEY (vehicle_id) REFERENCES Vehicles(vehicle_id)
+);
+
+-- 每辆车最多一段未结束的状态；状态变化时按它找到要结束的一段
+CREATE UNIQUE INDEX UX_VehicleStatusHistory_Open ON VehicleStatusHistory (vehicle_id) WHERE exited_at IS NULL;
+
@@ -49,4 +49,35 @@ CREATE INDEX IX_Vehicles_Status_ID ON Vehicles (vehicle_status, vehicle_id);
 CREATE INDEX IX_Orders_Status ON Orders (order_status);
 
 -- 3. 为异常记录的时间和车辆 ID 建立索引
-CREATE INDEX IX_Incidents_Time_Vehicle ON Incidents (occurrence_time, vehicle_id);*/
\ No newline at end of file
+CREATE INDEX IX_Incidents_Time_Vehicle ON Incidents (occurrence_time, vehicle_id);*/
+
+-- 游标分页（keyset）所用的排序键索引：按 WHERE 过滤列 + 排序列建立，
+-- 使 "WHERE ... AND key > @cursor ORDER BY key" 可以直接 Index Seek，页深不影响耗时
+CREATE INDEX IX_Orders_Status_OrderID ON Orders (order_status, order_id);
+GO
+
+CREATE INDEX IX_CompletedOrder_Person_Completed ON CompletedOrder (person_id, completed_at DESC, order_id DESC);
+GO
+
+CREATE INDEX IX_Incidents_Driver_ID ON Incidents (driver_id, incident_id) WHERE is_deleted = 0;
+GO
+
+CREATE INDEX IX_Drivers_Fleet_Person ON Drivers (fleet_id, person_id) WHERE is_deleted = 0;
+GO
+
+-- 司机绩效汇总按 (driver_id, occurrence_time) 范围聚合，INCLUDE 聚合列避免回表；
+-- 运单一侧使用上面的 IX_CompletedOrder_Person_Completed
+CREATE INDEX IX_Incidents_Driver_Time ON Incidents (driver_id, occurrence_time) INCLUDE (incident_type, fine_amount) WHERE is_deleted = 0;
+GO
+
+-- 排行榜按周期日期范围对全部司机聚合：完成记录按 completed_at、异常按 occurrence_time 范围查找
+CREATE INDEX IX_CompletedOrder_Completed ON CompletedOrder (completed_at) INCLUDE (person_id);
+GO
+
+CREATE INDEX IX_Incidents_Time ON Incidents (occurrence_time) INCLUDE (driver_id, fine_amount) WHERE is_deleted = 0;
+GO
+
+-- 车队周告警：按车队找到车辆后逐车按 (vehicle_id, occurrence_time) 范围查找，INCLUDE 告警展示的列避免回表
+CREATE INDEX IX_Incidents_Vehicle_Time ON Incidents (vehicle_id, occurrence_time)
+INCLUDE (incident_type, incident_description, fine_amount, handle_status) WHERE is_deleted = 0;
+GO
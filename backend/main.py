@@ -1,13 +1,28 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 
-from app.auth_core import auth_middleware
-from app.routers import auth, centers, drivers, fleets, incidents, orders, vehicles, managers
+from app.auth_core import AuthMiddleware
+from app.db import QueryCountMiddleware, close_db
+from app.incident_queue import incident_queue
+from app.routers import auth, centers, drivers, fleets, incidents, orders, vehicles, managers, system
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    incident_queue.start()
+    yield
+    # 先写完队列中剩余的异常事件再关闭连接池
+    await incident_queue.stop()
+    close_db()
+
 
-app = FastAPI(swagger_ui_parameters={"persistAuthorization": True})
+app = FastAPI(swagger_ui_parameters={"persistAuthorization": True}, lifespan=lifespan)
 
-app.middleware("http")(auth_middleware)
+app.add_middleware(QueryCountMiddleware)
+app.add_middleware(AuthMiddleware, routes=app.router.routes)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,6 +33,7 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-DB-Queries"],
 )
 
 app.include_router(auth.router)
@@ -28,6 +44,7 @@ app.include_router(incidents.router)
 app.include_router(fleets.router)
 app.include_router(centers.router)
 app.include_router(managers.router)
+app.include_router(system.router)
 
 
 def custom_openapi():
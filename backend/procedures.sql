@@ -1,6 +1,7 @@
 USE FleetSync;
 GO
 
+-- 车队月度绩效：直接按主键读取 FleetMonthlyStats（由触发器增量维护），不再按 YEAR()/MONTH() 扫描全部历史。
 CREATE PROCEDURE GetFleetMonthlyPerformance
     @FleetID INT,
     @Year INT,
@@ -9,34 +10,187 @@ AS
 BEGIN
     SET NOCOUNT ON;
 
-    DECLARE @TotalOrders INT = 0;
-    DECLARE @TotalIncidents INT = 0;
-    DECLARE @TotalFines DECIMAL(10, 2) = 0.00;
-
-    -- 1. 从 CompletedOrder 统计该车队在该月内已完成的运单总数
-    SELECT @TotalOrders = COUNT(co.order_id)
-    FROM CompletedOrder co
-    JOIN Orders o ON co.order_id = o.order_id
-    JOIN Vehicles v ON o.vehicle_id = v.vehicle_id
-    WHERE v.fleet_id = @FleetID 
-      AND YEAR(co.completed_at) = @Year 
-      AND MONTH(co.completed_at) = @Month;
-
-    -- 2. 统计该车队在该月内发生的异常，排除掉已取消的异常
-    SELECT 
-        @TotalIncidents = COUNT(i.incident_id),
-        @TotalFines = ISNULL(SUM(i.fine_amount), 0.00)
-    FROM Incidents i
-    JOIN Vehicles v ON i.vehicle_id = v.vehicle_id
-    WHERE v.fleet_id = @FleetID 
-      AND YEAR(i.occurrence_time) = @Year 
-      AND MONTH(i.occurrence_time) = @Month
-      AND i.is_deleted = 0;
-
-    -- 3. 返回结果集
-    SELECT 
-        @TotalOrders AS Total_Orders,
-        @TotalIncidents AS Total_Incidents,
-        @TotalFines AS Total_Fine_Amount;
+    SELECT
+        ISNULL(s.total_orders, 0) AS Total_Orders,
+        ISNULL(s.total_incidents, 0) AS Total_Incidents,
+        ISNULL(s.total_fines, 0.00) AS Total_Fine_Amount
+    FROM (SELECT 1 AS x) one
+    LEFT JOIN FleetMonthlyStats s
+        ON s.fleet_id = @FleetID AND s.month_start = DATEFROMPARTS(@Year, @Month, 1);
 END;
-GO
\ No newline at end of file
+GO
+
+-- 校验 VehicleLoad 台账：按 Orders 重新计算每辆车的在途重量/体积，返回与台账不一致的车辆。
+-- @Rebuild = 1 时同时用重算结果覆盖台账（首次部署时用它初始化）。
+-- 台账只随 Orders 变化，校验期间对 Orders 持共享锁，避免把并发中的状态变更误报为不一致。
+CREATE PROCEDURE CheckVehicleLoadLedger
+    @Rebuild BIT = 0
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    CREATE TABLE #Expected (
+        vehicle_id NVARCHAR(10) PRIMARY KEY,
+        used_weight DECIMAL(12,2) NOT NULL,
+        used_volume DECIMAL(12,2) NOT NULL
+    );
+    CREATE TABLE #Mismatch (
+        vehicle_id NVARCHAR(10) PRIMARY KEY,
+        ledger_weight DECIMAL(12,2) NULL,
+        ledger_volume DECIMAL(12,2) NULL,
+        expected_weight DECIMAL(12,2) NOT NULL,
+        expected_volume DECIMAL(12,2) NOT NULL
+    );
+
+    BEGIN TRANSACTION;
+
+    INSERT INTO #Expected (vehicle_id, used_weight, used_volume)
+    SELECT o.vehicle_id, SUM(o.weight), SUM(o.volume)
+    FROM Orders o WITH (TABLOCK, HOLDLOCK)
+    WHERE o.vehicle_id IS NOT NULL AND o.order_status IN (N'装货中', N'运输中')
+    GROUP BY o.vehicle_id;
+
+    INSERT INTO #Mismatch (vehicle_id, ledger_weight, ledger_volume, expected_weight, expected_volume)
+    SELECT
+        COALESCE(l.vehicle_id, e.vehicle_id),
+        l.used_weight,
+        l.used_volume,
+        ISNULL(e.used_weight, 0),
+        ISNULL(e.used_volume, 0)
+    FROM VehicleLoad l WITH (UPDLOCK, HOLDLOCK)
+    FULL OUTER JOIN #Expected e ON l.vehicle_id = e.vehicle_id
+    WHERE ISNULL(l.used_weight, 0) <> ISNULL(e.used_weight, 0)
+       OR ISNULL(l.used_volume, 0) <> ISNULL(e.used_volume, 0);
+
+    IF @Rebuild = 1
+    BEGIN
+        MERGE VehicleLoad AS t
+        USING (
+            SELECT vehicle_id, expected_weight, expected_volume FROM #Mismatch
+        ) AS s
+        ON t.vehicle_id = s.vehicle_id
+        WHEN MATCHED THEN
+            UPDATE SET used_weight = s.expected_weight, used_volume = s.expected_volume
+        WHEN NOT MATCHED THEN
+            INSERT (vehicle_id, used_weight, used_volume)
+            VALUES (s.vehicle_id, s.expected_weight, s.expected_volume);
+    END
+
+    COMMIT TRANSACTION;
+
+    SELECT vehicle_id, ledger_weight, ledger_volume, expected_weight, expected_volume
+    FROM #Mismatch
+    ORDER BY vehicle_id;
+END;
+GO
+
+-- 校验 FleetMonthlyStats：按 CompletedOrder / Incidents 明细重算每个车队每月的汇总，返回不一致的行。
+-- @Rebuild = 1 时同时用重算结果覆盖汇总表（首次部署或导入历史数据后用它回填）。
+-- 校验期间对明细表持共享锁，避免把并发写入误报为不一致。
+CREATE PROCEDURE CheckFleetMonthlyStats
+    @Rebuild BIT = 0
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    CREATE TABLE #Expected (
+        fleet_id INT NOT NULL,
+        month_start DATE NOT NULL,
+        total_orders INT NOT NULL,
+        total_incidents INT NOT NULL,
+        total_fines DECIMAL(12,2) NOT NULL,
+        PRIMARY KEY (fleet_id, month_start)
+    );
+    CREATE TABLE #Mismatch (
+        fleet_id INT NOT NULL,
+        month_start DATE NOT NULL,
+        stats_orders INT NULL,
+        stats_incidents INT NULL,
+        stats_fines DECIMAL(12,2) NULL,
+        expected_orders INT NOT NULL,
+        expected_incidents INT NOT NULL,
+        expected_fines DECIMAL(12,2) NOT NULL,
+        PRIMARY KEY (fleet_id, month_start)
+    );
+
+    BEGIN TRANSACTION;
+
+    INSERT INTO #Expected (fleet_id, month_start, total_orders, total_incidents, total_fines)
+    SELECT x.fleet_id, x.month_start, SUM(x.orders), SUM(x.incidents), SUM(x.fines)
+    FROM (
+        SELECT v.fleet_id, DATEFROMPARTS(YEAR(co.completed_at), MONTH(co.completed_at), 1) AS month_start,
+               1 AS orders, 0 AS incidents, CAST(0 AS DECIMAL(12,2)) AS fines
+        FROM CompletedOrder co WITH (TABLOCK, HOLDLOCK)
+        JOIN Orders o ON co.order_id = o.order_id
+        JOIN Vehicles v WITH (HOLDLOCK) ON o.vehicle_id = v.vehicle_id
+        UNION ALL
+        SELECT v.fleet_id, DATEFROMPARTS(YEAR(i.occurrence_time), MONTH(i.occurrence_time), 1), 0, 1, i.fine_amount
+        FROM Incidents i WITH (TABLOCK, HOLDLOCK)
+        JOIN Vehicles v WITH (HOLDLOCK) ON i.vehicle_id = v.vehicle_id
+        WHERE i.is_deleted = 0
+    ) x
+    GROUP BY x.fleet_id, x.month_start;
+
+    INSERT INTO #Mismatch (fleet_id, month_start, stats_orders, stats_incidents, stats_fines,
+                           expected_orders, expected_incidents, expected_fines)
+    SELECT
+        COALESCE(s.fleet_id, e.fleet_id),
+        COALESCE(s.month_start, e.month_start),
+        s.total_orders,
+        s.total_incidents,
+        s.total_fines,
+        ISNULL(e.total_orders, 0),
+        ISNULL(e.total_incidents, 0),
+        ISNULL(e.total_fines, 0)
+    FROM FleetMonthlyStats s WITH (UPDLOCK, HOLDLOCK)
+    FULL OUTER JOIN #Expected e ON s.fleet_id = e.fleet_id AND s.month_start = e.month_start
+    WHERE ISNULL(s.total_orders, 0) <> ISNULL(e.total_orders, 0)
+       OR ISNULL(s.total_incidents, 0) <> ISNULL(e.total_incidents, 0)
+       OR ISNULL(s.total_fines, 0) <> ISNULL(e.total_fines, 0);
+
+    IF @Rebuild = 1
+    BEGIN
+        MERGE FleetMonthlyStats AS t
+        USING (
+            SELECT fleet_id, month_start, expected_orders, expected_incidents, expected_fines FROM #Mismatch
+        ) AS s
+        ON t.fleet_id = s.fleet_id AND t.month_start = s.month_start
+        WHEN MATCHED THEN
+            UPDATE SET
+                total_orders = s.expected_orders,
+                total_incidents = s.expected_incidents,
+                total_fines = s.expected_fines
+        WHEN NOT MATCHED THEN
+            INSERT (fleet_id, month_start, total_orders, total_incidents, total_fines)
+            VALUES (s.fleet_id, s.month_start, s.expected_orders, s.expected_incidents, s.expected_fines);
+    END
+
+    COMMIT TRANSACTION;
+
+    SELECT fleet_id, month_start, stats_orders, stats_incidents, stats_fines,
+           expected_orders, expected_incidents, expected_fines
+    FROM #Mismatch
+    ORDER BY fleet_id, month_start;
+END;
+GO
+
+-- 为没有未结束状态段的在用车辆补一段从当前时间开始的状态（之前的历史无从得知）。
+-- 在已有数据上启用 VehicleStatusHistory 时执行一次；可重复执行，已有状态段的车辆不受影响。
+CREATE PROCEDURE BackfillVehicleStatusHistory
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    INSERT INTO VehicleStatusHistory (vehicle_id, status_code, entered_at)
+    SELECT v.vehicle_id,
+           CASE v.vehicle_status WHEN N'空闲' THEN 0 WHEN N'装货中' THEN 1 WHEN N'运输中' THEN 2 WHEN N'维修中' THEN 3 ELSE 4 END,
+           SYSDATETIME()
+    FROM Vehicles v WITH (UPDLOCK, HOLDLOCK)
+    WHERE v.is_deleted = 0
+      AND NOT EXISTS (SELECT 1 FROM VehicleStatusHistory h WHERE h.vehicle_id = v.vehicle_id AND h.exited_at IS NULL);
+
+    SELECT @@ROWCOUNT AS backfilled;
+END;
+GO
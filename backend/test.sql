@@ -8,6 +8,9 @@ DELETE FROM CompletedOrder;
 DELETE FROM Incidents;
 DELETE FROM Assignments;
 DELETE FROM Orders;
+DELETE FROM VehicleLoad;
+DELETE FROM FleetMonthlyStats;
+DELETE FROM VehicleStatusHistory;
 DELETE FROM Drivers;
 DELETE FROM Vehicles;
 DELETE FROM Fleets;
@@ -89,9 +92,41 @@ BEGIN
 END
 GO
 
+-----------------------------------------------------------
+-- 4.1 最近 30 天的车辆状态流转记录（每天 空闲 → 装货中 → 运输中 → 空闲，约一成为维修），今天起为车辆当前状态
+-----------------------------------------------------------
+PRINT '正在生成车辆状态流转记录...';
+WITH days AS (
+    SELECT TOP 30 ROW_NUMBER() OVER (ORDER BY (SELECT NULL)) AS n FROM sys.all_objects
+),
+plan_day AS (
+    SELECT v.vehicle_id,
+           DATEADD(DAY, -d.n, CAST(CAST(GETDATE() AS DATE) AS DATETIME2(0))) AS day_start,
+           ABS(CHECKSUM(v.vehicle_id, d.n)) % 120 AS shift,
+           CASE WHEN ABS(CHECKSUM(d.n, v.vehicle_id)) % 10 = 0 THEN 3 ELSE 2 END AS work_code
+    FROM Vehicles v CROSS JOIN days d
+)
+INSERT INTO VehicleStatusHistory (vehicle_id, status_code, entered_at, exited_at)
+SELECT p.vehicle_id,
+       CASE WHEN s.code = 2 THEN p.work_code ELSE s.code END,
+       DATEADD(MINUTE, CASE WHEN s.m_from = 0 THEN 0 ELSE s.m_from + p.shift END, p.day_start),
+       DATEADD(MINUTE, CASE WHEN s.m_to = 1440 THEN 1440 ELSE s.m_to + p.shift END, p.day_start)
+FROM plan_day p
+CROSS JOIN (VALUES (0, 0, 480), (1, 480, 540), (2, 540, 1020), (0, 1020, 1440)) s (code, m_from, m_to);
+
+INSERT INTO VehicleStatusHistory (vehicle_id, status_code, entered_at)
+SELECT vehicle_id,
+       CASE vehicle_status WHEN N'空闲' THEN 0 WHEN N'装货中' THEN 1 WHEN N'运输中' THEN 2 WHEN N'维修中' THEN 3 ELSE 4 END,
+       CAST(CAST(GETDATE() AS DATE) AS DATETIME2(0))
+FROM Vehicles;
+GO
+
 -----------------------------------------------------------
 -- 5. 恢复触发器并打印完成
 -----------------------------------------------------------
 EXEC sp_msforeachtable 'ALTER TABLE ? ENABLE TRIGGER ALL';
+-- 导入期间触发器被禁用，按明细回填载重台账与车队月度汇总
+EXEC CheckVehicleLoadLedger @Rebuild = 1;
+EXEC CheckFleetMonthlyStats @Rebuild = 1;
 PRINT '数据填充成功，触发器已重新开启。';
 GO
\ No newline at end of file
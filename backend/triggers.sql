@@ -1,30 +1,9 @@
 USE FleetSync;
 GO
 
-CREATE TRIGGER trg_UpdateVehicleToLoading
-ON Orders
-AFTER UPDATE
-AS
-BEGIN
-    SET NOCOUNT ON;
-    IF TRIGGER_NESTLEVEL() > 1 RETURN; -- 防递归
-    -- 检查是否更新了 order_status 字段
-    IF UPDATE(order_status)
-    BEGIN
-
-        UPDATE v
-        SET v.vehicle_status = N'装货中'
-        FROM Vehicles v
-        INNER JOIN inserted i ON v.vehicle_id = i.vehicle_id
-        INNER JOIN deleted d ON i.order_id = d.order_id
-        WHERE d.order_status = N'待处理'     
-          AND i.order_status = N'装货中'     
-          AND v.vehicle_status = N'空闲'    
-          AND v.is_deleted = 0;            
-
-
-    END
-END;
+-- 运单/车辆状态联动（分配→装货中、发车→运输中、送达→已完成、取消→车辆空闲）已改由后端
+-- app/transitions.py 按批、每张表一条语句显式执行，不再使用级联触发器。升级已有数据库时先删除旧触发器：
+DROP TRIGGER IF EXISTS trg_UpdateVehicleToLoading, trg_SyncOrderToTransit, trg_CompleteOrderOnVehicleIdle, trg_SetVehicleIdleOnOrderCancel;
 GO
 
 CREATE TRIGGER trg_AuditDriverKeyInfo
@@ -78,142 +57,78 @@ BEGIN
 END;
 GO
 
-CREATE TRIGGER trg_CheckOverload
+-- 维护 VehicleLoad 台账：按 inserted/deleted 计算每辆车在途运单重量、体积的增量。
+-- 不做 TRIGGER_NESTLEVEL 判断：任何来源（包括其他触发器里嵌套）对运单的修改都要记账。
+CREATE TRIGGER trg_MaintainVehicleLoad
 ON Orders
-AFTER INSERT, UPDATE
+AFTER INSERT, UPDATE, DELETE
 AS
 BEGIN
     SET NOCOUNT ON;
 
-    -- 检查新插入或修改后的运单是否导致超载
-    -- 利用创建的View_VehicleResourceStatus视图来简化逻辑
-    IF EXISTS (
-        SELECT 1 
-        FROM View_VehicleResourceStatus rs
-        WHERE rs.remaining_weight < 0 OR rs.remaining_volume < 0
-    )
-    BEGIN
-        -- 拒绝操作并回滚 
-        RAISERROR ('超出最大载重或容积：该操作已被拒绝！', 16, 1);
-        ROLLBACK TRANSACTION;
-    END
+    MERGE VehicleLoad AS t
+    USING (
+        SELECT x.vehicle_id, SUM(x.weight) AS weight, SUM(x.volume) AS volume
+        FROM (
+            SELECT i.vehicle_id, i.weight, i.volume
+            FROM inserted i
+            WHERE i.vehicle_id IS NOT NULL AND i.order_status IN (N'装货中', N'运输中')
+            UNION ALL
+            SELECT d.vehicle_id, -d.weight, -d.volume
+            FROM deleted d
+            WHERE d.vehicle_id IS NOT NULL AND d.order_status IN (N'装货中', N'运输中')
+        ) x
+        GROUP BY x.vehicle_id
+        HAVING SUM(x.weight) <> 0 OR SUM(x.volume) <> 0
+    ) AS s
+    ON t.vehicle_id = s.vehicle_id
+    WHEN MATCHED THEN
+        UPDATE SET
+            used_weight = t.used_weight + s.weight,
+            used_volume = t.used_volume + s.volume
+    WHEN NOT MATCHED THEN
+        INSERT (vehicle_id, used_weight, used_volume)
+        VALUES (s.vehicle_id, s.weight, s.volume);
 END;
 GO
 
-CREATE TRIGGER trg_SyncOrderToTransit
-ON Vehicles
-AFTER UPDATE
-AS
-BEGIN
-    SET NOCOUNT ON;
-    IF TRIGGER_NESTLEVEL() > 1 RETURN; -- 防递归
-    -- 检查是否有实际的行被更新（排除虚拟更新）
-    IF NOT EXISTS (SELECT 1 FROM inserted) OR NOT EXISTS (SELECT 1 FROM deleted)
-        RETURN;
-
-    -- 1. 检查是否更新了 vehicle_status 字段
-    IF UPDATE(vehicle_status)
-    BEGIN
-   
-        UPDATE o
-        SET o.order_status = N'运输中'
-        FROM Orders o
-        INNER JOIN inserted i ON o.vehicle_id = i.vehicle_id
-        INNER JOIN deleted d ON i.vehicle_id = d.vehicle_id
-        WHERE i.vehicle_status = N'运输中'     -- 更新后的车辆状态
-          AND d.vehicle_status = N'装货中'     -- 更新前的车辆状态（确保是从装货完成到出发）
-          AND o.order_status = N'装货中'       -- 仅针对正在装货的订单
-          AND o.is_deleted = 0;
-    END
-END;
+-- 台账必须先于超载检查更新
+EXEC sp_settriggerorder @triggername = 'trg_MaintainVehicleLoad', @order = 'First', @stmttype = 'INSERT';
+EXEC sp_settriggerorder @triggername = 'trg_MaintainVehicleLoad', @order = 'First', @stmttype = 'UPDATE';
 GO
 
--- 当车辆状态从“运输中”变为“空闲”时，自动将该车辆下所有“运输中”的订单更新为“已完成”，同时
-CREATE or ALTER TRIGGER trg_CompleteOrderOnVehicleIdle
-ON Vehicles
-AFTER UPDATE
-AS BEGIN
-    SET NOCOUNT ON;
-    IF TRIGGER_NESTLEVEL() > 1 RETURN;
-
-
-    IF UPDATE(vehicle_status)
-    BEGIN
-        -- 定义表变量，用于暂存本次真正被更新的订单
-        DECLARE @JustFinishedOrders TABLE (
-            order_id INT,
-            vehicle_id NVARCHAR(50) 
-        );
-
-       
-        UPDATE o
-        SET o.order_status = N'已完成'
-        OUTPUT inserted.order_id, inserted.vehicle_id INTO @JustFinishedOrders(order_id, vehicle_id)
-        FROM Orders o
-        INNER JOIN inserted i ON o.vehicle_id = i.vehicle_id
-        INNER JOIN deleted d ON i.vehicle_id = d.vehicle_id
-        WHERE i.vehicle_status = N'空闲'        -- 更新后的车辆状态
-          AND d.vehicle_status = N'运输中'      -- 更新前的车辆状态
-          AND o.order_status = N'运输中';       -- 仅针对正在运输的订单
-
-
-        INSERT INTO CompletedOrder (order_id, person_id, completed_at)
-        SELECT fo.order_id, a.person_id, CAST(GETDATE() AS DATE)
-        FROM @JustFinishedOrders fo
-        INNER JOIN Assignments a ON fo.vehicle_id = a.vehicle_id;
-    END
-END;
-GO
--- 当某个订单取消的时候，检查该订单对应的车辆是否还有其他未完成的订单，如果没有，则将车辆状态改为“空闲”
-CREATE TRIGGER trg_SetVehicleIdleOnOrderCancel
+CREATE TRIGGER trg_CheckOverload
 ON Orders
-AFTER UPDATE
+AFTER INSERT, UPDATE
 AS
 BEGIN
     SET NOCOUNT ON;
-    IF TRIGGER_NESTLEVEL() > 1 RETURN; -- 防递归
-    -- 检查是否更新了 order_status 字段
-    IF UPDATE(order_status)
-    BEGIN
-        -- 对于每个被取消订单的车辆，检查是否还有其他未完成订单
-        DECLARE @VehicleID NVARCHAR(10);
-
-        DECLARE CancelledOrdersCursor CURSOR FOR
-        SELECT i.vehicle_id
-        FROM inserted i
-        INNER JOIN deleted d ON i.order_id = d.order_id
-        WHERE d.order_status <> N'已取消' AND i.order_status = N'已取消';
 
-        OPEN CancelledOrdersCursor;
-        FETCH NEXT FROM CancelledOrdersCursor INTO @VehicleID;
-
-        WHILE @@FETCH_STATUS = 0
-        BEGIN
-            -- 检查该车辆是否还有其他未完成订单
-            IF NOT EXISTS (
-                SELECT 1
-                FROM Orders o
-                WHERE o.vehicle_id = @VehicleID
-                  AND o.order_status NOT IN (N'已完成', N'已取消')
-                  AND o.is_deleted = 0
-            )
-            BEGIN
-                -- 将车辆状态更新为“空闲”
-                UPDATE Vehicles
-                SET vehicle_status = N'空闲'
-                WHERE vehicle_id = @VehicleID
-                  AND is_deleted = 0;
-            END
-
-            FETCH NEXT FROM CancelledOrdersCursor INTO @VehicleID;
-        END
+    -- 只有影响载重的列被更新时才需要检查（如只改起止地址则直接跳过）
+    IF NOT (UPDATE(vehicle_id) OR UPDATE(order_status) OR UPDATE(weight) OR UPDATE(volume))
+        RETURN;
 
-        CLOSE CancelledOrdersCursor;
-        DEALLOCATE CancelledOrdersCursor;
+    -- 只检查本语句中处于在途状态的运单所在车辆（取消、完成只会减轻负载，不在此列），
+    -- 按主键查 VehicleLoad 台账（由 trg_MaintainVehicleLoad 先行更新）
+    IF EXISTS (
+        SELECT 1
+        FROM (
+            SELECT DISTINCT i.vehicle_id
+            FROM inserted i
+            WHERE i.vehicle_id IS NOT NULL AND i.order_status IN (N'装货中', N'运输中')
+        ) t
+        JOIN Vehicles v ON v.vehicle_id = t.vehicle_id AND v.is_deleted = 0
+        JOIN VehicleLoad l ON l.vehicle_id = t.vehicle_id
+        WHERE l.used_weight > v.max_weight OR l.used_volume > v.max_volume
+    )
+    BEGIN
+        -- 拒绝操作并回滚 
+        RAISERROR ('超出最大载重或容积：该操作已被拒绝！', 16, 1);
+        ROLLBACK TRANSACTION;
     END
 END;
-
 GO
+
 CREATE TRIGGER trg_IncidentHandle_SyncVehicleStatus
 ON Incidents
 AFTER UPDATE
@@ -251,6 +166,11 @@ END;
 GO
 
 
+-- Incidents 上两个 AFTER UPDATE 触发器都会恢复车辆状态，先执行的生效（后者只处理仍为“异常”的车辆）。
+-- 固定按异常类型恢复的 trg_IncidentHandle_SyncVehicleStatus 先执行，批量处理时结果与逐条处理一致。
+EXEC sp_settriggerorder @triggername = 'trg_IncidentHandle_SyncVehicleStatus', @order = 'First', @stmttype = 'UPDATE';
+GO
+
 CREATE TRIGGER trg_IncidentInsert_SetVehicleToException
 ON Incidents
 AFTER INSERT
@@ -268,4 +188,166 @@ BEGIN
     WHERE v.is_deleted = 0;
 END;
 GO
-    
\ No newline at end of file
+    
+
+
+-- 维护 FleetMonthlyStats：按 inserted/deleted 计算每个车队、每个月完成运单数的增量。
+-- 与 trg_MaintainVehicleLoad 一样不判断 TRIGGER_NESTLEVEL，任何来源写入的完成记录都要计入。
+CREATE TRIGGER trg_CompletedOrder_FleetMonthlyStats
+ON CompletedOrder
+AFTER INSERT, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    MERGE FleetMonthlyStats WITH (HOLDLOCK) AS t
+    USING (
+        SELECT v.fleet_id, x.month_start, SUM(x.n) AS orders
+        FROM (
+            SELECT i.order_id, DATEFROMPARTS(YEAR(i.completed_at), MONTH(i.completed_at), 1) AS month_start, 1 AS n
+            FROM inserted i
+            UNION ALL
+            SELECT d.order_id, DATEFROMPARTS(YEAR(d.completed_at), MONTH(d.completed_at), 1), -1
+            FROM deleted d
+        ) x
+        JOIN Orders o ON o.order_id = x.order_id
+        JOIN Vehicles v ON v.vehicle_id = o.vehicle_id
+        GROUP BY v.fleet_id, x.month_start
+        HAVING SUM(x.n) <> 0
+    ) AS s
+    ON t.fleet_id = s.fleet_id AND t.month_start = s.month_start
+    WHEN MATCHED THEN
+        UPDATE SET total_orders = t.total_orders + s.orders
+    WHEN NOT MATCHED THEN
+        INSERT (fleet_id, month_start, total_orders)
+        VALUES (s.fleet_id, s.month_start, s.orders);
+END;
+GO
+
+-- 维护 FleetMonthlyStats 的异常数与罚款：只统计未删除的异常，
+-- 新增、逻辑删除、修改罚款 / 日期 / 车辆都表现为 deleted 中旧行减去、inserted 中新行加上。
+CREATE TRIGGER trg_Incidents_FleetMonthlyStats
+ON Incidents
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    -- 只改处理状态（最常见的更新）不影响汇总
+    IF EXISTS (SELECT 1 FROM deleted) AND EXISTS (SELECT 1 FROM inserted)
+       AND NOT (UPDATE(is_deleted) OR UPDATE(fine_amount) OR UPDATE(occurrence_time) OR UPDATE(vehicle_id))
+        RETURN;
+
+    MERGE FleetMonthlyStats WITH (HOLDLOCK) AS t
+    USING (
+        SELECT v.fleet_id, x.month_start, SUM(x.n) AS incidents, SUM(x.fine) AS fines
+        FROM (
+            SELECT i.vehicle_id, DATEFROMPARTS(YEAR(i.occurrence_time), MONTH(i.occurrence_time), 1) AS month_start,
+                   1 AS n, i.fine_amount AS fine
+            FROM inserted i
+            WHERE i.is_deleted = 0
+            UNION ALL
+            SELECT d.vehicle_id, DATEFROMPARTS(YEAR(d.occurrence_time), MONTH(d.occurrence_time), 1), -1, -d.fine_amount
+            FROM deleted d
+            WHERE d.is_deleted = 0
+        ) x
+        JOIN Vehicles v ON v.vehicle_id = x.vehicle_id
+        GROUP BY v.fleet_id, x.month_start
+        HAVING SUM(x.n) <> 0 OR SUM(x.fine) <> 0
+    ) AS s
+    ON t.fleet_id = s.fleet_id AND t.month_start = s.month_start
+    WHEN MATCHED THEN
+        UPDATE SET
+            total_incidents = t.total_incidents + s.incidents,
+            total_fines = t.total_fines + s.fines
+    WHEN NOT MATCHED THEN
+        INSERT (fleet_id, month_start, total_incidents, total_fines)
+        VALUES (s.fleet_id, s.month_start, s.incidents, s.fines);
+END;
+GO
+
+-- 车辆换车队（如恢复已删除车辆到其他车队）时，把该车的历史运单与异常从原车队的月度汇总移到新车队，
+-- 与原报表“按车辆当前所属车队统计”保持一致。只扫描换队车辆自己的明细，换队很少发生。
+CREATE TRIGGER trg_Vehicles_MoveFleetMonthlyStats
+ON Vehicles
+AFTER UPDATE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF NOT UPDATE(fleet_id) RETURN;
+
+    DECLARE @moved TABLE (vehicle_id NVARCHAR(10) PRIMARY KEY, old_fleet_id INT NOT NULL, new_fleet_id INT NOT NULL);
+    INSERT INTO @moved (vehicle_id, old_fleet_id, new_fleet_id)
+    SELECT i.vehicle_id, d.fleet_id, i.fleet_id
+    FROM inserted i
+    JOIN deleted d ON d.vehicle_id = i.vehicle_id
+    WHERE i.fleet_id <> d.fleet_id;
+    IF NOT EXISTS (SELECT 1 FROM @moved) RETURN;
+
+    WITH contrib AS (
+        SELECT o.vehicle_id, DATEFROMPARTS(YEAR(co.completed_at), MONTH(co.completed_at), 1) AS month_start,
+               1 AS orders, 0 AS incidents, CAST(0 AS DECIMAL(12,2)) AS fines
+        FROM CompletedOrder co
+        JOIN Orders o ON o.order_id = co.order_id
+        JOIN @moved m ON m.vehicle_id = o.vehicle_id
+        UNION ALL
+        SELECT i.vehicle_id, DATEFROMPARTS(YEAR(i.occurrence_time), MONTH(i.occurrence_time), 1), 0, 1, i.fine_amount
+        FROM Incidents i
+        JOIN @moved m ON m.vehicle_id = i.vehicle_id
+        WHERE i.is_deleted = 0
+    )
+    MERGE FleetMonthlyStats WITH (HOLDLOCK) AS t
+    USING (
+        SELECT x.fleet_id, x.month_start, SUM(x.orders) AS orders, SUM(x.incidents) AS incidents, SUM(x.fines) AS fines
+        FROM (
+            SELECT m.new_fleet_id AS fleet_id, c.month_start, c.orders, c.incidents, c.fines
+            FROM contrib c JOIN @moved m ON m.vehicle_id = c.vehicle_id
+            UNION ALL
+            SELECT m.old_fleet_id, c.month_start, -c.orders, -c.incidents, -c.fines
+            FROM contrib c JOIN @moved m ON m.vehicle_id = c.vehicle_id
+        ) x
+        GROUP BY x.fleet_id, x.month_start
+        HAVING SUM(x.orders) <> 0 OR SUM(x.incidents) <> 0 OR SUM(x.fines) <> 0
+    ) AS s
+    ON t.fleet_id = s.fleet_id AND t.month_start = s.month_start
+    WHEN MATCHED THEN
+        UPDATE SET
+            total_orders = t.total_orders + s.orders,
+            total_incidents = t.total_incidents + s.incidents,
+            total_fines = t.total_fines + s.fines
+    WHEN NOT MATCHED THEN
+        INSERT (fleet_id, month_start, total_orders, total_incidents, total_fines)
+        VALUES (s.fleet_id, s.month_start, s.orders, s.incidents, s.fines);
+END;
+GO
+
+-- 维护 VehicleStatusHistory：车辆新增、状态变化、删除 / 恢复时结束当前一段并开始新的一段。
+-- 状态来自后端流转、异常触发器还是手工修改都要记录，因此不判断 TRIGGER_NESTLEVEL。已删除的车辆不保留未结束的一段。
+CREATE TRIGGER trg_Vehicles_StatusHistory
+ON Vehicles
+AFTER INSERT, UPDATE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF NOT (UPDATE(vehicle_status) OR UPDATE(is_deleted)) RETURN;
+
+    DECLARE @now DATETIME2(0) = SYSDATETIME();
+    DECLARE @changed TABLE (vehicle_id NVARCHAR(10) PRIMARY KEY, status_code TINYINT NOT NULL, is_deleted BIT NOT NULL);
+    INSERT INTO @changed (vehicle_id, status_code, is_deleted)
+    SELECT i.vehicle_id,
+           CASE i.vehicle_status WHEN N'空闲' THEN 0 WHEN N'装货中' THEN 1 WHEN N'运输中' THEN 2 WHEN N'维修中' THEN 3 ELSE 4 END,
+           i.is_deleted
+    FROM inserted i
+    LEFT JOIN deleted d ON d.vehicle_id = i.vehicle_id
+    WHERE d.vehicle_id IS NULL OR d.vehicle_status <> i.vehicle_status OR d.is_deleted <> i.is_deleted;
+    IF NOT EXISTS (SELECT 1 FROM @changed) RETURN;
+
+    UPDATE h SET exited_at = @now
+    FROM VehicleStatusHistory h
+    JOIN @changed c ON c.vehicle_id = h.vehicle_id
+    WHERE h.exited_at IS NULL;
+
+    INSERT INTO VehicleStatusHistory (vehicle_id, status_code, entered_at)
+    SELECT vehicle_id, status_code, @now FROM @changed WHERE is_deleted = 0;
+END;
+GO
@@ -1,24 +1,24 @@
 USE FleetSync;
 GO
 
+-- 已占用的载重/容积取自 VehicleLoad 台账（随运单状态增量维护），每辆车一次主键查找，与历史运单数量无关
 CREATE VIEW View_VehicleResourceStatus AS
 SELECT 
     v.vehicle_id,
     v.max_weight,
     v.max_volume,
-    ISNULL(SUM(CASE WHEN o.order_status NOT IN ('已取消', '已完成', '待处理') THEN o.weight ELSE 0 END), 0) AS used_weight,
-    ISNULL(SUM(CASE WHEN o.order_status NOT IN ('已取消', '已完成', '待处理') THEN o.volume ELSE 0 END), 0) AS used_volume,
-    v.max_weight - ISNULL(SUM(CASE WHEN o.order_status NOT IN ('已取消', '已完成', '待处理') THEN o.weight ELSE 0 END), 0) AS remaining_weight,
-    v.max_volume - ISNULL(SUM(CASE WHEN o.order_status NOT IN ('已取消', '已完成', '待处理') THEN o.volume ELSE 0 END), 0) AS remaining_volume, --订单完成后不用再手动更改车辆的剩余载重和体积，因为视图会动态计算
+    ISNULL(l.used_weight, 0) AS used_weight,
+    ISNULL(l.used_volume, 0) AS used_volume,
+    v.max_weight - ISNULL(l.used_weight, 0) AS remaining_weight,
+    v.max_volume - ISNULL(l.used_volume, 0) AS remaining_volume, --订单完成后不用再手动更改车辆的剩余载重和体积，台账随运单状态自动扣减
     v.fleet_id,
     v.vehicle_status,
     d.person_name AS driver_name
 FROM Vehicles v
-LEFT JOIN Orders o ON v.vehicle_id = o.vehicle_id
+LEFT JOIN VehicleLoad l ON v.vehicle_id = l.vehicle_id
 LEFT JOIN Assignments a ON v.vehicle_id = a.vehicle_id
 LEFT JOIN Drivers d ON a.person_id = d.person_id
-WHERE v.is_deleted = 0
-GROUP BY v.vehicle_id, v.max_weight, v.max_volume, d.person_name, v.fleet_id, v.vehicle_status;
+WHERE v.is_deleted = 0;
 GO
 
 CREATE VIEW View_WeeklyIncidentAlert AS
@@ -40,7 +40,10 @@ JOIN Fleets f ON v.fleet_id = f.fleet_id
 LEFT JOIN Assignments a ON v.vehicle_id = a.vehicle_id
 LEFT JOIN Drivers d ON a.person_id = d.person_id
 WHERE 
-    -- 筛选本周的数据
-    DATEDIFF(week, i.occurrence_time, GETDATE()) = 0;
+    i.is_deleted = 0
+    -- 筛选本周（周日起）的数据：写成 occurrence_time 的范围而不是对列套 DATEDIFF，才能走 IX_Incidents_Vehicle_Time / IX_Incidents_Time；
+    -- 1900-01-07 是周日，DATEDIFF(week, ...) 按周日分界，与原来的口径一致
+    AND i.occurrence_time >= DATEADD(week, DATEDIFF(week, '19000107', GETDATE()), '19000107')
+    AND i.occurrence_time < DATEADD(week, DATEDIFF(week, '19000107', GETDATE()) + 1, '19000107');
 
 GO
\ No newline at end of file
@@ -47,7 +47,8 @@ export async function apiFetch(
         clearAuth()
 
         // 但如果当前页没有触发路由跳转，会停留在受限页面；这里直接强制回到登录页
-        // 避免后端重启导致 token store 丢失时“看起来像已登录”。
+        // 会话空闲超时、被挤出容量上限，或后端用默认的内存会话存储（SESSION_BACKEND=memory）时重启，
+        // 都会让已保存的 token 失效，避免这时“看起来像已登录”。
         try {
             const currentHash = typeof window !== 'undefined' ? window.location.hash : ''
             const currentPath = currentHash.startsWith('#') ? currentHash.slice(1) : currentHash